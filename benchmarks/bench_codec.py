@@ -0,0 +1,71 @@
+# benchmarks/bench_codec.py
+"""
+Micro-benchmarks of per-command encode cost: the former text -> hex string ->
+bytes.fromhex path against utils.protocol_codec.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_codec --number 200000
+"""
+
+import argparse
+import sys
+import timeit
+
+from utils.conversions import text_to_hex
+from utils.protocol_codec import MotorFrameEncoder, encode_acq, encode_motor
+
+
+def legacy_encode_motor(text_command: str) -> bytes:
+    """The encoding MotorModel.send_command used before utils.protocol_codec."""
+    hex_command = text_to_hex(text_command)
+    full_command = f"02 30 {hex_command} 03"
+    hex_string = full_command.replace(" ", "")
+    return bytes.fromhex(hex_string)
+
+
+def legacy_encode_acq(command: str) -> bytes:
+    """The encoding AcqModel.send_serial_data used before utils.protocol_codec."""
+    hex_command = text_to_hex(command)
+    full_command = f"{hex_command}0D"
+    return bytes.fromhex(full_command)
+
+
+UPLOAD_BLOCK = ("10 XP01S1000 ; benchmark line\n" * 10)[:256]
+
+CASES = [
+    ("motor XP17R", "XP17R", legacy_encode_motor, encode_motor),
+    ("motor XS", "XS", legacy_encode_motor, encode_motor),
+    ("acq A", "A", legacy_encode_acq, encode_acq),
+    ("acq SC,002,005", "SC,002,005", legacy_encode_acq, encode_acq),
+]
+
+
+def measure(function, argument, number):
+    """Return the mean cost of one call, in nanoseconds."""
+    timer = timeit.Timer(lambda: function(argument))
+    return min(timer.repeat(repeat=3, number=number)) / number * 1e9
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=100000, help="Calls per measurement.")
+    args = parser.parse_args(argv)
+
+    encoder = MotorFrameEncoder()
+    for name, command, legacy, codec in CASES:
+        assert legacy(command) == codec(command), name
+    assert legacy_encode_motor(UPLOAD_BLOCK) == bytes(encoder.encode(UPLOAD_BLOCK))
+
+    print(f"{'case':<22}{'before (ns)':>14}{'after (ns)':>14}{'speed-up':>10}")
+    rows = [(name, measure(legacy, command, args.number), measure(codec, command, args.number))
+            for name, command, legacy, codec in CASES]
+    rows.append(("motor 256-char block",
+                 measure(legacy_encode_motor, UPLOAD_BLOCK, args.number // 10),
+                 measure(encoder.encode, UPLOAD_BLOCK, args.number // 10)))
+    for name, before, after in rows:
+        print(f"{name:<22}{before:>14.0f}{after:>14.0f}{before / after:>9.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
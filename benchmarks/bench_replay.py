@@ -0,0 +1,130 @@
+# benchmarks/bench_replay.py
+"""
+Benchmark against a recorded serial session instead of the emulators.
+
+The motor and acquisition traces (recorded with SERIAL_CAPTURE_DIR,
+MainController.startSerialCapture or bench_throughput --capture) are played
+back through "replay://" ports, with the device latencies of the recording
+(--speed 1), scaled (--speed 2 = twice as fast) or as fast as possible
+(--speed 0, which measures the host side alone). The benchmarks must be run
+in the order they were recorded.
+
+Reports the wall-clock time of each benchmark, the per-command latencies
+from the I/O metrics and how many host writes did not match the trace.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_throughput --only acq_sequence --capture traces
+    python -m benchmarks.bench_replay traces/dev_pts_3-*.trace traces/dev_pts_4-*.trace --only acq_sequence
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from PyQt5.QtCore import QCoreApplication
+
+from config import SERIAL_TIMEOUT
+from controller.main_controller import MainController
+from model.serial_trace import REPLAY_SCHEME
+from benchmarks.bench_throughput import BENCHMARKS, wait_for
+
+
+def run_benchmark(controller, name, deadline_s, program_lines):
+    controller.resetIoStats()
+    start = time.perf_counter()
+    if name == "acq_sequence":
+        controller.startAcqSequence()
+        ok = wait_for(controller.acqSequenceFinished, deadline_s)
+    elif name == "motor_poll":
+        received = set()
+
+        def all_received(parameters):
+            received.update(parameters)
+            return len(received) >= 98
+
+        controller.runMotorParameterPoller()
+        ok = wait_for(controller.motorParametersUpdated, deadline_s, all_received)
+    else:
+        # Same synthetic program as bench_throughput, so the blocks match the recording.
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="ascii") as f:
+            for i in range(program_lines):
+                f.write(f"{(i + 1) * 10} XP01S{i % 1000} ; benchmark line\n")
+            path = f.name
+        try:
+            controller.startProgramUpload(path, "BENCH")
+            ok = wait_for(controller.programUploadFinished, deadline_s)
+        finally:
+            os.remove(path)
+    end = time.perf_counter()
+    return {"benchmark": name, "wall_s": end - start, "completed": ok, "io": controller.ioStats()}
+
+
+def format_report(results, settings, mismatches):
+    lines = [f"Settings: {settings}"]
+    for r in results:
+        status = "" if r["completed"] else "  (DID NOT COMPLETE)"
+        lines.append(f"{r['benchmark']:<14} wall {r['wall_s']:8.3f} s{status}")
+        for port, data in r["io"]["ports"].items():
+            for command, c in sorted(data["commands"].items()):
+                latency = c["latency"]
+                lines.append(f"    {command:<14} {c['count']:5d} x  p50 {latency['p50'] * 1000:8.2f} ms  "
+                             f"p99 {latency['p99'] * 1000:8.2f} ms  total {latency['sum']:7.3f} s")
+    lines.append(f"Writes not matching the trace: {mismatches}")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("motor_trace", help="Trace of the motor port.")
+    parser.add_argument("acq_trace", help="Trace of the acquisition port.")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay speed: 1 = recorded timing, 0 = as fast as possible.")
+    parser.add_argument("--timeout", type=float, default=SERIAL_TIMEOUT,
+                        help="Host serial timeout in seconds.")
+    parser.add_argument("--program-lines", type=int, default=200,
+                        help="Size of the synthetic program used by the upload benchmark.")
+    parser.add_argument("--deadline", type=float, default=600.0,
+                        help="Give up on a benchmark after this many seconds.")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    settings = {"motor_trace": args.motor_trace, "acq_trace": args.acq_trace,
+                "speed": args.speed, "timeout": args.timeout}
+    ports = [f"{REPLAY_SCHEME}{os.path.abspath(path)}?speed={args.speed}"
+             for path in (args.motor_trace, args.acq_trace)]
+
+    workdir = tempfile.TemporaryDirectory(prefix="bench_")
+    cwd = os.getcwd()
+    os.chdir(workdir.name)
+    controller = MainController(ports[0], ports[1], timeout=args.timeout,
+                                upload_ledger_path=os.path.join(workdir.name, "upload_ledger.jsonl"))
+    results = []
+    try:
+        for name in BENCHMARKS:
+            if name in args.only:
+                results.append(run_benchmark(controller, name, args.deadline, args.program_lines))
+        mismatches = sum(model.serial_handler.ser.mismatches
+                         for model in (controller.motor_model, controller.acq_model)
+                         if model.serial_handler.ser is not None)
+    finally:
+        controller.cleanup()
+        os.chdir(cwd)
+        workdir.cleanup()
+
+    print(format_report(results, settings, mismatches))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+    return 0 if all(r["completed"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+# benchmarks/bench_throughput.py
+"""
+End-to-end throughput benchmark against the pty-backed device emulators.
+
+Drives MainController.startAcqSequence, runMotorParameterPoller and
+startProgramUpload exactly as the GUI does and reports, per benchmark and
+per phase, the wall-clock time, bytes/s on the wire and round trips/s.
+
+Usage (from the repository root, Linux/macOS only because of the pty):
+    python -m benchmarks.bench_throughput --baud 9600 --latency 0.005
+    python -m benchmarks.bench_throughput --only motor_poll upload --json results.json
+    python -m benchmarks.bench_throughput --only acq_sequence --capture traces
+      (also records both ports to trace files for benchmarks/bench_replay.py)
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from PyQt5.QtCore import QCoreApplication, QEventLoop, QTimer
+
+from config import BAUD_RATE, SERIAL_TIMEOUT
+from controller import acq_sequence_worker
+from controller.main_controller import MainController
+from emulator.acq_emulator import AcqEmulator
+from emulator.motor_emulator import MotorEmulator
+
+BENCHMARKS = ("acq_sequence", "motor_poll", "upload")
+
+
+def wait_for(signal, timeout_s, condition=None):
+    """
+    Run the Qt event loop until `signal` fires (and `condition()` holds, if given)
+    or until `timeout_s` elapses. Returns True if the signal arrived in time.
+    """
+    loop = QEventLoop()
+    state = {"done": False}
+
+    def on_signal(*args):
+        if condition is None or condition(*args):
+            state["done"] = True
+            loop.quit()
+
+    signal.connect(on_signal)
+    QTimer.singleShot(int(timeout_s * 1000), loop.quit)
+    loop.exec_()
+    signal.disconnect(on_signal)
+    return state["done"]
+
+
+def _events(*devices):
+    """Merge the emulator event logs: (received, port_label, command, bytes_in, bytes_out, done)."""
+    merged = []
+    for label, device in devices:
+        for received, command, n_in, n_out, done in device.events:
+            merged.append((received, label, command, n_in, n_out, done))
+    merged.sort()
+    return merged
+
+
+def _summary(name, start, end, events, phases=None):
+    wall = end - start
+    total_bytes = sum(e[3] + e[4] for e in events)
+    return {
+        "benchmark": name,
+        "wall_s": wall,
+        "round_trips": len(events),
+        "bytes": total_bytes,
+        "bytes_per_s": total_bytes / wall if wall > 0 else 0.0,
+        "round_trips_per_s": len(events) / wall if wall > 0 else 0.0,
+        "phases": phases or [],
+    }
+
+
+def _sequence_phases(start, end, events):
+    """
+    Split an acquisition sequence into phases using the device event log:
+      homing   - start until the first drive command reaches the controller
+      arm <ax> - drive command until the D (dump) request
+      dump <ax>- D request until the last dump byte has been written
+      settle   - end of a dump until the next drive command
+      finish   - end of the last dump until acqSequenceFinished
+    """
+    phases = []
+    cursor = start
+    label = "homing"
+    axis = None
+    for received, port, command, n_in, n_out, done in events:
+        if port == "motor" and command in ("X-400", "Y-400"):
+            # With ACQ_OVERLAP_DRIVE the drive can arrive before the previous dump has ended.
+            phases.append((label, cursor, max(cursor, received)))
+            axis = command[0]
+            label, cursor = f"arm {axis}", received
+        elif port == "acq" and command == "D":
+            phases.append((label, cursor, received))
+            phases.append((f"dump {axis}", received, done))
+            label, cursor = "settle", done
+    phases.append(("finish" if label == "settle" else label, cursor, end))
+    result = []
+    for name, phase_start, phase_end in phases:
+        window = [e for e in events if phase_start <= e[0] < phase_end]
+        duration = phase_end - phase_start
+        n_bytes = sum(e[3] + e[4] for e in window)
+        result.append({
+            "phase": name,
+            "wall_s": duration,
+            "round_trips": len(window),
+            "bytes": n_bytes,
+            "bytes_per_s": n_bytes / duration if duration > 0 else 0.0,
+        })
+    return result
+
+
+def bench_acq_sequence(controller, motor, acq, deadline_s):
+    motor.reset_stats()
+    acq.reset_stats()
+    start = time.perf_counter()
+    controller.startAcqSequence()
+    ok = wait_for(controller.acqSequenceFinished, deadline_s)
+    end = time.perf_counter()
+    events = _events(("motor", motor), ("acq", acq))
+    result = _summary("acq_sequence", start, end, events, _sequence_phases(start, end, events))
+    result["completed"] = ok
+    return result
+
+
+def bench_motor_poll(controller, motor, acq, deadline_s):
+    motor.reset_stats()
+    received = set()
+
+    def all_received(parameters):
+        received.update(parameters)
+        return len(received) >= 98
+
+    start = time.perf_counter()
+    controller.runMotorParameterPoller()
+    ok = wait_for(controller.motorParametersUpdated, deadline_s, all_received)
+    end = time.perf_counter()
+    result = _summary("motor_poll", start, end, _events(("motor", motor)))
+    result["completed"] = ok
+    return result
+
+
+def bench_upload(controller, motor, acq, deadline_s, program_lines=200):
+    motor.reset_stats()
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="ascii") as f:
+        for i in range(program_lines):
+            f.write(f"{(i + 1) * 10} XP01S{i % 1000} ; benchmark line\n")
+        path = f.name
+    try:
+        start = time.perf_counter()
+        controller.startProgramUpload(path, "BENCH")
+        ok = wait_for(controller.programUploadFinished, deadline_s)
+        end = time.perf_counter()
+    finally:
+        os.remove(path)
+    result = _summary("upload", start, end, _events(("motor", motor)))
+    result["completed"] = ok
+    return result
+
+
+def format_report(results, settings):
+    lines = [f"Settings: {settings}"]
+    for r in results:
+        status = "" if r["completed"] else "  (DID NOT COMPLETE)"
+        lines.append(
+            f"{r['benchmark']:<14} wall {r['wall_s']:8.3f} s  "
+            f"{r['bytes_per_s']:9.1f} B/s  {r['round_trips_per_s']:7.2f} rt/s  "
+            f"({r['round_trips']} round trips, {r['bytes']} bytes){status}"
+        )
+        for p in r["phases"]:
+            lines.append(
+                f"    {p['phase']:<10} {p['wall_s']:8.3f} s  "
+                f"{p['bytes_per_s']:9.1f} B/s  ({p['round_trips']} round trips)"
+            )
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baud", type=int, default=BAUD_RATE,
+                        help="Emulated and host baud rate (0 disables wire pacing).")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Device turnaround latency per request, in seconds.")
+    parser.add_argument("--timeout", type=float, default=SERIAL_TIMEOUT,
+                        help="Host serial timeout in seconds.")
+    parser.add_argument("--acq-time", type=float, default=0.2,
+                        help="Seconds between SC and the card reporting F.")
+    parser.add_argument("--program-lines", type=int, default=200,
+                        help="Size of the synthetic program used by the upload benchmark.")
+    parser.add_argument("--deadline", type=float, default=600.0,
+                        help="Give up on a benchmark after this many seconds.")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    parser.add_argument("--capture", help="Record the serial traffic of both ports to trace files in this directory.")
+    parser.add_argument("--concurrent-homing", action="store_true",
+                        help="Home X and Y together (overrides config.MOTOR_CONCURRENT_HOMING).")
+    parser.add_argument("--overlap-drive", action="store_true",
+                        help="Send the next drive during the previous dump (overrides config.ACQ_OVERLAP_DRIVE).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    settings = {"baud": args.baud, "latency": args.latency, "timeout": args.timeout,
+                "acq_time": args.acq_time}
+    if args.concurrent_homing:
+        acq_sequence_worker.MOTOR_CONCURRENT_HOMING = True
+    settings["concurrent_homing"] = acq_sequence_worker.MOTOR_CONCURRENT_HOMING
+    if args.overlap_drive:
+        acq_sequence_worker.ACQ_OVERLAP_DRIVE = True
+    settings["overlap_drive"] = acq_sequence_worker.ACQ_OVERLAP_DRIVE
+
+    # Acquisition results are written relative to the working directory;
+    # keep them out of the checkout.
+    workdir = tempfile.TemporaryDirectory(prefix="bench_")
+    cwd = os.getcwd()
+    capture_dir = os.path.abspath(args.capture) if args.capture else None
+    os.chdir(workdir.name)
+
+    motor = MotorEmulator(args.baud, args.latency).start()
+    acq = AcqEmulator(args.baud, args.latency, args.acq_time).start()
+    controller = MainController(motor.port, acq.port, args.baud or BAUD_RATE, args.timeout,
+                                upload_ledger_path=os.path.join(workdir.name, "upload_ledger.jsonl"))
+    results = []
+    if capture_dir:
+        for path in controller.startSerialCapture(capture_dir):
+            print(f"Capturing to {path}")
+    try:
+        if "acq_sequence" in args.only:
+            results.append(bench_acq_sequence(controller, motor, acq, args.deadline))
+        if "motor_poll" in args.only:
+            results.append(bench_motor_poll(controller, motor, acq, args.deadline))
+        if "upload" in args.only:
+            results.append(bench_upload(controller, motor, acq, args.deadline, args.program_lines))
+    finally:
+        controller.cleanup()
+        motor.stop()
+        acq.stop()
+        os.chdir(cwd)
+        workdir.cleanup()
+
+    print(format_report(results, settings))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+    return 0 if all(r["completed"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
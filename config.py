@@ -7,4 +7,104 @@ BAUD_RATE = 9600
 SERIAL_TIMEOUT = 1  # in seconds
 
 # New: Maximum polling attempts for acquiring an "F" response.
-MAX_POLL_ATTEMPTS = 500  # 100 * 100ms ≈ 10 seconds
+MAX_POLL_ATTEMPTS = 500  # 500 * (20ms + reply round trip) ≈ 10+ seconds
+
+# Delay between two "A" status polls. Replies are delivered as soon as they
+# arrive, so this only paces how often the card is asked.
+ACQ_POLL_INTERVAL_MS = 20
+# Maximum wait for the card's "OK" after an SC command, in seconds; the
+# sequence is aborted with an error after that.
+ACQ_SC_RESPONSE_TIMEOUT = 10
+
+# Maximum number of motor commands written ahead of their replies by
+# MotorModel.send_many (1 disables pipelining).
+MOTOR_PIPELINE_WINDOW = 8
+
+# Motor parameter cache: entries older than this (seconds) are re-read on the
+# next poll (None = only re-read after an invalidating command).
+MOTOR_PARAM_MAX_AGE = 300
+# Parameters that change whenever an axis moves (position counters); motion
+# and stop commands invalidate these cache entries for that axis.
+MOTOR_VOLATILE_PARAMS = (20, 21, 22)
+
+# Directory of the append-only run archive (binary dumps + index.jsonl).
+RUN_STORE_DIR = 'runs'
+
+# Minimum interval between two partial-dump updates sent to the GUI while a
+# dump is being transferred, in milliseconds.
+DUMP_PROGRESS_INTERVAL_MS = 50
+
+# Console views (motor/acquisition output): lines kept on screen and the
+# minimum interval between two redraws (~1 frame).
+LOG_VIEW_MAX_LINES = 5000
+LOG_VIEW_FLUSH_MS = 25
+
+# asyncio on the Qt loop (coroutines awaiting scheduler jobs): when qasync is
+# not installed, the asyncio loop is run in slices from a Qt timer with this
+# period (upper bound on coroutine wake-up latency).
+ASYNCIO_TICK_MS = 5
+
+# Motion completion: the sequence polls "<axis>=H" (controller replies "E" at
+# standstill, "N" while moving) instead of sleeping for a fixed time. The poll
+# interval starts short and grows by MOTOR_STATUS_POLL_GROWTH up to the maximum.
+MOTOR_STATUS_POLL_MIN_MS = 20
+MOTOR_STATUS_POLL_MAX_MS = 200
+MOTOR_STATUS_POLL_GROWTH = 1.5
+# Safety timeout for a homing run, in seconds.
+MOTOR_HOMING_TIMEOUT = 30
+# Home X and Y at the same time instead of X, then Y. Off by default: only
+# enable it once the controller and the mechanics are known to accept both
+# axes homing together (see AcqSequenceWorker.run).
+MOTOR_CONCURRENT_HOMING = False
+# Safety timeout for a drive move to complete, in seconds.
+MOTOR_MOVE_TIMEOUT = 30
+
+# Minimum time between the end of one profile's dump and the start of the next
+# profile (which also waits for the previous axis to stop), in milliseconds.
+ACQ_SETTLE_MS = 50
+# Send the next axis' drive command while the previous dump is still being
+# transferred. Off by default: the move then starts up to a dump time (~1 s at
+# 115200 baud) before the card is armed instead of a few ms, which is not known
+# to be safe on the real controller (see AcqSequenceWorker.startMotorProfile).
+ACQ_OVERLAP_DRIVE = False
+
+# Memory bound of the cache of converted profiles and beam maps, in bytes.
+ANALYSIS_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Worker threads for analysis jobs (conversion, beam reconstruction) off the GUI thread.
+ANALYSIS_MAX_THREADS = 2
+
+# Console log level ('DEBUG' logs every command exchange; records are written
+# to the console from a background thread, never from the serial paths).
+LOG_LEVEL = 'INFO'
+# Capture full wire traces (every byte sent/received) into an in-memory ring
+# buffer of this many records from startup (0 = off; see logging_config.enable_wire_trace).
+WIRE_TRACE_CAPACITY = 0
+
+# Serial I/O metrics (per-port latency histograms and counters, see utils/io_metrics.py).
+IO_METRICS_ENABLED = True
+# Periodic export of the metrics as io_metrics.json / io_metrics.prom (Prometheus
+# text format) into IO_METRICS_DIR, every IO_METRICS_DUMP_INTERVAL_S seconds (0 = off).
+IO_METRICS_DIR = 'metrics'
+IO_METRICS_DUMP_INTERVAL_S = 60
+
+# Record the traffic of every serial port to a binary trace file in this
+# directory (None = off). A trace is replayed by using "replay://<file>" (optionally
+# "replay://<file>?speed=0" for as fast as possible) as the port name.
+SERIAL_CAPTURE_DIR = None
+
+# Per-port command scheduler: maximum number of queued jobs (stop commands are
+# never rejected), and commands per step of a bulk motor job (e.g. the 98-read
+# parameter poll), which bounds how long a stop or interactive command waits.
+COMMAND_QUEUE_MAX = 64
+MOTOR_BULK_CHUNK = 16
+# How long a worker (sequence, acquisition poll, upload) waits for another
+# worker to release a port before it gives up with an error, in seconds.
+PORT_HOLD_TIMEOUT = 30
+# How long the GUI thread waits for a worker thread to exit when stopping it
+# (sequence stop, shutdown), in milliseconds. A worker still busy after that
+# ends on its own thread once its current exchange returns.
+WORKER_STOP_WAIT_MS = 2000
+
+# Ledger of successful program uploads (program, content hash, controller,
+# timestamp). Default path; MainController takes another one as an argument.
+UPLOAD_LEDGER_PATH = 'upload_ledger.jsonl'
@@ -1,125 +1,138 @@
 # controller/acq_data_poller.py
 
-import csv
 from PyQt5.QtCore import QObject, pyqtSignal, QTimer
-from config import MAX_POLL_ATTEMPTS
-from utils.serial_mutex import acq_mutex
+import logging
+from config import MAX_POLL_ATTEMPTS, ACQ_POLL_INTERVAL_MS, PORT_HOLD_TIMEOUT
+from model.dump_reader import DumpError
+from model.command_scheduler import INTERACTIVE
+
+logger = logging.getLogger(__name__)
 
 class AcqDataPoller(QObject):
     finished = pyqtSignal()
     errorOccurred = pyqtSignal(str)
+    dumpAcquired = pyqtSignal(object)  # (128, 16) uint16 array
+    dumpProgress = pyqtSignal(object)  # (n, 16) view of the lines received so far
 
-    def __init__(self, acq_model, parent=None):
+    def __init__(self, acq_model, run_store=None, parent=None):
         super().__init__(parent)
         self.acq_model = acq_model
+        self.run_store = run_store
         self._running = True
-        self.collected_data = []  # Will store 128 rows (each row is a list of 16 words)
+        self.collected_data = None  # Will store the (128, 16) uint16 array of decoded words
         self.polling_attempts = 0
         self.max_poll_attempts = MAX_POLL_ATTEMPTS  # Use the same constant as before
-        self._mutex_locked = False
+        self._holding_port = False
+        self._finished = False
 
     def run(self):
-        # Lock the acquisition mutex.
-        acq_mutex.lock()
-        self._mutex_locked = True
+        # Hold the acquisition port until the dump has been read.
+        if not self.acq_model.scheduler.hold(self, PORT_HOLD_TIMEOUT):
+            self.errorOccurred.emit("Acquisition port busy; poll not started.")
+            self._finish()
+            return
+        self._holding_port = True
 
         if not self._running:
-            self._release_mutex_if_needed()
-            self.finished.emit()
+            self._finish()
             return
 
         # Start polling for the "F" response by sending the "A" command.
         self.polling_attempts = 0
-        QTimer.singleShot(100, self.pollForResponse)
+        QTimer.singleShot(0, self.pollForResponse)
 
     def pollForResponse(self):
         if not self._running:
-            self._release_mutex_if_needed()
-            self.finished.emit()
+            self._finish()
             return
 
         try:
             # Send the polling command "A"
-            self.acq_model.send_serial_data("A")
-            response = self.acq_model.read_serial_data()
-            print(f"[AcqDataPoller] Polling: received '{response}'")
+            response = self.acq_model.query("A", priority=INTERACTIVE, owner=self)
+            logger.debug("Polling: received '%s'", response)
             if response == "F":
                 # Once F is received, send the DUMP command.
-                self.acq_model.send_serial_data("D")
+                self.acq_model.send_serial_data("D", INTERACTIVE, self)
                 # Begin collecting the dump data (expecting 128 lines).
-                QTimer.singleShot(100, lambda: self.collectDumpData(0))
+                QTimer.singleShot(0, self.collectDumpData)
             else:
                 self.polling_attempts += 1
+                self.acq_model.metrics.retry("A")
                 if self.polling_attempts > self.max_poll_attempts:
                     self.errorOccurred.emit("Timeout polling for 'F' response in AcqDataPoller.")
                     self.stop()
-                    self._release_mutex_if_needed()
-                    self.finished.emit()
+                    self._finish()
                     return
                 # Retry after a short delay.
-                QTimer.singleShot(100, self.pollForResponse)
+                QTimer.singleShot(ACQ_POLL_INTERVAL_MS, self.pollForResponse)
         except Exception as e:
             self.errorOccurred.emit(f"Error in pollForResponse: {e}")
-            self._release_mutex_if_needed()
-            self.finished.emit()
+            self._finish()
 
-    def collectDumpData(self, line_count):
+    def collectDumpData(self):
         if not self._running:
-            self._release_mutex_if_needed()
-            self.finished.emit()
+            self._finish()
             return
 
         try:
-            # Read one line of dump data.
-            line = self.acq_model.read_serial_data()
-            print(f"[AcqDataPoller] Dump line {line_count+1}: {line}")
-            # Check for an error response.
-            if line.strip().startswith("ERR"):
-                self.errorOccurred.emit(f"DUMP command error response: {line.strip()}")
-                self._release_mutex_if_needed()
-                self.finished.emit()
-                return
-
-            # Split the line by commas (each line must contain 16 words).
-            parts = [p.strip() for p in line.split(',')]
-            if len(parts) != 16:
-                self.errorOccurred.emit(f"Unexpected number of words in dump line {line_count+1}: {line}")
-                self._release_mutex_if_needed()
-                self.finished.emit()
-                return
-
-            self.collected_data.append(parts)
-
-            # If we haven't collected 128 lines yet, schedule the next read.
-            if line_count + 1 < 128:
-                QTimer.singleShot(10, lambda: self.collectDumpData(line_count + 1))
-            else:
-                # All dump data collected; now save to CSV.
-                self.saveData()
+            # Read the whole dump (128 lines of 16 words) in one streaming read.
+            data = self.acq_model.read_dump(should_continue=lambda: self._running,
+                                            progress=self.dumpProgress.emit,
+                                            priority=INTERACTIVE, owner=self)
+        except DumpError as e:
+            self.errorOccurred.emit(str(e))
+            self._finish()
+            return
         except Exception as e:
             self.errorOccurred.emit(f"Error in collectDumpData: {e}")
-            self._release_mutex_if_needed()
-            self.finished.emit()
+            self._finish()
+            return
+
+        if data is None:
+            self._finish()
+            return
+        self.collected_data = data
+        logger.info("Collected %d dump lines.", len(data))
+        self.dumpAcquired.emit(data)
+        # All dump data collected; now archive it.
+        self.saveData()
 
     def saveData(self):
-        try:
-            with open("requested_data.csv", 'w', newline='') as csv_file:
-                writer = csv.writer(csv_file)
-                # Flatten the collected_data (a list of 128 rows of 16 words) and write each word on a new line.
-                for row in self.collected_data:
-                    for word in row:
-                        writer.writerow([word])
-            print("[AcqDataPoller] Dump data saved to requested_data.csv")
-        except Exception as e:
-            self.errorOccurred.emit(f"Error saving dump data: {e}")
-        self._release_mutex_if_needed()
-        self.finished.emit()
+        """Archive the dump as a one-profile ("requested") run in the run store."""
+        if self.run_store is not None:
+            run_id = None
+            try:
+                run_id = self.run_store.begin_run(kind="poll")
+                self.run_store.save_profile(run_id, "requested", self.collected_data)
+                self.run_store.commit_run(run_id)
+                logger.info("Dump data saved to run %s", run_id)
+            except Exception as e:
+                self.errorOccurred.emit(f"Error saving dump data: {e}")
+                if run_id is not None:
+                    self.run_store.abort_run(run_id)
+        self._finish()
 
     def stop(self):
+        """Request a stop; safe from any thread, the port is released on the worker's thread."""
         self._running = False
-        self._release_mutex_if_needed()
 
-    def _release_mutex_if_needed(self):
-        if self._mutex_locked:
-            acq_mutex.unlock()
-            self._mutex_locked = False
+    def abandon(self):
+        """
+        Release the port of a poll whose thread was stopped first (connected to
+        the thread's finished signal). Only call it on the worker's thread or
+        once that thread has exited.
+        """
+        self._finish()
+
+    def _finish(self):
+        """Release the acquisition port and emit finished (once)."""
+        if self._finished:
+            return
+        self._finished = True
+        self._release_port()
+        self.finished.emit()
+
+    def _release_port(self):
+        if self._holding_port:
+            self._holding_port = False
+            self.acq_model.scheduler.release(self)
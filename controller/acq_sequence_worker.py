@@ -1,252 +1,464 @@
 # controller/acq_sequence_worker.py
 
-import csv
 from PyQt5.QtCore import QObject, pyqtSignal, QTimer
+from concurrent.futures import ThreadPoolExecutor, wait
 import time
-from config import MAX_POLL_ATTEMPTS
-from utils.serial_mutex import acq_mutex  # use acquisition-specific mutex
+import logging
+from config import (MAX_POLL_ATTEMPTS, ACQ_POLL_INTERVAL_MS, ACQ_SC_RESPONSE_TIMEOUT, MOTOR_STATUS_POLL_MIN_MS,
+                    MOTOR_STATUS_POLL_MAX_MS, MOTOR_STATUS_POLL_GROWTH, MOTOR_HOMING_TIMEOUT,
+                    MOTOR_CONCURRENT_HOMING, MOTOR_MOVE_TIMEOUT, ACQ_SETTLE_MS, ACQ_OVERLAP_DRIVE,
+                    PORT_HOLD_TIMEOUT)
+from model.dump_reader import DumpError
+from model.command_scheduler import SEQUENCE
+
+logger = logging.getLogger(__name__)
 
 class AcqSequenceWorker(QObject):
     """
     Revised Acquisition Sequence Worker using a state‐machine style with QTimer.
-    While running, this worker locks the acquisition-specific mutex (acq_mutex)
-    so that no other process (such as the motor parameter poller) accesses COM4.
+    For each profile, from its first "A" until its dump has been read, this
+    worker holds the acquisition port's command scheduler, so no other job
+    (e.g. a manual command) runs on COM4 between its A, SC and D exchanges;
+    during homing and between profiles the port is free. Its motor commands run at SEQUENCE priority: stop commands and
+    interactive commands go first, the parameter poll after.
+    Each sequence is archived as one run in the RunStore (if given), with the
+    SC settings, drive command and per-phase durations of every profile.
+
+    Homing is completion-driven: after the initial commands the worker polls
+    the controller's standstill status and starts the profiles as soon as the
+    axes have stopped (X, then Y; both at once only when MOTOR_CONCURRENT_HOMING
+    is enabled). If the controller does not answer the status query, the former
+    fixed waits (3 s, then 5 s) are used instead.
+
+    The profiles are pipelined: each dump is handed to a saver thread as soon
+    as it has been read, and the next profile starts once the previous axis
+    has stopped and ACQ_SETTLE_MS have passed since its dump (instead of a
+    fixed 1 s gap). With ACQ_OVERLAP_DRIVE the next axis' drive command is
+    sent while the previous dump is still streaming in.
     """
     finished = pyqtSignal()
     errorOccurred = pyqtSignal(str)
+    dumpAcquired = pyqtSignal(str, object)  # (profile label, (128, 16) uint16 array)
+    dumpProgress = pyqtSignal(str, object)  # (profile label, (n, 16) view of the lines received so far)
 
-    def __init__(self, motor_model, acq_model, parent=None):
+    def __init__(self, motor_model, acq_model, run_store=None, parent=None):
         super().__init__(parent)
         self.motor_model = motor_model
         self.acq_model = acq_model
+        self.run_store = run_store
         self._running = True
 
         # Define motor profiles.
         self.motor_profiles = [
-            {"label": "X", "initial": "X0+", "drive": "X-400", "csv": "acquired_data_X.csv"},
-            {"label": "Y", "initial": "Y0+", "drive": "Y-400", "csv": "acquired_data_Y.csv"}
+            {"label": "X", "initial": "X0+", "drive": "X-400", "sc": "SC,002,005"},
+            {"label": "Y", "initial": "Y0+", "drive": "Y-400", "sc": "SC,008,005"}
         ]
         self.current_profile_index = 0
         self.current_profile = None
-        self.collected_data = []  # For dump data: list of 128 rows (each row is a list of 16 words)
+        self.collected_data = None  # For dump data: (128, 16) uint16 array of decoded words
 
         # For polling “F” responses.
         self.polling_attempts = 0
         self.max_poll_attempts = MAX_POLL_ATTEMPTS
 
-        self._mutex_locked = False
+        # Run archiving and per-phase timing.
+        self.run_id = None
+        # Dumps are written on this thread so saving never delays the serial exchanges.
+        self._saver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="RunSaver")
+        self._pending_saves = []
+        self._settle_start = None
+        self._drive_sent_early = None  # label of a profile whose drive was sent during the previous dump
+        self._sequence_start = None
+        self._homing_duration = None
+        self._phase_mark = None
+        self._profile_durations = {}
+
+        # Motion completion polling (see _awaitStandstill).
+        self._moving_axes = []
+        self._motion_deadline = None
+        self._motion_started = None
+        self._motion_interval = MOTOR_STATUS_POLL_MIN_MS
+        self._motion_fallback_ms = 0
+        self._motion_next = None
+
+        self._sc_deadline = None  # Give up waiting for the SC "OK" after this (monotonic) time.
+
+        self._holding_port = False
+        self._finished = False
 
     def run(self):
         """
         Start the sequence by sending the initial commands.
-        Locks the acquisition mutex (acq_mutex) for the entire duration.
-        """
-        acq_mutex.lock()
-        self._mutex_locked = True
 
+        Homing is sequential (X, then Y) unless config.MOTOR_CONCURRENT_HOMING
+        is set. The controller is not asked whether it supports homing both axes
+        at once, so that setting is the check: it is off by default and should
+        only be enabled for a controller and mechanics known to allow it.
+        """
         if not self._running:
-            self._release_mutex_if_needed()
-            self.finished.emit()
+            self._finish()
             return
 
+        self._sequence_start = time.perf_counter()
+        if self.run_store is not None:
+            try:
+                self.run_id = self.run_store.begin_run(kind="sequence")
+            except Exception as e:
+                self.errorOccurred.emit(f"Error creating run in the run store: {e}")
+
         try:
-            print("[AcqSequenceWorker] Sending initial command for motor X.")
-            self.motor_model.send_command(self.motor_profiles[0]['initial'])
-            QTimer.singleShot(3000, self.sendSecondMotorInitial)
+            if MOTOR_CONCURRENT_HOMING:
+                logger.info("Sending initial commands for motors X and Y.")
+                for profile in self.motor_profiles:
+                    self.motor_model.send_command(profile['initial'], SEQUENCE)
+                self._awaitStandstill([p['label'] for p in self.motor_profiles],
+                                      self.startMotorSequence, fallback_ms=8000)
+            else:
+                logger.info("Sending initial command for motor X.")
+                self.motor_model.send_command(self.motor_profiles[0]['initial'], SEQUENCE)
+                self._awaitStandstill([self.motor_profiles[0]['label']],
+                                      self.sendSecondMotorInitial, fallback_ms=3000)
         except Exception as e:
             self.errorOccurred.emit(f"Error in run(): {e}")
-            self._release_mutex_if_needed()
-            self.finished.emit()
+            self._finish()
 
     def sendSecondMotorInitial(self):
         """
-        Send the initial command for motor Y after a delay.
+        Send the initial command for motor Y once motor X has finished homing
+        (only used when homing is not concurrent).
         """
         if not self._running:
-            self._release_mutex_if_needed()
-            self.finished.emit()
+            self._finish()
             return
         try:
-            print("[AcqSequenceWorker] Sending initial command for motor Y.")
-            self.motor_model.send_command(self.motor_profiles[1]['initial'])
-            QTimer.singleShot(5000, self.startMotorSequence)
+            logger.info("Sending initial command for motor Y.")
+            self.motor_model.send_command(self.motor_profiles[1]['initial'], SEQUENCE)
+            self._awaitStandstill([self.motor_profiles[1]['label']],
+                                  self.startMotorSequence, fallback_ms=5000)
         except Exception as e:
             self.errorOccurred.emit(f"Error in sendSecondMotorInitial(): {e}")
-            self._release_mutex_if_needed()
-            self.finished.emit()
+            self._finish()
 
     def startMotorSequence(self):
         """
         Begin processing the motor profiles.
         """
         if not self._running:
-            self._release_mutex_if_needed()
-            self.finished.emit()
+            self._finish()
             return
         self.current_profile_index = 0
+        self._homing_duration = time.perf_counter() - self._sequence_start
         self.startMotorProfile()
 
+    def _awaitStandstill(self, axes, next_step, timeout=MOTOR_HOMING_TIMEOUT, fallback_ms=0):
+        """
+        Call next_step() once every axis in `axes` has stopped.
+
+        The standstill status is polled with an interval growing from
+        MOTOR_STATUS_POLL_MIN_MS to MOTOR_STATUS_POLL_MAX_MS. After `timeout`
+        seconds the moving axes are stopped and the sequence is aborted. If the
+        controller does not answer the status query, next_step() runs once
+        `fallback_ms` have passed since the wait started.
+        """
+        self._moving_axes = list(axes)
+        self._motion_started = time.monotonic()
+        self._motion_deadline = self._motion_started + timeout
+        self._motion_interval = MOTOR_STATUS_POLL_MIN_MS
+        self._motion_fallback_ms = fallback_ms
+        self._motion_next = next_step
+        QTimer.singleShot(MOTOR_STATUS_POLL_MIN_MS, self._pollStandstill)
+
+    def _pollStandstill(self):
+        if not self._running:
+            self._finish()
+            return
+        try:
+            for axis in list(self._moving_axes):
+                stopped = self.motor_model.is_standstill(axis, SEQUENCE)
+                if stopped is None:
+                    waited_ms = int((time.monotonic() - self._motion_started) * 1000)
+                    logger.warning("No standstill status for %s; falling back to a fixed %d ms wait.",
+                                   axis, self._motion_fallback_ms)
+                    QTimer.singleShot(max(0, self._motion_fallback_ms - waited_ms), self._motion_next)
+                    return
+                if stopped:
+                    self._moving_axes.remove(axis)
+            if not self._moving_axes:
+                logger.debug("Motion complete after %.2f s.", time.monotonic() - self._motion_started)
+                self._motion_next()
+                return
+            if time.monotonic() >= self._motion_deadline:
+                for axis in self._moving_axes:
+                    self.motor_model.stop_axis(axis)
+                self.errorOccurred.emit(
+                    f"Timeout waiting for motor(s) {', '.join(self._moving_axes)} to stop."
+                )
+                self.stop()
+                self._finish()
+                return
+            self._motion_interval = min(self._motion_interval * MOTOR_STATUS_POLL_GROWTH,
+                                        MOTOR_STATUS_POLL_MAX_MS)
+            QTimer.singleShot(int(self._motion_interval), self._pollStandstill)
+        except Exception as e:
+            self.errorOccurred.emit(f"Error waiting for motion to complete: {e}")
+            self._finish()
+
     def startMotorProfile(self):
         """
         Begin the sequence for the current motor profile.
         Run only once; if all profiles have been processed, finish the sequence.
+        Holds the acquisition port (see model/command_scheduler.py) until the
+        profile's dump has been read; gives up if another worker keeps it for
+        more than PORT_HOLD_TIMEOUT seconds.
+
+        The drive command goes out between the "A" and the SC arm, so the move
+        starts a few ms before the card acquires. config.ACQ_OVERLAP_DRIVE sends
+        it during the previous dump instead (see pollForResponse); it is off by
+        default because the axis may then be well into, or past, its travel when
+        the card is armed, and that has not been checked on the real controller.
         """
         if not self._running:
-            self._release_mutex_if_needed()
-            self.finished.emit()
+            self._finish()
             return
 
         if self.current_profile_index >= len(self.motor_profiles):
-            print("[AcqSequenceWorker] All motor profiles processed. Finishing sequence.")
-            self._release_mutex_if_needed()
-            self.finished.emit()
+            logger.info("All motor profiles processed. Finishing sequence.")
+            self._finish()
             return
 
         self.current_profile = self.motor_profiles[self.current_profile_index]
-        print(f"[AcqSequenceWorker] Starting sequence for {self.current_profile['label']} motor.")
+        if not self.acq_model.scheduler.hold(self, PORT_HOLD_TIMEOUT):
+            if self._running:
+                self.errorOccurred.emit(
+                    f"Acquisition port busy; sequence stopped before the {self.current_profile['label']} profile."
+                )
+            self.stop()
+            self._finish()
+            return
+        self._holding_port = True
+        if not self._running:
+            self._finish()
+            return
+        logger.info("Starting sequence for %s motor.", self.current_profile['label'])
+        self._profile_durations = {}
+        self._phase_mark = time.perf_counter()
+        if self._settle_start is not None:
+            # Measured gap between the previous dump and this profile.
+            self._profile_durations["settle"] = self._phase_mark - self._settle_start
+            self._settle_start = None
         try:
             # Step 2: Send "A" command to the acquisition card.
-            self.acq_model.send_serial_data("A")
-            # Step 3: Send the motor’s drive command.
-            self.motor_model.send_command(self.current_profile['drive'])
+            self.acq_model.send_serial_data("A", SEQUENCE, self)
+            # Step 3: Send the motor’s drive command (unless ACQ_OVERLAP_DRIVE sent it during the previous dump).
+            if self._drive_sent_early != self.current_profile['label']:
+                self.motor_model.send_command(self.current_profile['drive'], SEQUENCE)
+            self._drive_sent_early = None
             # Send the appropriate SC command.
-            if self.current_profile['label'] == "X":
-                self.acq_model.send_serial_data("SC,002,005")
-            elif self.current_profile['label'] == "Y":
-                self.acq_model.send_serial_data("SC,008,005")
+            self.acq_model.send_serial_data(self.current_profile['sc'], SEQUENCE, self)
             # Wait for the "OK" response before proceeding.
-            QTimer.singleShot(100, self.waitForSCResponse)
+            self._sc_deadline = time.monotonic() + ACQ_SC_RESPONSE_TIMEOUT
+            QTimer.singleShot(0, self.waitForSCResponse)
         except Exception as e:
             self.errorOccurred.emit(f"Error sending commands for motor {self.current_profile['label']}: {e}")
-            self._release_mutex_if_needed()
-            self.finished.emit()
+            self._finish()
             return
 
     def waitForSCResponse(self):
         """
-        Wait for the "OK" response after sending the SC command.
-        This method does not assume a maximum number of attempts; it will keep waiting until an "OK" is received.
+        Wait for the "OK" response after sending the SC command, reading line by
+        line until it arrives. After ACQ_SC_RESPONSE_TIMEOUT seconds the sequence is aborted.
         """
+        if not self._running:
+            self._finish()
+            return
         try:
-            response = self.acq_model.read_serial_data()
-            print(f"[AcqSequenceWorker] SC response: '{response}'")
+            response = self.acq_model.read_serial_data(priority=SEQUENCE, owner=self)
+            logger.debug("SC response: '%s'", response)
             if response and "OK" in response:
-                QTimer.singleShot(100, self.pollForResponse)
+                self._mark_phase("arm")
+                QTimer.singleShot(0, self.pollForResponse)
+            elif time.monotonic() >= self._sc_deadline:
+                self.errorOccurred.emit(
+                    f"Timeout waiting for the SC response on {self.current_profile['label']} motor."
+                )
+                self.stop()
+                self._finish()
             else:
-                QTimer.singleShot(100, self.waitForSCResponse)
+                QTimer.singleShot(0, self.waitForSCResponse)
         except Exception as e:
             self.errorOccurred.emit(f"Error waiting for SC response: {e}")
-            self._release_mutex_if_needed()
-            self.finished.emit()
+            self._finish()
 
     def pollForResponse(self):
         """
         Poll the acquisition card by sending "A" repeatedly until "F" is received.
         """
         if not self._running:
-            self._release_mutex_if_needed()
-            self.finished.emit()
+            self._finish()
             return
 
         try:
-            self.acq_model.send_serial_data("A")
-            response = self.acq_model.read_serial_data()
-            print(f"[AcqSequenceWorker] Polling ({self.current_profile['label']}): received '{response}'")
+            response = self.acq_model.query("A", priority=SEQUENCE, owner=self)
+            logger.debug("Polling (%s): received '%s'", self.current_profile['label'], response)
             if response == "F":
+                self._mark_phase("poll")
                 # Once "F" is received, send the DUMP command.
-                self.acq_model.send_serial_data("D")
-                print(f"[AcqSequenceWorker] Sent 'D' command for {self.current_profile['label']} motor.")
-                self.collected_data = []  # Reset dump data collection
-                QTimer.singleShot(100, lambda: self.collectDumpData(0))
+                self.acq_model.send_serial_data("D", SEQUENCE, self)
+                logger.debug("Sent 'D' command for %s motor.", self.current_profile['label'])
+                if ACQ_OVERLAP_DRIVE and self.current_profile_index + 1 < len(self.motor_profiles):
+                    # The motor port is idle while the dump streams in.
+                    next_profile = self.motor_profiles[self.current_profile_index + 1]
+                    self.motor_model.send_command(next_profile['drive'], SEQUENCE)
+                    self._drive_sent_early = next_profile['label']
+                self.collected_data = None  # Reset dump data collection
+                QTimer.singleShot(0, self.collectDumpData)
             else:
                 self.polling_attempts += 1
+                self.acq_model.metrics.retry("A")
                 if self.polling_attempts > self.max_poll_attempts:
                     self.errorOccurred.emit(
                         f"Timeout polling for 'F' response on {self.current_profile['label']} motor."
                     )
                     self.stop()
-                    self._release_mutex_if_needed()
-                    self.finished.emit()
+                    self._finish()
                     return
-                QTimer.singleShot(100, self.pollForResponse)
+                QTimer.singleShot(ACQ_POLL_INTERVAL_MS, self.pollForResponse)
         except Exception as e:
             self.errorOccurred.emit(f"Error in pollForResponse(): {e}")
-            self._release_mutex_if_needed()
-            self.finished.emit()
+            self._finish()
 
-    def collectDumpData(self, line_count):
+    def collectDumpData(self):
         """
-        Collect exactly 128 lines of dump data from the acquisition card.
-        Each line is expected to contain 16 comma‐separated words.
+        Collect the 128 lines of dump data from the acquisition card in one
+        streaming read. Each line is expected to contain 16 comma‐separated words.
         """
         if not self._running:
-            self._release_mutex_if_needed()
-            self.finished.emit()
+            self._finish()
             return
 
         try:
-            line = self.acq_model.read_serial_data()
-            print(f"[AcqSequenceWorker] Dump line {line_count+1}: {line}")
-            if line.strip().startswith("ERR"):
-                self.errorOccurred.emit(f"DUMP command error response: {line.strip()}")
-                self._release_mutex_if_needed()
-                self.finished.emit()
-                return
-
-            parts = [p.strip() for p in line.split(',')]
-            if len(parts) != 16:
-                self.errorOccurred.emit(f"Unexpected number of words in dump line {line_count+1}: {line}")
-                self._release_mutex_if_needed()
-                self.finished.emit()
-                return
-
-            self.collected_data.append(parts)
-
-            if line_count + 1 < 128:
-                QTimer.singleShot(10, lambda: self.collectDumpData(line_count + 1))
-            else:
-                self.saveDumpData()
+            label = self.current_profile['label']
+            data = self.acq_model.read_dump(
+                should_continue=lambda: self._running,
+                progress=lambda partial: self.dumpProgress.emit(label, partial),
+                priority=SEQUENCE, owner=self,
+            )
+        except DumpError as e:
+            self.errorOccurred.emit(str(e))
+            self._finish()
+            return
         except Exception as e:
             self.errorOccurred.emit(f"Error in collectDumpData: {e}")
-            self._release_mutex_if_needed()
-            self.finished.emit()
+            self._finish()
+            return
+
+        if data is None:
+            self._finish()
+            return
+        # The profile's conversation with the card is over; let other jobs run while the axis settles.
+        self._release_port()
+        self.collected_data = data
+        self._mark_phase("dump")
+        logger.info("Collected %d dump lines for %s motor.", len(data), self.current_profile['label'])
+        self.dumpAcquired.emit(self.current_profile['label'], data)
+        self.saveDumpData()
 
     def saveDumpData(self):
         """
-        Save the collected dump data to the CSV file.
-        Each word is written on a new line.
+        Hand the collected dump array of the current profile to the saver
+        thread, then move on to the next profile once the axis has settled.
         """
-        try:
-            with open(self.current_profile['csv'], 'w', newline='') as csv_file:
-                writer = csv.writer(csv_file)
-                for row in self.collected_data:
-                    for word in row:
-                        writer.writerow([word])
-            print(f"[AcqSequenceWorker] Dump data saved to {self.current_profile['csv']} for {self.current_profile['label']} motor.")
-        except Exception as e:
-            self.errorOccurred.emit(f"Error saving dump data: {e}")
+        label = self.current_profile['label']
+        if self.run_store is not None and self.run_id is not None:
+            future = self._saver.submit(
+                self.run_store.save_profile,
+                self.run_id, label, self.collected_data,
+                sc=self.current_profile['sc'],
+                drive=self.current_profile['drive'],
+                durations=dict(self._profile_durations),
+            )
+            future.add_done_callback(lambda f, label=label: self._onSaved(label, f))
+            self._pending_saves.append(future)
 
         self.current_profile_index += 1
         if self.current_profile_index < len(self.motor_profiles):
-            QTimer.singleShot(1000, self.startMotorProfile)
+            self._settle_start = time.perf_counter()
+            self._awaitStandstill([label], self._startNextProfile,
+                                  timeout=MOTOR_MOVE_TIMEOUT, fallback_ms=1000)
         else:
-            print("[AcqSequenceWorker] Completed all motor profiles. Finishing sequence.")
-            self.v
-            self._release_mutex_if_needed()
-            self.finished.emit()
+            logger.info("Completed all motor profiles. Finishing sequence.")
+            self._finish()
+
+    def _startNextProfile(self):
+        """Start the next profile, keeping at least ACQ_SETTLE_MS after the previous dump."""
+        waited_ms = (time.perf_counter() - self._settle_start) * 1000
+        QTimer.singleShot(max(0, int(ACQ_SETTLE_MS - waited_ms)), self.startMotorProfile)
+
+    def _onSaved(self, label, future):
+        # Runs on the saver thread; errorOccurred is delivered to the GUI thread by Qt.
+        error = future.exception()
+        if error is not None:
+            self.errorOccurred.emit(f"Error saving dump data: {error}")
+        else:
+            logger.info("Dump data saved to run %s for %s motor.", self.run_id, label)
+
+    def _mark_phase(self, name):
+        """Record the time spent since the previous phase mark under `name`."""
+        now = time.perf_counter()
+        self._profile_durations[name] = now - self._phase_mark
+        self._phase_mark = now
+
+    def _finish(self):
+        """
+        End the sequence: release the acquisition port, commit the run (if any profile was
+        saved, otherwise abort it) and emit finished. Runs once.
+        """
+        if self._finished:
+            return
+        self._finished = True
+        self._release_port()
+        # Let queued saves complete before the run is committed.
+        wait(self._pending_saves)
+        saved_profiles = sum(1 for future in self._pending_saves if future.exception() is None)
+        self._pending_saves = []
+        self._saver.shutdown(wait=False)
+        if self.run_store is not None and self.run_id is not None:
+            run_id, self.run_id = self.run_id, None
+            if saved_profiles:
+                status = "complete" if saved_profiles == len(self.motor_profiles) else "incomplete"
+                try:
+                    self.run_store.commit_run(
+                        run_id, status,
+                        homing_duration=self._homing_duration,
+                        total_duration=time.perf_counter() - self._sequence_start,
+                    )
+                except Exception as e:
+                    self.errorOccurred.emit(f"Error committing run {run_id}: {e}")
+            else:
+                self.run_store.abort_run(run_id)
+        self.finished.emit()
+
+    def abandon(self):
+        """
+        Finish a sequence whose thread was stopped before the sequence could end
+        (connected to the thread's finished signal by MainController). Only call
+        it on the worker's thread or once that thread has exited.
+        """
+        self._finish()
 
     def stop(self):
         """
-        Request a graceful shutdown of the worker.
+        Request a graceful shutdown of the worker. Safe to call from any thread;
+        the port is released by _finish() on the worker's own thread.
         """
         self._running = False
-        print("[AcqSequenceWorker] Stop requested.")
-        self._release_mutex_if_needed()
+        logger.info("Stop requested.")
 
-    def _release_mutex_if_needed(self):
+    def _release_port(self):
         """
-        If the acq mutex was locked by this worker, unlock it.
+        If the acquisition port is held by this worker, release it (only from
+        the worker's thread, or once that thread has exited).
         """
-        if self._mutex_locked:
-            acq_mutex.unlock()
-            self._mutex_locked = False
+        if self._holding_port:
+            self._holding_port = False
+            self.acq_model.scheduler.release(self)
@@ -0,0 +1,130 @@
+# controller/analysis_executor.py
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot
+import threading
+import logging
+from config import ANALYSIS_MAX_THREADS
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisJob(QRunnable):
+    """
+    One versioned analysis job: runs `function(*args, **kwargs)` on the pool
+    and hands the result back to its executor. A job that has become stale
+    before it starts is skipped.
+    """
+    def __init__(self, executor, channel, version, function, args, kwargs):
+        super().__init__()
+        self.executor = executor
+        self.channel = channel
+        self.version = version
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+
+    def is_stale(self) -> bool:
+        return not self.executor.is_current(self.channel, self.version)
+
+    @pyqtSlot()
+    def run(self):
+        if self.is_stale():
+            return
+        try:
+            result = self.function(*self.args, **self.kwargs)
+        except Exception as e:
+            self.executor.jobFailed.emit(self.channel, self.version, str(e))
+            return
+        self.executor.jobFinished.emit(self.channel, self.version, result)
+
+
+class AnalysisExecutor(QObject):
+    """
+    Runs analysis work (file loading, conversion, beam reconstruction) on a
+    dedicated QThreadPool so the GUI thread only applies the results.
+
+    Jobs are submitted on named channels (e.g. "profile X", "beam"). Every
+    submission gets a new version and supersedes the older jobs of its channel:
+    a superseded job still waiting in the queue is removed, one already running
+    finishes but its result is dropped. The callback of the newest job is then
+    called on the GUI thread with the result.
+    """
+    jobFinished = pyqtSignal(str, int, object)  # (channel, version, result)
+    jobFailed = pyqtSignal(str, int, str)  # (channel, version, error message)
+    errorOccurred = pyqtSignal(str)
+
+    def __init__(self, max_threads=ANALYSIS_MAX_THREADS, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self._lock = threading.Lock()
+        self._versions = {}  # channel -> newest version
+        self._callbacks = {}  # channel -> (version, callback)
+        self._queued = {}  # channel -> newest job, until it is delivered
+        # Emitted from pool threads; delivered on the thread that owns the executor.
+        self.jobFinished.connect(self._deliver)
+        self.jobFailed.connect(self._report_failure)
+
+    def submit(self, channel: str, function, *args, callback=None, **kwargs) -> AnalysisJob:
+        """
+        Queue function(*args, **kwargs) on `channel`, superseding the channel's
+        older jobs. callback(result) runs on the GUI thread if this job is still
+        the newest of its channel when it completes.
+        """
+        with self._lock:
+            version = self._versions.get(channel, 0) + 1
+            self._versions[channel] = version
+            self._callbacks[channel] = (version, callback)
+            previous = self._queued.get(channel)
+        if previous is not None:
+            # Drop the older job if it has not started yet.
+            self._try_take(previous)
+        job = AnalysisJob(self, channel, version, function, args, kwargs)
+        self._queued[channel] = job
+        self.pool.start(job)
+        return job
+
+    def is_current(self, channel: str, version: int) -> bool:
+        with self._lock:
+            return self._versions.get(channel) == version
+
+    def cancel(self, channel: str = None):
+        """Supersede the jobs of one channel (or all channels) without submitting new ones."""
+        with self._lock:
+            channels = list(self._versions) if channel is None else [channel]
+            for name in channels:
+                self._versions[name] = self._versions.get(name, 0) + 1
+                self._callbacks.pop(name, None)
+        for name in channels:
+            job = self._queued.pop(name, None)
+            if job is not None:
+                self._try_take(job)
+
+    def _try_take(self, job):
+        try:
+            self.pool.tryTake(job)
+        except RuntimeError:
+            pass  # already run and deleted by the pool
+
+    def shutdown(self, timeout_ms: int = 2000):
+        """Cancel everything and wait for running jobs to finish."""
+        self.cancel()
+        self.pool.waitForDone(timeout_ms)
+
+    @pyqtSlot(str, int, object)
+    def _deliver(self, channel, version, result):
+        with self._lock:
+            current_version, callback = self._callbacks.get(channel, (None, None))
+        if version != current_version:
+            logger.debug("Dropping stale result of analysis job %s v%d.", channel, version)
+            return
+        self._queued.pop(channel, None)
+        if callback is not None:
+            callback(result)
+
+    @pyqtSlot(str, int, str)
+    def _report_failure(self, channel, version, message):
+        if self.is_current(channel, version):
+            self._queued.pop(channel, None)
+            logger.error("Analysis job %s failed: %s", channel, message)
+            self.errorOccurred.emit(f"Analysis job {channel} failed: {message}")
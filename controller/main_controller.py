@@ -1,13 +1,19 @@
 # controller/main_controller.py
 
-from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QObject, QThread, QTimer, pyqtSignal
 import logging
 from controller.acq_sequence_worker import AcqSequenceWorker
 from controller.motor_param_poller import MotorParameterPollerSingle
 from controller.program_uploader import ProgramUploader
 from model.motor_model import MotorModel
 from model.acq_model import AcqModel
-from config import MOTOR_COM_PORT, ACQ_COM_PORT, BAUD_RATE, SERIAL_TIMEOUT
+from model.run_store import RunStore
+from model.upload_ledger import UploadLedger
+from utils import qt_asyncio
+from utils.io_metrics import io_metrics
+from config import (MOTOR_COM_PORT, ACQ_COM_PORT, BAUD_RATE, SERIAL_TIMEOUT, RUN_STORE_DIR,
+                    UPLOAD_LEDGER_PATH, WORKER_STOP_WAIT_MS,
+                    IO_METRICS_DIR, IO_METRICS_DUMP_INTERVAL_S)
 
 logger = logging.getLogger(__name__)
 
@@ -16,14 +22,30 @@ class MainController(QObject):
     acqDataReceived = pyqtSignal(str)
     motorResponseReceived = pyqtSignal(str)
     acqSequenceFinished = pyqtSignal()
+    acqDumpReady = pyqtSignal(str, object)  # (profile label, (128, 16) uint16 array)
+    acqDumpProgress = pyqtSignal(str, object)  # (profile label, partial (n, 16) array while transferring)
     motorParametersUpdated = pyqtSignal(dict)
     errorOccurred = pyqtSignal(str)  # Centralized error signal.
+    programUploadFinished = pyqtSignal()  # The upload queue is empty
+    programUploadProgress = pyqtSignal(str)  # Uploader messages (block progress, rate, ETA)
 
-    def __init__(self):
+    def __init__(self, motor_port=MOTOR_COM_PORT, acq_port=ACQ_COM_PORT,
+                 baud_rate=BAUD_RATE, timeout=SERIAL_TIMEOUT, run_store_dir=RUN_STORE_DIR,
+                 upload_ledger_path=UPLOAD_LEDGER_PATH):
+        """
+        The port settings default to config.py; they can be overridden to run
+        against other ports (e.g. the device emulator used by the benchmarks).
+        So can the run store directory and the upload ledger path, to keep such
+        runs out of the operator's records.
+        """
         super().__init__()
         # Initialize the motor and acquisition models.
-        self.motor_model = MotorModel(MOTOR_COM_PORT, BAUD_RATE, SERIAL_TIMEOUT)
-        self.acq_model = AcqModel(ACQ_COM_PORT, BAUD_RATE, SERIAL_TIMEOUT)
+        self.motor_model = MotorModel(motor_port, baud_rate, timeout)
+        self.acq_model = AcqModel(acq_port, baud_rate, timeout)
+        # Append-only archive of acquired runs.
+        self.run_store = RunStore(run_store_dir)
+        # Record of successful program uploads (program, content hash, controller).
+        self.upload_ledger = UploadLedger(upload_ledger_path)
 
         # Placeholders for the acquisition sequence worker/thread.
         self.acq_seq_thread = None
@@ -33,15 +55,36 @@ class MainController(QObject):
         self.motor_poll_thread = None
         self.motor_poller = None
 
+        # Program uploader thread/worker, alive while programs are queued.
+        self.prog_upload_thread = None
+        self.prog_uploader = None
+
         # Placeholders for the acquisition data poller thread/worker.
         self.acq_data_poll_thread = None
         self.acq_data_poll_worker = None
 
+        # Periodic export of the serial I/O metrics.
+        self.metrics_timer = None
+        if IO_METRICS_DUMP_INTERVAL_S and IO_METRICS_DIR:
+            self.metrics_timer = QTimer(self)
+            self.metrics_timer.timeout.connect(self.dumpIoStats)
+            self.metrics_timer.start(int(IO_METRICS_DUMP_INTERVAL_S * 1000))
+
     def sendMotorCommand(self, command: str):
-        """Send a command to the motor and emit the response."""
+        """
+        Send a command to the motor and emit the response.
+        Runs as a coroutine on the Qt-integrated asyncio loop that awaits the
+        motor scheduler's job, so waiting for the reply does not block the GUI
+        (see utils/qt_asyncio.py). The command is an INTERACTIVE job on the
+        motor port's scheduler; XS/YS are EMERGENCY jobs that go ahead of any
+        queued poll or sequence command.
+        """
+        return qt_asyncio.submit(self._sendMotorCommand(command))
+
+    async def _sendMotorCommand(self, command: str):
         try:
-            response = self.motor_model.send_command(command)
-            self.motorResponseReceived.emit(response)
+            response = await self.motor_model.send_command_async(command)
+            self.motorResponseReceived.emit(response.display())
         except Exception as e:
             self.errorOccurred.emit(f"Error sending motor command: {e}")
 
@@ -50,11 +93,16 @@ class MainController(QObject):
         Send a command to the acquisition card and emit the response.
         Previously, this method only sent the command.
         Now it reads the response and emits it so that the Acq data display is updated.
+        Like sendMotorCommand, it runs as a coroutine awaiting the port's
+        scheduler job, so motor and acquisition exchanges overlap on their
+        scheduler threads instead of queuing on the GUI thread.
         """
+        return qt_asyncio.submit(self._sendAcqCommand(command))
+
+    async def _sendAcqCommand(self, command: str):
         try:
-            self.acq_model.send_serial_data(command)
-            # Read the response from the acq card
-            response = self.acq_model.read_serial_data()
+            # Send the command and read the response from the acq card as one job.
+            response = await self.acq_model.query_async(command)
             self.acqDataReceived.emit(response)
         except Exception as e:
             self.errorOccurred.emit(f"Error sending acq command: {e}")
@@ -67,53 +115,109 @@ class MainController(QObject):
         if self.acq_seq_thread and self.acq_seq_thread.isRunning():
             return
 
-        self.acq_seq_thread = QThread()
-        self.acq_seq_worker = AcqSequenceWorker(self.motor_model, self.acq_model)
+        # Parented to the controller, so dropping the reference from the finished handler
+        # does not destroy the thread while it is still finishing.
+        self.acq_seq_thread = QThread(self)
+        self.acq_seq_worker = AcqSequenceWorker(self.motor_model, self.acq_model, self.run_store)
         self.acq_seq_worker.moveToThread(self.acq_seq_thread)
         self.acq_seq_thread.started.connect(self.acq_seq_worker.run)
+        self.acq_seq_worker.dumpAcquired.connect(self.acqDumpReady.emit)
+        self.acq_seq_worker.dumpProgress.connect(self.acqDumpProgress.emit)
+        self.acq_seq_worker.errorOccurred.connect(self.errorOccurred.emit)
         self.acq_seq_worker.finished.connect(self.acqSequenceFinished.emit)
         self.acq_seq_worker.finished.connect(lambda: setattr(self, 'acq_seq_worker', None))
         self.acq_seq_worker.finished.connect(self.acq_seq_thread.quit)
         self.acq_seq_worker.finished.connect(self.acq_seq_worker.deleteLater)
+        # A sequence stopped before its end is finished on its own thread as the thread exits.
+        self.acq_seq_thread.finished.connect(self.acq_seq_worker.abandon, Qt.DirectConnection)
         self.acq_seq_thread.finished.connect(lambda: setattr(self, 'acq_seq_thread', None))
         self.acq_seq_thread.finished.connect(self.acq_seq_thread.deleteLater)
         self.acq_seq_thread.start()
 
+    def stopMotor(self, axis: str):
+        """Stop an axis with EMERGENCY priority; the reply is emitted like any motor response."""
+        return self.sendMotorCommand(f"{axis}S")
+
     def stopAcqSequence(self):
-        """Request a graceful stop of the acquisition sequence."""
+        """
+        Request a graceful stop of the acquisition sequence. When its thread
+        exits, a sequence that did not reach its end is finished (port released,
+        run committed or aborted). Waits at most WORKER_STOP_WAIT_MS for that.
+        """
         if self.acq_seq_worker:
             self.acq_seq_worker.stop()
         if self.acq_seq_thread:
-            self.acq_seq_thread.quit()
-            self.acq_seq_thread.wait()
+            self._stopThread(self.acq_seq_thread, "Acquisition sequence")
 
-    def runMotorParameterPoller(self):
+    def _stopThread(self, thread, name) -> bool:
+        """
+        Quit a worker thread and wait at most WORKER_STOP_WAIT_MS for it, so the
+        GUI thread never blocks on a worker stuck in an exchange or a port hold.
+        Returns False if the thread is still running.
+        """
+        thread.quit()
+        if thread.wait(WORKER_STOP_WAIT_MS):
+            return True
+        logger.warning("%s still busy after %d ms; it will end on its own thread.", name, WORKER_STOP_WAIT_MS)
+        return False
+
+    def runMotorParameterPoller(self, force: bool = False):
         """
         Start the motor parameter poller in its own thread to retrieve motor parameters.
+        Fresh values are served from the parameter cache unless `force` is set;
+        only changed parameters are emitted.
         """
         self.motor_poll_thread = QThread()
-        self.motor_poller = MotorParameterPollerSingle(self.motor_model)
+        self.motor_poller = MotorParameterPollerSingle(self.motor_model, force)
         self.motor_poller.moveToThread(self.motor_poll_thread)
         self.motor_poll_thread.started.connect(self.motor_poller.run)
         self.motor_poller.motorParametersUpdated.connect(self.motorParametersUpdated.emit)
         self.motor_poller.motorParametersUpdated.connect(self.motor_poll_thread.quit)
         self.motor_poll_thread.start()
 
-    def startProgramUpload(self, file_path: str, program_name: str):
+    def startProgramUpload(self, file_path: str, program_name: str, force: bool = False):
         """
-        Launch the program uploader in a separate thread.
+        Queue a program for upload. Programs queued while an upload runs are
+        sent back to back by the same worker thread; otherwise a new one is started.
+        Unless `force` is set, a program the upload ledger shows as already on
+        the controller with the same content is not transferred again.
         """
-        self.prog_upload_thread = QThread()
-        self.prog_uploader = ProgramUploader(self.motor_model, file_path, program_name)
+        if self.prog_uploader is not None and self.prog_uploader.enqueue(file_path, program_name, force):
+            return
+        # Parented to the controller: a thread still winding down after its
+        # queue drained stays alive when a new upload replaces the reference.
+        self.prog_upload_thread = QThread(self)
+        self.prog_uploader = ProgramUploader(self.motor_model, file_path, program_name,
+                                              self.upload_ledger, force)
         self.prog_uploader.moveToThread(self.prog_upload_thread)
         self.prog_upload_thread.started.connect(self.prog_uploader.upload)
-        self.prog_uploader.progressUpdated.connect(lambda msg: print(f"[Uploader] {msg}"))
+        self.prog_uploader.progressUpdated.connect(lambda msg: logger.info("[Uploader] %s", msg))
+        self.prog_uploader.progressUpdated.connect(self.programUploadProgress.emit)
         self.prog_uploader.errorOccurred.connect(self.errorOccurred.emit)
+        self.prog_uploader.finished.connect(self.programUploadFinished.emit)
         self.prog_uploader.finished.connect(self.prog_upload_thread.quit)
         self.prog_uploader.finished.connect(self.prog_uploader.deleteLater)
         self.prog_upload_thread.finished.connect(self.prog_upload_thread.deleteLater)
+        thread = self.prog_upload_thread
+        self.prog_upload_thread.finished.connect(lambda: self._onProgramUploadThreadFinished(thread))
         self.prog_upload_thread.start()
 
+    def startProgramUploads(self, programs, force: bool = False):
+        """Queue several (file path, program name) pairs; they are uploaded in order on one worker."""
+        for file_path, program_name in programs:
+            self.startProgramUpload(file_path, program_name, force)
+
+    def stopProgramUpload(self):
+        """Abort the running upload after the current block and drop the queued programs."""
+        if self.prog_uploader is not None:
+            self.prog_uploader.stop()
+
+    def _onProgramUploadThreadFinished(self, thread):
+        # sender() is not set for QThread.finished, so the thread is bound at connect time.
+        if thread is self.prog_upload_thread:
+            self.prog_upload_thread = None
+            self.prog_uploader = None
+
     def startAcqDataPoller(self):
         """
         Start the acquisition data poller in its own thread to poll the acq card and save data.
@@ -122,31 +226,92 @@ class MainController(QObject):
             return
 
         from controller.acq_data_poller import AcqDataPoller
-        self.acq_data_poll_thread = QThread()
-        self.acq_data_poll_worker = AcqDataPoller(self.acq_model)
+        self.acq_data_poll_thread = QThread(self)  # Parented: see startAcqSequence.
+        self.acq_data_poll_worker = AcqDataPoller(self.acq_model, self.run_store)
         self.acq_data_poll_worker.moveToThread(self.acq_data_poll_thread)
         self.acq_data_poll_thread.started.connect(self.acq_data_poll_worker.run)
+        self.acq_data_poll_worker.dumpAcquired.connect(lambda data: self.acqDumpReady.emit("requested", data))
+        self.acq_data_poll_worker.dumpProgress.connect(lambda data: self.acqDumpProgress.emit("requested", data))
+        self.acq_data_poll_worker.errorOccurred.connect(self.errorOccurred.emit)
         self.acq_data_poll_worker.finished.connect(lambda: self.acqDataReceived.emit("Acquisition poll finished."))
         self.acq_data_poll_worker.finished.connect(self.acq_data_poll_thread.quit)
         self.acq_data_poll_worker.finished.connect(self.acq_data_poll_worker.deleteLater)
+        self.acq_data_poll_thread.finished.connect(self.acq_data_poll_worker.abandon, Qt.DirectConnection)
         self.acq_data_poll_thread.finished.connect(lambda: setattr(self, 'acq_data_poll_thread', None))
         self.acq_data_poll_thread.finished.connect(self.acq_data_poll_thread.deleteLater)
         self.acq_data_poll_thread.start()
 
+    def exportRunCsv(self, run_id: str = None, directory: str = "."):
+        """
+        Export a run (default: the latest one) to the legacy one-word-per-row CSV files.
+        Returns the list of written paths.
+        """
+        try:
+            record = self.run_store.get(run_id) if run_id else self.run_store.latest()
+            if record is None:
+                raise Exception("no such run")
+            return self.run_store.export_csv(record["run_id"], directory)
+        except Exception as e:
+            self.errorOccurred.emit(f"Error exporting run to CSV: {e}")
+            return []
+
+    def startSerialCapture(self, directory: str = None) -> list:
+        """
+        Record the traffic of both ports to trace files in `directory` (default:
+        SERIAL_CAPTURE_DIR or the working directory). Returns the trace paths;
+        replay them with MainController("replay://<motor trace>", "replay://<acq trace>").
+        """
+        return [handler.start_capture(directory=directory)
+                for handler in (self.motor_model.serial_handler, self.acq_model.serial_handler)]
+
+    def stopSerialCapture(self):
+        self.motor_model.serial_handler.stop_capture()
+        self.acq_model.serial_handler.stop_capture()
+
+    def ioStats(self) -> dict:
+        """
+        Snapshot of the serial I/O metrics: per port, bytes in/out and per command
+        type the exchange, timeout, NAK, error and retry counts with latency percentiles.
+        """
+        return io_metrics.snapshot()
+
+    def ioStatsPrometheus(self) -> str:
+        """The I/O metrics in the Prometheus text format."""
+        return io_metrics.to_prometheus()
+
+    def resetIoStats(self):
+        io_metrics.reset()
+
+    def setIoMetricsEnabled(self, enabled: bool):
+        """Switch metric recording on or off (the counters are kept)."""
+        io_metrics.enabled = bool(enabled)
+
+    def dumpIoStats(self, directory: str = IO_METRICS_DIR):
+        """Write io_metrics.json and io_metrics.prom to `directory`."""
+        if not io_metrics.enabled:
+            return
+        try:
+            io_metrics.write_files(directory)
+        except Exception as e:
+            logger.warning("Could not write I/O metrics to %s: %s", directory, e)
+
     def cleanup(self):
         """Clean up and stop all threads and close serial ports."""
-        if self.acq_seq_worker:
-            self.acq_seq_worker.stop()
-        if self.acq_seq_thread:
-            self.acq_seq_thread.quit()
-            self.acq_seq_thread.wait()
-        if self.motor_poll_thread:
-            self.motor_poll_thread.quit()
-            self.motor_poll_thread.wait()
-        if self.acq_data_poll_worker:
-            self.acq_data_poll_worker.stop()
-        if self.acq_data_poll_thread:
-            self.acq_data_poll_thread.quit()
-            self.acq_data_poll_thread.wait()
+        if self.metrics_timer:
+            self.metrics_timer.stop()
+            self.dumpIoStats()
+        for worker in (self.acq_seq_worker, self.prog_uploader, self.acq_data_poll_worker):
+            if worker:
+                worker.stop()
+        threads = [(thread, name) for thread, name in ((self.acq_seq_thread, "Acquisition sequence"),
+                                                       (self.motor_poll_thread, "Motor parameter poll"),
+                                                       (self.prog_upload_thread, "Program upload"),
+                                                       (self.acq_data_poll_thread, "Acquisition poll"))
+                   if thread]
+        busy = [(thread, name) for thread, name in threads if not self._stopThread(thread, name)]
         self.motor_model.close()
         self.acq_model.close()
+        # Closing the ports ends the exchanges (and port holds) the busy workers were waiting for.
+        for thread, name in busy:
+            if not thread.wait(WORKER_STOP_WAIT_MS):
+                logger.error("%s thread did not exit.", name)
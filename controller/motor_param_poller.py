@@ -1,5 +1,20 @@
 from PyQt5.QtCore import QObject, pyqtSignal
 import time
+from model.command_scheduler import BACKGROUND
+
+# The 49 parameters of both motors, as (axis, number) pairs.
+PARAMETERS = [(axis, i) for i in range(1, 50) for axis in ("X", "Y")]
+
+
+def poll_parameters(motor_model, force=False):
+    """
+    Refresh all motor parameters through the model's parameter cache (stale or
+    invalidated entries are read in one pipelined batch, at BACKGROUND priority)
+    and return only the entries that changed, keyed for display: {"X1": response, ...}.
+    """
+    changed = motor_model.refresh_parameters(PARAMETERS, force=force, priority=BACKGROUND)
+    return {f"{axis}{number}": response for (axis, number), response in changed.items()}
+
 
 class MotorParameterPoller(QObject):
     """
@@ -22,11 +37,9 @@ class MotorParameterPoller(QObject):
     def run(self):
         while self._running:
             try:
-                responses = {}
-                for i in range(1, 50):  # 1 through 49
-                    responses[f"X{i}"] = self.motor_model.send_command(f"XP{i:02d}R")
-                    responses[f"Y{i}"] = self.motor_model.send_command(f"YP{i:02d}R")
-                self.motorParametersUpdated.emit(responses)
+                changed = poll_parameters(self.motor_model)
+                if changed:
+                    self.motorParametersUpdated.emit(changed)
             except Exception as e:
                 self.errorOccurred.emit(f"Error in MotorParameterPoller: {e}")
             time.sleep(self.poll_interval)
@@ -37,29 +50,23 @@ class MotorParameterPoller(QObject):
 
 class MotorParameterPollerSingle(QObject):
     """
-    Worker that polls motor parameters one time (1..49) but emits each pair as soon as it’s available.
+    Worker that polls motor parameters one time (1..49) in a single pipelined
+    batch and emits the entries that changed.
     """
     motorParametersUpdated = pyqtSignal(dict)
     errorOccurred = pyqtSignal(str)
 
-    def __init__(self, motor_model):
+    def __init__(self, motor_model, force=False):
+        """
+        :param motor_model: Instance of MotorModel to use for sending commands.
+        :param force: Re-read every parameter instead of serving fresh ones from the cache.
+        """
         super().__init__()
         self.motor_model = motor_model
+        self.force = force
 
     def run(self):
-        all_responses = {}
         try:
-            for i in range(1, 50):
-                x_resp = self.motor_model.send_command(f"XP{i:02d}R")
-                y_resp = self.motor_model.send_command(f"YP{i:02d}R")
-                all_responses[f"X{i}"] = x_resp
-                all_responses[f"Y{i}"] = y_resp
-                # Emit partial update.
-                self.motorParametersUpdated.emit({
-                    f"X{i}": x_resp,
-                    f"Y{i}": y_resp
-                })
+            self.motorParametersUpdated.emit(poll_parameters(self.motor_model, self.force))
         except Exception as e:
             self.errorOccurred.emit(f"Error in MotorParameterPollerSingle: {e}")
-        # Optionally, you can emit the complete dictionary.
-        # self.motorParametersUpdated.emit(all_responses)
@@ -0,0 +1,32 @@
+# controller/profile_loader.py
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def load_latest_profiles(run_store, labels=("X", "Y")) -> dict:
+    """
+    Load the most recent profile of each label (latest archived run, else the
+    legacy acquired_data_<label>.csv). Meant to run as an analysis job so the
+    window can show previous data without reading files on the GUI thread.
+
+    :return: {label: flat uint16 array} for the labels that could be loaded.
+    """
+    from utils.analysis import csv_profile_words
+    profiles = {}
+    for label in labels:
+        try:
+            record = run_store.latest(label)
+            if record is not None:
+                words = run_store.load_profile(record["run_id"], label, mmap=False).ravel()
+            else:
+                words = csv_profile_words(f"acquired_data_{label}.csv")
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            logger.warning("Could not load previous %s profile: %s", label, e)
+            continue
+        profiles[label] = words
+    logger.debug("Previous profiles loaded: %s.", ', '.join(profiles) or 'none')
+    return profiles
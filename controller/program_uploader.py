@@ -5,17 +5,33 @@ using the following protocol (now using the motor_model.send_command method):
 
   1. Header frame:
        <STX>controller_address + "QP" + program_name + " S" + byte_count + <ETX>
-     Controller response (after conversion by send_command):
-       "<STX><ACK>O<ETX>"  – if the program does not exist and RAM is sufficient
-       "<STX><ACK>E<ETX>"  – if the program exists (overwrite required)
+     Controller response (a MotorResponse from send_command):
+       ACK with payload "O"  – if the program does not exist and RAM is sufficient
+       ACK with payload "E"  – if the program exists (overwrite required)
 
   2. Program transmission:
        - Block 1: program name + ETB + first (256 - (len(program_name)+1)) characters
          of data (if needed, padded with EOT to 256 characters).
        - Subsequent blocks: Each 256-character block (padded with EOT as needed).
        - Each block is sent by calling send_command with the payload.
-       - After each block, the controller is expected to respond with:
-             "<STX><ACK><ETX>"
+       - After each block, the controller is expected to respond with an
+         empty ACK frame: <STX><ACK><ETX>
+
+  Every successful upload is recorded in the upload ledger (model/upload_ledger.py).
+  Before the header is sent the ledger is checked: if the last successful
+  upload of this program to this controller had the same content hash, nothing
+  is sent at all (the header would open an upload that must then be completed).
+  `force` uploads the program regardless, e.g. after the controller's program
+  memory has been cleared behind the ledger's back.
+
+  The file is read in chunks and line numbers are stripped chunk-wise, once:
+  the stripped content is kept with its hash and size, per file (path, size,
+  mtime) and per content hash, so a repeated upload of an unchanged file
+  neither re-reads nor re-strips it. The blocks are framed one at a time from
+  that content as they are sent.
+
+  One uploader runs a queue of programs back to back (enqueue()), reporting
+  the transfer rate and ETA of each through progressUpdated.
 
 Note:
   In this rewritten uploader we treat all data as text (assuming ASCII) so that
@@ -24,32 +40,54 @@ Note:
 """
 
 import re
+import os
 import time
+import hashlib
+import threading
 import logging
+from collections import OrderedDict, deque
 from PyQt5.QtCore import QObject, pyqtSignal
+from model.command_scheduler import SEQUENCE, CommandTimeoutError
+from config import PORT_HOLD_TIMEOUT
 
 logger = logging.getLogger(__name__)
 
+# Leading line number (and the blanks after it) of every line.
+LINE_NUMBER = re.compile(r'^\d+[^\S\n]*', re.MULTILINE)
+# Characters read from the file per pipeline step.
+READ_CHUNK_CHARS = 64 * 1024
+BLOCK_SIZE = 256
+
+# Prepared programs kept in memory: (path, size, mtime) -> content hash, and
+# content hash -> stripped content (shared by files with the same content).
+PREPARED_CACHE_ENTRIES = 32
+_prepared = OrderedDict()
+_prepared_content = OrderedDict()
+_prepared_lock = threading.Lock()
+
 
 class ProgramUploader(QObject):
-    finished = pyqtSignal()
+    finished = pyqtSignal()  # The queue is empty (every program was uploaded, skipped or failed)
     errorOccurred = pyqtSignal(str)
     progressUpdated = pyqtSignal(str)  # For updating UI progress messages
 
-    def __init__(self, motor_model, file_path, program_name, parent=None):
+    def __init__(self, motor_model, file_path, program_name, ledger=None, force=False, parent=None):
         """
         :param motor_model: Instance of MotorModel to use for serial I/O.
                             Now, this uploader uses motor_model.send_command.
         :param file_path: Path to the .txt file to be uploaded.
         :param program_name: The program name (maximum 8 characters). It will not be padded
                              with blanks if shorter than 8 characters.
+        :param ledger: UploadLedger of successful uploads (None: always transfer, record nothing).
+        :param force: Transfer the program even if the ledger shows the controller already has it.
         """
         super().__init__(parent)
         self.motor_model = motor_model
-        self.file_path = file_path
-        # Keep only up to 8 characters without padding.
-        self.program_name = program_name.strip()[:8]
+        self.ledger = ledger
         self._running = True
+        self._queue = deque()  # (file_path, program_name, force) still to upload
+        self._queue_lock = threading.Lock()
+        self._accepting = True
 
         # Define control characters as strings (using their ASCII characters).
         self.STX = chr(0x02)
@@ -61,94 +99,238 @@ class ProgramUploader(QObject):
         # The motor model already uses controller address 0x30 (which is the character '0').
         self.CONTROLLER_ADDRESS = '0'
 
-    def remove_line_numbers(self, text):
+        # The program being uploaded.
+        self.file_path = None
+        self.program_name = None
+        self.force = False
+        self.enqueue(file_path, program_name, force)
+
+    def enqueue(self, file_path, program_name, force=False) -> bool:
+        """
+        Add a program to upload after the queued ones. Can be called from any
+        thread while the upload runs; returns False once the uploader has
+        finished its queue (start a new one then).
+        """
+        with self._queue_lock:
+            if not self._accepting:
+                return False
+            # Keep only up to 8 characters without padding.
+            self._queue.append((file_path, program_name.strip()[:8], force))
+            return True
+
+    def pending(self) -> int:
+        """Number of programs queued after the current one."""
+        with self._queue_lock:
+            return len(self._queue)
+
+    def stop(self):
+        """Abort after the block being sent; the queued programs are dropped."""
+        self._running = False
+
+    def _next_program(self):
+        with self._queue_lock:
+            if not self._queue or not self._running:
+                self._accepting = False
+                self._queue.clear()
+                return False
+            self.file_path, self.program_name, self.force = self._queue.popleft()
+            return True
+
+    @staticmethod
+    def remove_line_numbers(text):
         """
         Remove any leading line numbers from each line.
         Assumes the line number is at the beginning of the line followed by whitespace.
         """
-        lines = text.splitlines()
-        cleaned_lines = [re.sub(r'^\d+\s*', '', line) for line in lines]
-        return "\n".join(cleaned_lines)
+        return LINE_NUMBER.sub('', "\n".join(text.splitlines()))
+
+    def stream_content(self):
+        """
+        Yield the file's content with line numbers removed, chunk by chunk.
+        Line endings are normalized to "\\n" and a final line ending is dropped,
+        as in remove_line_numbers(). Chunks always end on a line boundary, so
+        the regex sees whole lines.
+        """
+        try:
+            with open(self.file_path, 'r', encoding='ascii') as f:
+                tail = ""
+                separator = ""
+                while True:
+                    chunk = f.read(READ_CHUNK_CHARS)
+                    if not chunk:
+                        break
+                    tail += chunk
+                    end = tail.rfind("\n")
+                    if end < 0:
+                        continue
+                    lines, tail = tail[:end], tail[end + 1:]
+                    yield separator + LINE_NUMBER.sub('', lines)
+                    separator = "\n"
+                if tail:
+                    yield separator + LINE_NUMBER.sub('', tail)
+        except (OSError, UnicodeDecodeError) as e:
+            raise Exception(f"Error reading file: {e}")
 
     def read_file_content(self):
         """
         Read the file, remove line numbers, and return the content as an ASCII string.
         """
+        return "".join(self.stream_content())
+
+    def frame_blocks(self, chunks):
+        """
+        Turn content chunks into protocol blocks as they arrive:
+          Block 1: program name + ETB + first (256 - (len(program_name)+1)) characters of data.
+          Then 256-character blocks; every block but a single short block 1 is padded with EOT.
+        """
+        pending = self.program_name + self.ETB
+        first = True
+        for chunk in chunks:
+            pending += chunk
+            while len(pending) > BLOCK_SIZE or (not first and len(pending) == BLOCK_SIZE):
+                yield pending[:BLOCK_SIZE]
+                pending = pending[BLOCK_SIZE:]
+                first = False
+        if first:
+            # Entire file fits in Block 1; no padding with EOT is needed.
+            yield pending
+        elif pending:
+            yield pending.ljust(BLOCK_SIZE, self.EOT)
+
+    def prepare(self):
+        """
+        Return (content hash, stripped content), from the cache if the file has
+        not changed since it was last prepared (or has the content of another
+        prepared file).
+        """
         try:
-            with open(self.file_path, 'r', encoding='ascii') as f:
-                content = f.read()
-            content = self.remove_line_numbers(content)
-            return content
-        except Exception as e:
+            stat = os.stat(self.file_path)
+        except OSError as e:
             raise Exception(f"Error reading file: {e}")
+        key = (os.path.abspath(self.file_path), stat.st_size, stat.st_mtime_ns)
+        with _prepared_lock:
+            digest = _prepared.get(key)
+            if digest is not None and digest in _prepared_content:
+                _prepared.move_to_end(key)
+                _prepared_content.move_to_end(digest)
+                return digest, _prepared_content[digest]
+        hasher = hashlib.sha256()
+        chunks = []
+        for chunk in self.stream_content():
+            hasher.update(chunk.encode('ascii'))
+            chunks.append(chunk)
+        digest = hasher.hexdigest()
+        with _prepared_lock:
+            content = _prepared_content.setdefault(digest, "".join(chunks))
+            _prepared_content.move_to_end(digest)
+            _prepared[key] = digest
+            _prepared.move_to_end(key)
+            while len(_prepared) > PREPARED_CACHE_ENTRIES:
+                _prepared.popitem(last=False)
+            while len(_prepared_content) > PREPARED_CACHE_ENTRIES:
+                _prepared_content.popitem(last=False)
+        return digest, content
+
+    def block_count(self, total_chars):
+        first_chunk_size = BLOCK_SIZE - (len(self.program_name) + 1)
+        if total_chars <= first_chunk_size:
+            return 1
+        return 1 + -(-(total_chars - first_chunk_size) // BLOCK_SIZE)
+
+    def controller_id(self):
+        """Identity of the target controller in the ledger: motor port and controller address."""
+        return f"{self.motor_model.serial_handler.port}#{self.CONTROLLER_ADDRESS}"
 
     def upload(self):
-        """Main method that performs the program upload using motor_model.send_command."""
+        """
+        Upload every queued program, one after the other, using motor_model.send_command.
+        The motor port is held for each program, so no other command (except a
+        stop) is interleaved with its header and blocks; between two programs
+        the commands queued meanwhile (GUI, acquisition sequence) run.
+        """
         try:
-            # === Step 1. Read file and build header payload ===
-            file_text = self.read_file_content()
-            total_chars = len(file_text)  # For ASCII, character count equals byte count.
-            self.progressUpdated.emit(f"File read: {total_chars} bytes.")
-
-            # Build header payload: "QP" + program_name + " S" + byte_count (in ascii)
-            header_payload = "QP" + self.program_name + " S" + str(total_chars)
-            self.progressUpdated.emit("Sending header frame...")
-            header_resp = self.motor_model.send_command(header_payload)
-            # For send_command, control characters are replaced by markers, so we expect:
-            # "<STX><ACK>O<ETX>" or "<STX><ACK>E<ETX>"
-            if not (header_resp.startswith("<STX><ACK>") and header_resp.endswith("<ETX>")):
-                raise Exception(f"Invalid header response: {header_resp}")
-            # Extract the response code (the character between <ACK> and <ETX>).
-            response_code = header_resp[len("<STX><ACK>"):-len("<ETX>")]
-            if response_code not in ["O", "E"]:
-                raise Exception(f"Unexpected header response code: {response_code}")
-            self.progressUpdated.emit(f"Controller response: {response_code}")
-
-            # === Step 2. Prepare the program blocks ===
-            # The protocol for Block 1:
-            #   Block 1 payload: program name + ETB + first (256 - (len(program_name)+1)) characters of data.
-            header_block_size = len(self.program_name) + 1  # program name + ETB
-            first_chunk_size = 256 - header_block_size
-
-            blocks = []
-            if total_chars <= first_chunk_size:
-                # Entire file fits in Block 1; no padding with EOT is needed.
-                block1 = self.program_name + self.ETB + file_text
-                blocks.append(block1)
-            else:
-                first_chunk = file_text[:first_chunk_size]
-                block1 = self.program_name + self.ETB + first_chunk
-                # Pad block1 to 256 characters if needed.
-                if len(block1) < 256:
-                    block1 = block1.ljust(256, self.EOT)
-                blocks.append(block1)
-
-                remaining_text = file_text[first_chunk_size:]
-                # Build subsequent 256-character blocks.
-                for i in range(0, len(remaining_text), 256):
-                    block = remaining_text[i:i + 256]
-                    if len(block) < 256:
-                        block = block.ljust(256, self.EOT)
-                    blocks.append(block)
-
-            # === Step 3. Transmit each block ===
-            block_number = 1
-            expected_block_response = "<STX><ACK><ETX>"
-            for block in blocks:
-                print(block)
-                self.progressUpdated.emit(f"Sending block {block_number}...")
-                # Send the block payload (the motor_model.send_command method will wrap it).
-                block_resp = self.motor_model.send_command(block)
-                if block_resp != expected_block_response:
-                    raise Exception(f"Invalid response for block {block_number}: {block_resp}")
-                self.progressUpdated.emit(f"Block {block_number} transmitted successfully.")
-                block_number += 1
-
-            self.progressUpdated.emit("Program upload completed successfully.")
+            while self._next_program():
+                # Let the jobs queued while the previous program held the port run first:
+                # this empty job is dispatched after them.
+                try:
+                    self.motor_model.scheduler.call(lambda: None, priority=SEQUENCE)
+                    held = self.motor_model.scheduler.hold(self, PORT_HOLD_TIMEOUT)
+                except CommandTimeoutError:
+                    held = False
+                if not held:
+                    self.errorOccurred.emit(f"Motor port busy; upload of '{self.program_name}' "
+                                            "and the queued programs abandoned.")
+                    self.stop()
+                    continue  # Stopped: the next _next_program() drops the queue.
+                try:
+                    self.upload_program()
+                except Exception as e:
+                    error_msg = f"Program upload error ({self.program_name}): {e}"
+                    logger.error(error_msg)
+                    self.errorOccurred.emit(error_msg)
+                finally:
+                    self.motor_model.scheduler.release(self)
+        finally:
             self.finished.emit()
 
-        except Exception as e:
-            error_msg = f"Program upload error: {e}"
-            logger.error(error_msg)
-            self.errorOccurred.emit(error_msg)
-            self.finished.emit()
+    def upload_program(self):
+        """
+        Upload the current program (the caller holds the motor port). Raises on a
+        protocol or file error; returns early if the uploader is stopped or the
+        ledger shows the controller already has this content.
+        """
+        # === Step 1. Strip and hash the content (or take it from the cache) ===
+        digest, content = self.prepare()
+        total_chars = len(content)  # For ASCII, character count equals byte count.
+        total_blocks = self.block_count(total_chars)
+        queued = self.pending()
+        self.progressUpdated.emit(f"Program '{self.program_name}': {total_chars} bytes, {total_blocks} blocks"
+                                  + (f" ({queued} more queued)." if queued else "."))
+
+        # === Step 2. Skip the transfer if the controller already has this content ===
+        # Checked before the header, which would open an upload that has to be completed.
+        controller = self.controller_id()
+        if (not self.force and self.ledger is not None
+                and self.ledger.is_current(self.program_name, controller, digest)):
+            self.progressUpdated.emit(f"Program '{self.program_name}' is unchanged since its last upload "
+                                      "to this controller; upload skipped.")
+            return
+
+        # === Step 3. Send the header ===
+
+        # Build header payload: "QP" + program_name + " S" + byte_count (in ascii)
+        header_payload = "QP" + self.program_name + " S" + str(total_chars)
+        self.progressUpdated.emit("Sending header frame...")
+        header_resp = self.motor_model.send_command(header_payload, SEQUENCE, self)
+        # We expect an ACK frame carrying the response code "O" or "E".
+        if not header_resp.ok:
+            raise Exception(f"Invalid header response: {header_resp.display()}")
+        response_code = header_resp.text
+        if response_code not in ["O", "E"]:
+            raise Exception(f"Unexpected header response code: {response_code}")
+        self.progressUpdated.emit(f"Controller response: {response_code}")
+
+        # === Step 4. Frame and transmit the blocks ===
+        start = time.perf_counter()
+        sent_chars = 0
+        for block_number, block in enumerate(self.frame_blocks((content,)), 1):
+            if not self._running:
+                self.progressUpdated.emit(f"Upload of '{self.program_name}' stopped.")
+                return
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Block %d: %r", block_number, block)
+            # Send the block payload (the motor_model.send_command method will wrap it).
+            block_resp = self.motor_model.send_command(block, SEQUENCE, self)
+            if not block_resp.ok or block_resp.payload:
+                raise Exception(f"Invalid response for block {block_number}: {block_resp.display()}")
+            sent_chars = min(total_chars, sent_chars + len(block)
+                             - (len(self.program_name) + 1 if block_number == 1 else 0))
+            elapsed = time.perf_counter() - start
+            rate = sent_chars / elapsed if elapsed > 0 else 0.0
+            eta = (total_chars - sent_chars) / rate if rate > 0 else 0.0
+            self.progressUpdated.emit(f"Block {block_number}/{total_blocks} transmitted "
+                                      f"({sent_chars}/{total_chars} bytes, {rate:.0f} B/s, ETA {eta:.1f} s).")
+
+        if self.ledger is not None:
+            self.ledger.record(self.program_name, controller, digest, total_chars)
+        self.progressUpdated.emit(f"Program '{self.program_name}' upload completed successfully.")
@@ -0,0 +1,69 @@
+# emulator/acq_emulator.py
+
+import math
+import time
+import logging
+from emulator.pty_device import PtyDevice
+
+logger = logging.getLogger(__name__)
+
+DUMP_LINES = 128
+WORDS_PER_LINE = 16
+
+
+def build_dump_lines(seed: int = 0):
+    """
+    Build a deterministic dump (128 lines of 16 comma-separated hex words)
+    shaped like a Gaussian beam profile so plots look realistic.
+    """
+    total = DUMP_LINES * WORDS_PER_LINE
+    centre = total / 2 + seed * 37
+    sigma = total / 8
+    words = []
+    for i in range(total):
+        value = 1000 + 40000 * math.exp(-((i - centre) ** 2) / (2 * sigma ** 2))
+        value += (i * 7919 + seed * 104729) % 97  # deterministic "noise"
+        words.append(f"{int(value) & 0xFFFF:04X}")
+    return [",".join(words[i:i + WORDS_PER_LINE]) for i in range(0, total, WORDS_PER_LINE)]
+
+
+class AcqEmulator(PtyDevice):
+    """
+    Emulates the acquisition card protocol (commands terminated by CR, replies by CRLF):
+      - "A"          status poll: "B" while an armed acquisition is running, "F" once finished
+      - "SC,xxx,yyy" arm an acquisition: replies "OK"
+      - "D"          dump: 128 lines of 16 comma-separated hex words
+      - anything else replies "ERR"
+    :param acquisition_time: Seconds between an SC command and the card reporting "F".
+    """
+    def __init__(self, baud_rate=9600, latency=0.0, acquisition_time=0.2):
+        super().__init__(baud_rate, latency)
+        self.acquisition_time = acquisition_time
+        self._buffer = b""
+        self._armed_at = None
+        self._dump_count = 0
+
+    def feed(self, data: bytes):
+        self._buffer += data
+        while b'\r' in self._buffer:
+            raw, _, self._buffer = self._buffer.partition(b'\r')
+            command = raw.decode('latin-1').strip()
+            if command:
+                self.handle_command(command, len(raw) + 1)
+
+    def handle_command(self, command: str, request_len: int):
+        if command == "A":
+            running = (self._armed_at is not None and
+                       time.perf_counter() - self._armed_at < self.acquisition_time)
+            self.record(command, request_len, b"B\r\n" if running else b"F\r\n")
+        elif command.startswith("SC,"):
+            self._armed_at = time.perf_counter()
+            self.record(command, request_len, b"OK\r\n")
+        elif command == "D":
+            lines = build_dump_lines(self._dump_count)
+            self._dump_count += 1
+            payload = "".join(line + "\r\n" for line in lines).encode('ascii')
+            # Written one line at a time so the host sees the dump stream in.
+            self.record(command, request_len, payload, chunk_size=len(lines[0]) + 2)
+        else:
+            self.record(command, request_len, b"ERR\r\n")
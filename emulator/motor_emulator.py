@@ -0,0 +1,117 @@
+# emulator/motor_emulator.py
+
+import re
+import time
+import logging
+from emulator.pty_device import PtyDevice
+
+logger = logging.getLogger(__name__)
+
+STX = b'\x02'
+ETX = b'\x03'
+EOT = '\x04'
+ETB = '\x17'
+ACK = b'\x06'
+NAK = b'\x15'
+
+PARAM_READ = re.compile(r'^([XY])P(\d{2})R$')
+PARAM_WRITE = re.compile(r'^([XY])P(\d{2})[S=](.+)$')
+MOTION = re.compile(r'^([XY])(0[+-]|[+-]\d+|S)$')
+STANDSTILL = re.compile(r'^([XY])=H$')
+
+
+class MotorEmulator(PtyDevice):
+    """
+    Emulates the motor controller protocol:
+      - Request frames:  <STX> '0' payload <ETX>
+      - Reply frames:    <STX> <ACK> [data] <ETX>   or   <STX> <NAK> <ETX>
+    Supported payloads:
+      - "XPnnR" / "YPnnR"    parameter reads (deterministic values)
+      - "XPnnS<value>"       parameter writes (also accepted as "XPnn=<value>")
+      - "X0+", "X-400", "XS" motion and stop commands (acknowledged immediately;
+                             the axis then moves for homing_time seconds, or
+                             |steps| / steps_per_second for relative moves)
+      - "X=H" / "Y=H"        standstill query: "E" when the axis is stopped, "N" while moving
+      - "QP<name> S<count>"  program upload header, followed by 256-character blocks
+    """
+    def __init__(self, baud_rate=9600, latency=0.0, homing_time=1.5, steps_per_second=400):
+        super().__init__(baud_rate, latency)
+        self.homing_time = homing_time
+        self.steps_per_second = steps_per_second
+        self.moving_until = {"X": 0.0, "Y": 0.0}
+        self._buffer = b""
+        self.parameters = {(axis, n): str(n * 10 + (0 if axis == "X" else 1))
+                           for axis in ("X", "Y") for n in range(1, 50)}
+        self.programs = {}
+        self._upload = None  # [program_name, remaining_chars, chunks] while receiving blocks
+
+    def feed(self, data: bytes):
+        self._buffer += data
+        while True:
+            start = self._buffer.find(STX)
+            if start < 0:
+                self._buffer = b""
+                return
+            end = self._buffer.find(ETX, start)
+            if end < 0:
+                self._buffer = self._buffer[start:]
+                return
+            frame = self._buffer[start:end + 1]
+            self._buffer = self._buffer[end + 1:]
+            self.handle_frame(frame)
+
+    def handle_frame(self, frame: bytes):
+        # Strip STX, controller address and ETX.
+        payload = frame[2:-1].decode('latin-1')
+        if self._upload is not None:
+            self.record("QP block", len(frame), self._handle_block(payload))
+            return
+        self.record(payload, len(frame), self._handle_command(payload))
+
+    def _handle_command(self, payload: str) -> bytes:
+        match = PARAM_READ.match(payload)
+        if match:
+            value = self.parameters.get((match.group(1), int(match.group(2))))
+            if value is None:
+                return STX + NAK + ETX
+            return STX + ACK + value.encode('ascii') + ETX
+        match = PARAM_WRITE.match(payload)
+        if match:
+            self.parameters[(match.group(1), int(match.group(2)))] = match.group(3)
+            return STX + ACK + ETX
+        match = MOTION.match(payload)
+        if match:
+            axis, motion = match.groups()
+            now = time.monotonic()
+            if motion == "S":
+                self.moving_until[axis] = now
+            elif motion in ("0+", "0-"):
+                self.moving_until[axis] = now + self.homing_time
+            else:
+                self.moving_until[axis] = now + abs(int(motion)) / self.steps_per_second
+            return STX + ACK + ETX
+        match = STANDSTILL.match(payload)
+        if match:
+            stopped = time.monotonic() >= self.moving_until[match.group(1)]
+            return STX + ACK + (b"E" if stopped else b"N") + ETX
+        if payload.startswith("QP") and " S" in payload:
+            name, _, count = payload[2:].rpartition(" S")
+            if not count.isdigit():
+                return STX + NAK + ETX
+            code = b"E" if name in self.programs else b"O"
+            self._upload = [name, int(count), []]
+            return STX + ACK + code + ETX
+        return STX + NAK + ETX
+
+    def _handle_block(self, payload: str) -> bytes:
+        name, remaining, chunks = self._upload
+        if not chunks and payload.startswith(name + ETB):
+            payload = payload[len(name) + 1:]
+        data = payload.rstrip(EOT)
+        chunks.append(data)
+        remaining -= len(data)
+        self._upload[1] = remaining
+        if remaining <= 0:
+            self.programs[name] = "".join(chunks)
+            self._upload = None
+        return STX + ACK + ETX
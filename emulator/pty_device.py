@@ -0,0 +1,111 @@
+# emulator/pty_device.py
+
+import os
+import select
+import threading
+import time
+import tty
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PtyDevice:
+    """
+    Base class for a serial device emulated behind a pseudo-terminal.
+
+    The emulator owns the master side of a pty pair; the slave path (``port``)
+    can be handed to SerialHandler / pyserial exactly like a real COM port.
+    Subclasses implement ``feed(data)`` and reply through ``reply(data)``.
+
+    Replies are paced to the configured baud rate (10 bits per byte) and delayed
+    by a fixed turnaround latency so benchmark results reflect the real wire.
+    Every request is recorded in ``events`` as
+    (timestamp, command, bytes_in, bytes_out, reply_done_timestamp).
+    """
+    def __init__(self, baud_rate=9600, latency=0.0):
+        self.baud_rate = baud_rate
+        self.latency = latency
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.slave_fd)
+        self.port = os.ttyname(self.slave_fd)
+        self.events = []
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"{type(self).__name__}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        for fd in (self.master_fd, self.slave_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def reset_stats(self):
+        self.events = []
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def _run(self):
+        while self._running:
+            try:
+                ready, _, _ = select.select([self.master_fd], [], [], 0.05)
+                if not ready:
+                    continue
+                data = os.read(self.master_fd, 4096)
+            except OSError:
+                break
+            if data:
+                if self.baud_rate:
+                    # The host side is not rate limited by the pty; account for
+                    # the time these bytes would have spent on the wire.
+                    time.sleep(len(data) * 10.0 / self.baud_rate)
+                self.bytes_in += len(data)
+                self.feed(data)
+
+    def feed(self, data: bytes):
+        raise NotImplementedError
+
+    def record(self, command: str, request_len: int, reply: bytes, chunk_size: int = None):
+        """Send a reply for one request and record the exchange."""
+        received_at = time.perf_counter()
+        if self.latency:
+            time.sleep(self.latency)
+        self.reply(reply, chunk_size)
+        self.events.append((received_at, command, request_len, len(reply), time.perf_counter()))
+
+    def reply(self, data: bytes, chunk_size: int = None):
+        """
+        Write data to the host, paced to the emulated baud rate.
+        When chunk_size is given the data is written in pieces of that size so
+        the host sees it arrive progressively (e.g. one dump line at a time).
+        """
+        chunk_size = chunk_size or len(data) or 1
+        for i in range(0, len(data), chunk_size):
+            chunk = data[i:i + chunk_size]
+            if self.baud_rate:
+                time.sleep(len(chunk) * 10.0 / self.baud_rate)
+            try:
+                os.write(self.master_fd, chunk)
+            except OSError as e:
+                logger.error("Emulator write failed on %s: %s", self.port, e)
+                return
+            self.bytes_out += len(chunk)
+
+    # Context manager support.
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -1,9 +1,104 @@
 # logging_config.py
+"""
+Logging pipeline.
+
+Every logger in the application hands its records to a QueueHandler (a
+queue.put, no formatting, no console I/O); a QueueListener thread formats
+them and writes them to the console. Code on the serial timing path (the
+port reader, command exchanges, pollers) therefore never waits on stderr.
+
+Full wire traces (every byte written to / read from a port) go to the
+separate "wire" logger, which is disabled unless a trace is requested with
+enable_wire_trace(): the records are then kept in an in-memory ring buffer
+of the last `capacity` entries and can be read back with wire_trace().
+"""
+
+import atexit
+import collections
 import logging
+import logging.handlers
+import queue
+from config import LOG_LEVEL, WIRE_TRACE_CAPACITY
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Serial byte-level traces; see enable_wire_trace().
+wire_logger = logging.getLogger("wire")
+wire_logger.propagate = False
+wire_logger.setLevel(logging.CRITICAL + 1)
+
+_listener = None
+_ring = None
+
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the last `capacity` records in memory; formatting happens only when they are read."""
+    def __init__(self, capacity: int):
+        super().__init__()
+        self.records = collections.deque(maxlen=capacity)
+        self.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    def emit(self, record):
+        # deque.append is atomic; no lock and no I/O on the caller's thread.
+        self.records.append(record)
+
+    def handle(self, record):
+        if self.filter(record):
+            self.emit(record)
+        return True
+
+    def lines(self) -> list:
+        return [self.format(record) for record in list(self.records)]
+
+
+def setup_logging(level=LOG_LEVEL):
+    """
+    Route the root logger through a QueueHandler / QueueListener pair.
+    Calling it again only changes the level.
+    """
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _listener is not None:
+        return _listener
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    log_queue = queue.SimpleQueue()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, console, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    if WIRE_TRACE_CAPACITY:
+        enable_wire_trace(WIRE_TRACE_CAPACITY)
+    return _listener
+
+
+def shutdown_logging():
+    """Flush the queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def enable_wire_trace(capacity: int = 10000):
+    """Start capturing wire traces into a ring buffer of `capacity` records (restarts an active trace)."""
+    global _ring
+    disable_wire_trace()
+    _ring = RingBufferHandler(capacity)
+    wire_logger.addHandler(_ring)
+    wire_logger.setLevel(logging.DEBUG)
+
+
+def disable_wire_trace():
+    """Stop capturing; the records captured so far stay readable until the next trace."""
+    if _ring is not None:
+        wire_logger.removeHandler(_ring)
+    wire_logger.setLevel(logging.CRITICAL + 1)
+
 
-def setup_logging():
-    logging.basicConfig(
-        level=logging.DEBUG,  # change to INFO in production
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[logging.StreamHandler()]
-    )
+def wire_trace() -> list:
+    """Formatted lines of the current (or last) wire trace, oldest first."""
+    return _ring.lines() if _ring is not None else []
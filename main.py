@@ -1,21 +1,53 @@
 # main.py
 
+import time
+_STARTED = time.perf_counter()  # before any heavy import, for --profile-startup
+
 import sys
-import qdarktheme
 from PyQt5.QtWidgets import QApplication
 from controller.main_controller import MainController
 from view.main_window import MainWindow
 from logging_config import setup_logging
+from utils import qt_asyncio
+_IMPORTED = time.perf_counter()
+
+
+def parse_profile_option(argv):
+    """Return (enabled, JSON output path or None) for --profile-startup[=path]."""
+    for arg in argv[1:]:
+        if arg == "--profile-startup":
+            return True, None
+        if arg.startswith("--profile-startup="):
+            return True, arg.split("=", 1)[1]
+    return False, None
+
 
 def main():
     setup_logging()
+    profiling, profile_output = parse_profile_option(sys.argv)
+    profile = None
     app = QApplication(sys.argv)
+    if profiling:
+        from utils.startup_profile import StartupProfile
+        profile = StartupProfile(_STARTED, profile_output)
+        profile.mark("imports", _IMPORTED)
+        profile.mark("QApplication")
+    # Coroutines awaiting the port schedulers' jobs run on the Qt event loop (GUI thread).
+    qt_asyncio.install(app)
+    import qdarktheme
     qdarktheme.setup_theme()
+    if profile:
+        profile.mark("theme")
 
     controller = MainController()
+    if profile:
+        profile.mark("controller (ports)")
     window = MainWindow(controller)
+    if profile:
+        profile.mark("main window")
+        profile.watch(window)
     window.show()
-    sys.exit(app.exec_())
+    sys.exit(qt_asyncio.run(app))
 
 if __name__ == '__main__':
     main()
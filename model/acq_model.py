@@ -1,11 +1,14 @@
 # model/acq_model.py
 
-from PyQt5.QtCore import QObject, QMutexLocker
+from PyQt5.QtCore import QObject
+import asyncio
 import time
 import logging
 from model.serial_handler import SerialHandler
-from utils.conversions import text_to_hex
-from utils.serial_mutex import acq_mutex  # use acquisition-specific mutex
+from model.dump_reader import DumpReader, DumpError
+from model.command_scheduler import CommandScheduler, INTERACTIVE
+from utils.protocol_codec import encode_acq
+from utils import io_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -13,37 +16,139 @@ class AcqModel(QObject):
     """
     Domain logic for the acquisition card:
       - Reads and sends commands through the serial port.
+      - Runs every exchange on the port's CommandScheduler thread (see
+        model/command_scheduler.py); the methods take a `priority` and the
+        `owner` that holds the port for a multi-command conversation.
+      - Coroutine versions (query_async, send_serial_data_async,
+        read_serial_data_async, read_dump_async) are awaitable wrappers over
+        the same scheduler jobs: the I/O still runs on the scheduler thread, the
+        coroutine awaits the job's future so the event loop keeps running meanwhile.
+      - Records each exchange (command sent -> reply line or dump read) in the
+        port's I/O metrics.
     """
     def __init__(self, port, baud_rate, timeout):
         super().__init__()
         self.serial_handler = SerialHandler(port, baud_rate, timeout)
         self.serial_handler.open()
+        self.scheduler = CommandScheduler(f"acq {port}")
+        self.metrics = self.serial_handler.metrics
+        self._pending = None  # (command, time sent, bytes sent) awaiting its reply
 
-    def read_serial_data(self) -> str:
-        start_time = time.time()
+    def _sent(self, command, size):
+        self._pending = (command, time.perf_counter(), size)
+
+    def _answered(self, status, size=0):
+        """Record the exchange of the last command sent, if its reply was not recorded yet."""
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            command, sent_at, bytes_out = pending
+            self.metrics.exchange(command, time.perf_counter() - sent_at, status, bytes_out, size)
+
+    def _dump_failed(self, error):
+        stalled = str(error).startswith("Timeout")
+        self._answered(io_metrics.TIMEOUT if stalled else io_metrics.ERROR)
+
+    def read_serial_data(self, timeout=None, priority=INTERACTIVE, owner=None) -> str:
+        """
+        Wait for the next non-empty line from the acquisition card.
+        Returns as soon as the line has arrived, or "" once the per-call deadline
+        (default: the serial timeout) has passed.
+        """
+        return self.scheduler.call(self._read_serial_data, timeout, priority=priority, owner=owner)
+
+    async def read_serial_data_async(self, timeout=None, priority=INTERACTIVE, owner=None) -> str:
+        """Awaitable wrapper of read_serial_data() (scheduler job future)."""
+        return await asyncio.wrap_future(
+            self.scheduler.submit(self._read_serial_data, timeout, priority=priority, owner=owner))
+
+    def _read_serial_data(self, timeout=None) -> str:
+        if timeout is None:
+            timeout = self.serial_handler.timeout
+        deadline = time.monotonic() + timeout
         while True:
-            if time.time() - start_time > self.serial_handler.timeout:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
                 logger.warning("Timeout waiting for acquisition data.")
+                self._answered(io_metrics.TIMEOUT)
                 return ""
-            data = self.serial_handler.read_line()
+            data = self.serial_handler.read_line(remaining)
             if data:
-                logger.debug(f"Acquisition data received: {data}")
+                logger.debug("Acquisition data received: %s", data)
+                self._answered(io_metrics.OK, len(data))
                 return data
-            time.sleep(0.1)
+            if not self.serial_handler.is_receiving:
+                # Closed port or stopped reader: nothing more can arrive, don't spin until the deadline.
+                logger.error("Acquisition serial port closed while waiting for data.")
+                self._answered(io_metrics.ERROR)
+                return ""
+
+    def read_dump(self, should_continue=None, progress=None, priority=INTERACTIVE, owner=None):
+        """
+        Read the complete response to a DUMP ("D") command in bulk.
+        Returns a (128, 16) uint16 array of the decoded words, or None if
+        should_continue() turned False while reading. Raises DumpError on a malformed dump.
+        progress(partial) is called with throttled views of the lines decoded so far.
+        """
+        return self.scheduler.call(self._read_dump, should_continue, progress, priority=priority, owner=owner)
+
+    async def read_dump_async(self, should_continue=None, timeout=None, progress=None,
+                              priority=INTERACTIVE, owner=None):
+        """
+        Awaitable wrapper of read_dump() (scheduler job future). `timeout` is the
+        maximum silence between two chunks (default: the serial timeout).
+        """
+        return await asyncio.wrap_future(
+            self.scheduler.submit(self._read_dump, should_continue, progress, timeout,
+                                  priority=priority, owner=owner))
 
-    def send_serial_data(self, command: str):
-        locker = QMutexLocker(acq_mutex)
+    def _read_dump(self, should_continue=None, progress=None, timeout=None):
+        reader = DumpReader(self.serial_handler, timeout=timeout)
+        try:
+            data = reader.read(should_continue, progress)
+        except DumpError as e:
+            self._dump_failed(e)
+            raise
+        if data is not None:
+            logger.debug("Dump received: %d lines.", data.shape[0])
+            self._answered(io_metrics.OK, reader.bytes_received)
+        return data
+
+    def send_serial_data(self, command: str, priority=INTERACTIVE, owner=None):
+        self.scheduler.call(self._send_serial_data, command, priority=priority, owner=owner)
+
+    async def send_serial_data_async(self, command: str, priority=INTERACTIVE, owner=None):
+        """Awaitable wrapper of send_serial_data() (scheduler job future)."""
+        await asyncio.wrap_future(
+            self.scheduler.submit(self._send_serial_data, command, priority=priority, owner=owner))
+
+    def _send_serial_data(self, command: str):
         if not self.serial_handler.ser or not self.serial_handler.ser.is_open:
             logger.error("Acquisition serial port not open")
             return
         try:
-            hex_command = text_to_hex(command)
-            full_command = f"{hex_command}0D"  # Append carriage return if required.
-            command_bytes = bytes.fromhex(full_command)
-            self.serial_handler.write_bytes(command_bytes)
-            logger.info(f"Sent acquisition command: {command}")
+            # Command + carriage return, prebuilt for the fixed command set.
+            frame = encode_acq(command)
+            self._sent(command, len(frame))
+            self.serial_handler.write_bytes(frame)
+            logger.debug("Sent acquisition command: %s", command)
         except Exception as e:
-            logger.error(f"Error sending acquisition command: {e}")
+            logger.error("Error sending acquisition command: %s", e)
+
+    def query(self, command: str, timeout=None, priority=INTERACTIVE, owner=None) -> str:
+        """Send a command and return its reply line ("" on timeout) as one job."""
+        return self.scheduler.call(self._query, command, timeout, priority=priority, owner=owner)
+
+    async def query_async(self, command: str, timeout=None, priority=INTERACTIVE) -> str:
+        """Awaitable wrapper of query(): awaits the scheduler job's future; the I/O runs on the scheduler thread."""
+        return await asyncio.wrap_future(self.scheduler.submit(self._query, command, timeout, priority=priority))
+
+    def _query(self, command, timeout):
+        if not self.serial_handler.is_open:
+            logger.error("Acquisition serial port not open")
+            return ""
+        self._send_serial_data(command)
+        return self._read_serial_data(timeout)
 
     def close(self):
+        self.scheduler.shutdown()
         self.serial_handler.close()
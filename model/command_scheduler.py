@@ -0,0 +1,228 @@
+# model/command_scheduler.py
+"""
+Per-port command scheduler.
+
+Every exchange on a port (a command and its reply, a pipelined batch, a dump)
+runs as a job on the port's scheduler thread, which is the only thread that
+touches the port. Jobs are dispatched by priority class, then in submission
+order:
+
+  EMERGENCY    stop commands (XS/YS)
+  INTERACTIVE  commands typed in the GUI
+  SEQUENCE     acquisition sequence, program upload
+  BACKGROUND   parameter polling
+
+A job may be a generator: each next() is one step (e.g. one pipelined chunk
+of a 98-command poll), after which the job goes back to the end of its class.
+Bulk jobs of the same class therefore interleave, and a higher class never
+waits longer than the step that is running. EMERGENCY jobs also bypass the
+queue bound and holds, so a stop waits at most for one step.
+
+A worker that needs a multi-command conversation (the acquisition sequence
+arming, polling and dumping the card) holds the scheduler: until it releases
+it, only its own jobs and EMERGENCY jobs are dispatched; the others wait in
+the queue. A hold is the one exception to the class order (the holder's
+SEQUENCE jobs run before other owners' INTERACTIVE ones): other jobs cannot
+be interleaved, since the device would take them as part of the conversation
+(e.g. a typed "A" answered with the dump). Holds are therefore kept to one
+conversation, which its own timeouts bound (one profile's arm/poll/dump, one
+program's header and blocks), and the port is free between them. A blocking
+call() gives up if its job has not started after PORT_HOLD_TIMEOUT seconds
+rather than waiting for a hold indefinitely.
+"""
+
+import itertools
+import threading
+import logging
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from config import COMMAND_QUEUE_MAX, PORT_HOLD_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+EMERGENCY = 0
+INTERACTIVE = 1
+SEQUENCE = 2
+BACKGROUND = 3
+PRIORITY_NAMES = {EMERGENCY: "emergency", INTERACTIVE: "interactive",
+                  SEQUENCE: "sequence", BACKGROUND: "background"}
+
+
+class QueueFullError(Exception):
+    """Raised by CommandScheduler.submit() when the port's queue is at its bound."""
+    pass
+
+
+class CommandTimeoutError(TimeoutError):
+    """Raised by CommandScheduler.call() when the job has not started within its timeout."""
+    pass
+
+
+class _Job:
+    __slots__ = ("priority", "order", "function", "args", "kwargs", "owner", "future", "steps")
+
+    def __init__(self, priority, order, function, args, kwargs, owner):
+        self.priority = priority
+        self.order = order
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.owner = owner
+        self.future = Future()
+        self.steps = None  # generator of a bulk job, once started
+
+
+class CommandScheduler:
+    """Priority queue and worker thread of one port."""
+    def __init__(self, name: str, max_queue: int = COMMAND_QUEUE_MAX):
+        """
+        :param name: Used for the thread name and log messages (e.g. "motor COM3").
+        :param max_queue: Maximum number of queued non-emergency jobs.
+        """
+        self.name = name
+        self.max_queue = max_queue
+        self._queue = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._holder = None
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"Scheduler-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, function, *args, priority=INTERACTIVE, owner=None, **kwargs) -> Future:
+        """
+        Queue function(*args, **kwargs) and return a Future of its result. If it
+        returns a generator, the generator is run step by step (see the module
+        docstring) and the future gets its return value.
+
+        :param owner: The submitting worker, for jobs that must run while it holds the port.
+        :raises QueueFullError: If `max_queue` jobs are already waiting (never for EMERGENCY).
+        """
+        with self._cond:
+            if not self._running:
+                raise RuntimeError(f"Command scheduler {self.name} is shut down")
+            if priority != EMERGENCY and len(self._queue) >= self.max_queue:
+                raise QueueFullError(f"{self.name}: {len(self._queue)} commands already queued")
+            job = _Job(priority, next(self._order), function, args, kwargs, owner)
+            self._queue.append(job)
+            self._cond.notify_all()
+        return job.future
+
+    def call(self, function, *args, priority=INTERACTIVE, owner=None, timeout=PORT_HOLD_TIMEOUT, **kwargs):
+        """
+        Submit and wait for the result. Called from a job, the function runs inline.
+
+        :param timeout: Maximum wait in seconds for the job to start (None: no limit), e.g.
+                        while another worker holds the port. A started job is bounded by
+                        its own serial timeouts and is always waited for, since its
+                        callbacks may refer to the caller.
+        :raises CommandTimeoutError: If the job has not started in time; it is then cancelled.
+        """
+        if threading.current_thread() is self._thread:
+            result = function(*args, **kwargs)
+            if hasattr(result, "__next__"):
+                # A bulk job nested in a running job: no interleaving, run it to the end.
+                try:
+                    while True:
+                        next(result)
+                except StopIteration as stop:
+                    return stop.value
+            return result
+        future = self.submit(function, *args, priority=priority, owner=owner, **kwargs)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            if not future.cancel():
+                # Already started (a bulk job may be between two steps): wait for its end.
+                return future.result()
+            with self._cond:
+                self._queue = [job for job in self._queue if job.future is not future]
+                held = self._holder not in (None, owner)
+            raise CommandTimeoutError(f"{self.name}: {PRIORITY_NAMES[priority]} job not started within "
+                                      f"{timeout} s" + (" (port held by another worker)" if held else "")) from None
+
+    def hold(self, owner, timeout=None) -> bool:
+        """
+        Reserve the port for `owner`'s jobs (and EMERGENCY jobs) until release(owner).
+        Waits while another owner holds it; returns False if `timeout` (seconds) passes first.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._holder in (None, owner) or not self._running, timeout):
+                return False
+            self._holder = owner
+            return True
+
+    def release(self, owner):
+        with self._cond:
+            if self._holder is owner:
+                self._holder = None
+                self._cond.notify_all()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    def shutdown(self, timeout: float = 2.0):
+        """Cancel the queued jobs and stop the thread after the running step."""
+        with self._cond:
+            self._running = False
+            queued, self._queue = self._queue, []
+            self._cond.notify_all()
+        for job in queued:
+            if job.steps is not None:
+                job.steps.close()
+            if not job.future.cancel():
+                job.future.set_exception(RuntimeError(f"Command scheduler {self.name} shut down"))
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _next_job(self):
+        """The job to run next, or None if every queued job waits for a release (under _cond)."""
+        best = None
+        for job in self._queue:
+            if self._holder is not None and job.owner is not self._holder and job.priority != EMERGENCY:
+                continue
+            if best is None or (job.priority, job.order) < (best.priority, best.order):
+                best = job
+        return best
+
+    def _run(self):
+        while True:
+            with self._cond:
+                job = None
+                while self._running:
+                    job = self._next_job()
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                if job is None:
+                    return
+                self._queue.remove(job)
+            if job.steps is None and not job.future.set_running_or_notify_cancel():
+                continue
+            self._step(job)
+
+    def _step(self, job):
+        try:
+            if job.steps is None:
+                result = job.function(*job.args, **job.kwargs)
+                if not hasattr(result, "__next__"):
+                    job.future.set_result(result)
+                    return
+                job.steps = result
+            next(job.steps)
+        except StopIteration as stop:
+            job.future.set_result(stop.value)
+            return
+        except Exception as e:
+            logger.error("%s: %s job failed: %s", self.name, PRIORITY_NAMES[job.priority], e)
+            job.future.set_exception(e)
+            return
+        # More steps: back to the end of its class (requeued even if the queue is full).
+        with self._cond:
+            if not self._running:
+                job.steps.close()
+                job.future.set_exception(RuntimeError(f"Command scheduler {self.name} shut down"))
+                return
+            job.order = next(self._order)
+            self._queue.append(job)
+            self._cond.notify_all()
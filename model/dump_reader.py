@@ -0,0 +1,147 @@
+# model/dump_reader.py
+
+import time
+import logging
+from config import DUMP_PROGRESS_INTERVAL_MS
+
+logger = logging.getLogger(__name__)
+
+DUMP_LINES = 128
+WORDS_PER_LINE = 16
+
+
+class DumpError(Exception):
+    """Raised when a DUMP response is malformed, reports an error or stalls."""
+
+
+class DumpParser:
+    """
+    Incremental parser of the response to the acquisition card's DUMP ("D") command.
+
+    Chunks are fed as they arrive; they are split into lines, validated line by
+    line and complete lines are decoded in batches straight into a preallocated
+    (lines, words_per_line) uint16 array. Used by DumpReader.
+
+    If a `progress` callable is given it receives the lines decoded so far,
+    at most once per `progress_interval` seconds and not for the final chunk.
+    The argument is a view into the dump array (no copy); its rows are final
+    since later chunks only fill the rows after it.
+    """
+    def __init__(self, lines=DUMP_LINES, words_per_line=WORDS_PER_LINE,
+                 progress=None, progress_interval=DUMP_PROGRESS_INTERVAL_MS / 1000):
+        # NumPy and the decoder are imported on first use to keep them off the startup path.
+        import numpy as np
+        from utils.conversions import hex_lines_to_words
+        self._decode = hex_lines_to_words
+        self.lines = lines
+        self.words_per_line = words_per_line
+        self.data = np.empty((lines, words_per_line), dtype=np.uint16)
+        self.row_count = 0
+        # Bytes received but not yet part of a complete line; after the last
+        # line they hold whatever followed the dump.
+        self.pending = b""
+        self.bytes_received = 0
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self._last_progress = time.monotonic()
+
+    @property
+    def done(self) -> bool:
+        return self.row_count >= self.lines
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        Consume one chunk of the response.
+
+        :return: True once the last line has been decoded.
+        :raises DumpError: On an "ERR" reply or a malformed line.
+        """
+        self.bytes_received += len(chunk)
+        pending = self.pending + chunk
+        *complete, pending = pending.split(b'\n')
+        batch = []
+        for index, raw in enumerate(complete):
+            if self.row_count + len(batch) == self.lines:
+                # Bytes past the dump belong to whatever comes next.
+                pending = b'\n'.join(complete[index:]) + b'\n' + pending
+                break
+            line = raw.strip()
+            if line:
+                self._check_line(line, self.row_count + len(batch) + 1)
+                batch.append(line)
+        self.pending = pending
+        if batch:
+            row = self.row_count
+            try:
+                self._decode(batch, self.words_per_line, self.data[row:row + len(batch)])
+            except ValueError as e:
+                raise DumpError(f"Invalid dump data after line {row}: {e}")
+            self.row_count += len(batch)
+            if self.progress is not None and not self.done:
+                now = time.monotonic()
+                if now - self._last_progress >= self.progress_interval:
+                    self._last_progress = now
+                    self.progress(self.data[:self.row_count])
+        return self.done
+
+    def _check_line(self, line, line_number):
+        if line.startswith(b"ERR"):
+            raise DumpError(f"DUMP command error response: {line.decode(errors='replace')}")
+        if line.count(b',') != self.words_per_line - 1:
+            raise DumpError(f"Unexpected number of words in dump line {line_number}: "
+                            f"{line.decode(errors='replace')}")
+
+
+class DumpReader:
+    """
+    Streams the response to the acquisition card's DUMP ("D") command.
+
+    The response (128 lines of 16 comma-separated hex words) is pulled from the
+    serial handler in whatever chunks have arrived and handed to a DumpParser.
+    Reading finishes as soon as the last line is complete, so the dump is
+    limited by the baud rate only.
+    """
+    def __init__(self, serial_handler, lines=DUMP_LINES, words_per_line=WORDS_PER_LINE, timeout=None):
+        """
+        :param serial_handler: SerialHandler of the acquisition port.
+        :param lines: Number of lines expected in the dump.
+        :param words_per_line: Number of comma-separated words expected per line.
+        :param timeout: Maximum silence between two chunks, in seconds
+                        (defaults to the port's serial timeout).
+        """
+        self.serial_handler = serial_handler
+        self.lines = lines
+        self.words_per_line = words_per_line
+        self.timeout = serial_handler.timeout if timeout is None else timeout
+        # Size of the last dump read, in bytes.
+        self.bytes_received = 0
+
+    def read(self, should_continue=None, progress=None):
+        """
+        Read a complete dump.
+
+        :param should_continue: Optional callable polled between chunks; when it
+                                returns False the read is abandoned and None is returned.
+        :param progress: Optional callable receiving throttled partial arrays (see DumpParser).
+        :return: A (lines, words_per_line) uint16 array with the decoded words.
+        :raises DumpError: On an "ERR" reply, a malformed line, a stalled transfer or a closed port.
+        """
+        parser = DumpParser(self.lines, self.words_per_line, progress)
+        last_data = time.monotonic()
+        while not parser.done:
+            if should_continue is not None and not should_continue():
+                return None
+            chunk = self.serial_handler.read_available(self.timeout)
+            if not chunk:
+                if not self.serial_handler.is_receiving:
+                    # Closed port or stopped reader: nothing more can arrive, don't spin until the deadline.
+                    raise DumpError(f"Serial port closed after {parser.row_count} of {self.lines} dump lines.")
+                if time.monotonic() - last_data >= self.timeout:
+                    raise DumpError(f"Timeout after {parser.row_count} of {self.lines} dump lines.")
+                continue
+            last_data = time.monotonic()
+            parser.feed(chunk)
+        if parser.pending:
+            self.serial_handler.unread(parser.pending)
+        self.bytes_received = parser.bytes_received - len(parser.pending)
+        return parser.data
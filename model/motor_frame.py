@@ -0,0 +1,116 @@
+# model/motor_frame.py
+
+STX = 0x02
+ETX = 0x03
+ACK = 0x06
+NAK = 0x15
+
+
+class MotorResponse:
+    """
+    Reply of the motor controller to one command.
+
+    :ivar command: The text command that was sent.
+    :ivar status:  ACK, NAK, TIMEOUT or ERROR (port closed, I/O error, ...).
+    :ivar payload: Data bytes between the ACK/NAK byte and ETX (e.g. b"O", b"1000"),
+                   or the error message for TIMEOUT/ERROR.
+    :ivar elapsed: Seconds from writing the command to receiving the reply.
+    """
+    __slots__ = ("command", "status", "payload", "elapsed")
+
+    ACK = "ACK"
+    NAK = "NAK"
+    TIMEOUT = "TIMEOUT"
+    ERROR = "ERROR"
+
+    def __init__(self, command, status, payload=b"", elapsed=0.0):
+        self.command = command
+        self.status = status
+        self.payload = payload
+        self.elapsed = elapsed
+
+    @classmethod
+    def from_frame(cls, command, frame: bytes, elapsed=0.0):
+        """Build a response from a complete frame returned by FrameDecoder."""
+        if len(frame) >= 2 and frame[0] == STX and frame[-1] == ETX:
+            status_byte = frame[1] if len(frame) > 2 else None
+            if status_byte == ACK:
+                return cls(command, cls.ACK, frame[2:-1], elapsed)
+            if status_byte == NAK:
+                return cls(command, cls.NAK, frame[2:-1], elapsed)
+            return cls(command, cls.ERROR, b"Unexpected frame: " + frame, elapsed)
+        if frame == bytes([NAK]):
+            return cls(command, cls.NAK, b"", elapsed)
+        return cls(command, cls.ERROR, b"Unexpected frame: " + frame, elapsed)
+
+    @classmethod
+    def error(cls, command, message: str, status=ERROR, elapsed=0.0):
+        return cls(command, status, message.encode('ascii', errors='replace'), elapsed)
+
+    @property
+    def ok(self) -> bool:
+        return self.status == self.ACK
+
+    @property
+    def text(self) -> str:
+        """The payload as text (e.g. "O", "E", "1000")."""
+        return self.payload.decode('latin-1')
+
+    def display(self) -> str:
+        """Render the response with protocol markers, e.g. "<STX><ACK>1000<ETX>"."""
+        if self.status == self.ACK:
+            return f"<STX><ACK>{self.text}<ETX>"
+        if self.status == self.NAK:
+            return f"<STX><NAK>{self.text}<ETX>"
+        if self.status == self.TIMEOUT:
+            return "<NAK>Timeout<ETX>"
+        return f"<NAK>{self.text}<ETX>"
+
+    __str__ = display
+
+    def __repr__(self):
+        return f"MotorResponse({self.command!r}, {self.status}, {self.payload!r}, {self.elapsed:.4f})"
+
+    def __eq__(self, other):
+        if not isinstance(other, MotorResponse):
+            return NotImplemented
+        return self.status == other.status and self.payload == other.payload
+
+    __hash__ = None
+
+
+class FrameDecoder:
+    """
+    Incremental decoder of the byte stream coming from the motor controller.
+
+    Bytes are fed as they arrive; complete frames are available as soon as
+    their ETX (or a bare NAK outside a frame) has been seen. Noise between
+    frames (e.g. line terminators) is discarded.
+    """
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes):
+        self._buffer += data
+
+    def clear(self):
+        self._buffer.clear()
+
+    def next_frame(self):
+        """Return the next complete frame (bytes), or None if none is complete yet."""
+        buffer = self._buffer
+        start = buffer.find(STX)
+        nak = buffer.find(NAK, 0, start if start >= 0 else len(buffer))
+        if nak >= 0:
+            del buffer[:nak + 1]
+            return bytes([NAK])
+        if start < 0:
+            buffer.clear()
+            return None
+        end = buffer.find(ETX, start + 1)
+        if end < 0:
+            del buffer[:start]
+            return None
+        frame = bytes(buffer[start:end + 1])
+        del buffer[:end + 1]
+        return frame
@@ -1,68 +1,243 @@
 # model/motor_model.py
 
-from PyQt5.QtCore import QObject, QMutexLocker
+from PyQt5.QtCore import QObject
+from collections import deque
+import asyncio
 import logging
 import time
+from config import MOTOR_PIPELINE_WINDOW, MOTOR_BULK_CHUNK
 from model.serial_handler import SerialHandler
-from utils.conversions import text_to_hex
-from utils.serial_mutex import motor_mutex  # use motor-specific mutex
+from model.command_scheduler import CommandScheduler, EMERGENCY, INTERACTIVE
+from model.motor_param_cache import MotorParameterCache
+from model.motor_frame import FrameDecoder, MotorResponse
+from utils.protocol_codec import MotorFrameEncoder, encode_motor
+from utils import io_metrics
 
 logger = logging.getLogger(__name__)
 
+_METRIC_STATUS = {MotorResponse.ACK: io_metrics.OK, MotorResponse.NAK: io_metrics.NAK,
+                  MotorResponse.TIMEOUT: io_metrics.TIMEOUT, MotorResponse.ERROR: io_metrics.ERROR}
+
+# Always sent with EMERGENCY priority, whoever sends them.
+STOP_COMMANDS = ("XS", "YS")
+STOP_FRAMES = frozenset(encode_motor(command) for command in STOP_COMMANDS)
+
+
 class MotorModel(QObject):
     """
     Domain logic for the motor:
       - Formats motor commands with protocol markers.
       - Sends commands via the serial handler.
+      - Decodes replies frame by frame (a reply is complete as soon as its ETX,
+        or a bare NAK, arrives) into MotorResponse objects.
+      - Runs every exchange on the port's CommandScheduler thread (see
+        model/command_scheduler.py). The public methods take a `priority`; the
+        blocking ones wait for their job, send_command_async is an awaitable
+        wrapper that awaits the job's future from a coroutine (the I/O itself
+        stays on the scheduler thread). Stop commands always jump the queue.
     """
     def __init__(self, port, baud_rate, timeout):
         super().__init__()
         self.serial_handler = SerialHandler(port, baud_rate, timeout)
         self.serial_handler.open()
+        self.param_cache = MotorParameterCache()
+        self._decoder = FrameDecoder()
+        self._encoder = MotorFrameEncoder()
+        self.scheduler = CommandScheduler(f"motor {port}")
+        self.metrics = self.serial_handler.metrics
+
+    @staticmethod
+    def _priority(text_command, priority):
+        return EMERGENCY if text_command in STOP_COMMANDS else priority
+
+    def send_command(self, text_command: str, priority=INTERACTIVE, owner=None) -> MotorResponse:
+        """Send one command and wait for its reply."""
+        return self.scheduler.call(self._send_command, text_command,
+                                   priority=self._priority(text_command, priority), owner=owner)
+
+    async def send_command_async(self, text_command: str, priority=INTERACTIVE) -> MotorResponse:
+        """Awaitable wrapper of send_command(): awaits the scheduler job's future; the I/O runs on the scheduler thread."""
+        future = self.scheduler.submit(self._send_command, text_command,
+                                       priority=self._priority(text_command, priority))
+        return await asyncio.wrap_future(future)
 
-    def send_command(self, text_command: str) -> str:
+    def stop_axis(self, axis: str):
+        """Queue "<axis>S" ahead of everything else; returns the job's Future."""
+        return self.scheduler.submit(self._send_command, f"{axis}S", priority=EMERGENCY)
+
+    def _send_command(self, text_command: str) -> MotorResponse:
         if not self.serial_handler.ser or not self.serial_handler.ser.is_open:
-            return "<NAK>Serial port not open<ETX>"
-        # Acquire the motor-specific mutex.
-        locker = QMutexLocker(motor_mutex)
+            return MotorResponse.error(text_command, "Serial port not open")
         try:
-            # Convert the command to hexadecimal.
-            hex_command = text_to_hex(text_command)
-            # Build the full command (using protocol markers).
-            full_command = f"02 30 {hex_command} 03"
-            hex_string = full_command.replace(" ", "")
-            print(f"Sending command: {text_command}")
-            print(f"Hex conversion: {hex_command}")
-            print(f"Full command string: {full_command} -> {hex_string}")
-            command_bytes = bytes.fromhex(hex_string)
-            print(f"Command bytes: {command_bytes}")
+            # Build the full frame (using protocol markers).
+            command_bytes = self._encoder.encode(text_command)
+            sent_at = time.perf_counter()
             self.serial_handler.write_bytes(command_bytes)
-            response = self.serial_handler.read_line()
-            response_repr = (response
-                             .replace('\x02', '<STX>')
-                             .replace('\x06', '<ACK>')
-                             .replace('\x03', '<ETX>')
-                             .replace('\x15', '<NAK>'))
-            print(f"Response: {response_repr}")
-            return response_repr
+            response = self._read_response(text_command, sent_at, len(command_bytes))
+            if response.status == MotorResponse.TIMEOUT:
+                self._resync()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Motor command %s: %s", text_command, response.display())
+            self.param_cache.observe(text_command, response)
+            return response
         except Exception as e:
-            print(f"Exception in send_command({text_command}): {e}")
-            return f"<NAK>Error: {e}<ETX>"
+            logger.error("Exception in send_command(%s): %s", text_command, e)
+            return MotorResponse.error(text_command, f"Error: {e}")
+
+    def _read_frame(self, timeout=None):
+        """
+        Return the next complete reply frame (bytes), or None if the deadline
+        passes first or the port can no longer receive (closed, reader stopped).
+        """
+        if timeout is None:
+            timeout = self.serial_handler.timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            frame = self._decoder.next_frame()
+            if frame is not None:
+                return frame
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            data = self.serial_handler.read_available(remaining)
+            if not data and not self.serial_handler.is_receiving:
+                # Nothing more can arrive; don't spin until the deadline.
+                return None
+            self._decoder.feed(data)
+
+    def _read_response(self, command, sent_at, bytes_out=0, timeout=None) -> MotorResponse:
+        frame = self._read_frame(timeout)
+        elapsed = time.perf_counter() - sent_at
+        if frame is None and not self.serial_handler.is_receiving:
+            response = MotorResponse.error(command, "Serial port closed", elapsed=elapsed)
+        elif frame is None:
+            response = MotorResponse(command, MotorResponse.TIMEOUT, b"", elapsed)
+        else:
+            response = MotorResponse.from_frame(command, frame, elapsed)
+        self._record(response, bytes_out, len(frame) if frame else 0)
+        return response
+
+    def _record(self, response, bytes_out, bytes_in):
+        self.metrics.exchange(response.command, response.elapsed, _METRIC_STATUS[response.status],
+                              bytes_out, bytes_in)
+
+    def _resync(self):
+        """Drop any partial reply so the next command starts on a clean stream."""
+        self._decoder.clear()
+        self.serial_handler.reset_input_buffer()
+
+    def is_standstill(self, axis: str, priority=INTERACTIVE, owner=None):
+        """
+        Ask the controller whether `axis` is stopped ("<axis>=H").
+
+        :return: True at standstill, False while moving, or None if the query
+                 was not answered (unsupported by the controller, timeout, port closed).
+        """
+        response = self.send_command(f"{axis}=H", priority, owner)
+        if not response.ok or response.text not in ("E", "N"):
+            return None
+        return response.text == "E"
+
+    def send_many(self, commands, window: int = MOTOR_PIPELINE_WINDOW, priority=INTERACTIVE, owner=None):
+        """
+        Send several commands in pipelined exchanges.
+
+        The batch runs as one bulk job: MOTOR_BULK_CHUNK commands per step, so
+        other jobs of its priority interleave with it and higher priorities
+        (e.g. a stop) wait for one chunk at most. Within a chunk up to `window`
+        commands are written back-to-back before their replies are read, and
+        replies are matched to commands by frame order. If a reply times out,
+        the commands in flight are reported as timed out and the rest of the
+        batch continues.
+
+        :param commands: Iterable of text commands (e.g. "XP01R").
+        :param window: Maximum number of commands awaiting a reply (1 = no pipelining).
+        :return: List of MotorResponse, in the order of `commands`.
+        """
+        return self.scheduler.call(self._send_many_steps, list(commands), window,
+                                   priority=priority, owner=owner)
+
+    def _send_many_steps(self, commands, window):
+        if not self.serial_handler.ser or not self.serial_handler.ser.is_open:
+            return [MotorResponse.error(c, "Serial port not open") for c in commands]
+        results = []
+        for start in range(0, len(commands), MOTOR_BULK_CHUNK):
+            if start:
+                yield
+            results += self._pipeline(commands[start:start + MOTOR_BULK_CHUNK], window)
+        logger.debug("send_many: %d commands, window %d.", len(commands), window)
+        return results
+
+    def _pipeline(self, commands, window):
+        results = [None] * len(commands)
+        in_flight = deque()  # (command index, time written, frame length)
+        next_index = 0
+        while next_index < len(commands) or in_flight:
+            while next_index < len(commands) and len(in_flight) < max(1, window):
+                frame = encode_motor(commands[next_index])
+                self.serial_handler.write_bytes(frame)
+                in_flight.append((next_index, time.perf_counter(), len(frame)))
+                next_index += 1
+            index, sent_at, bytes_out = in_flight.popleft()
+            response = self._read_response(commands[index], sent_at, bytes_out)
+            if response.status == MotorResponse.TIMEOUT:
+                # Replies can no longer be matched by order: fail what is in flight and resync.
+                logger.warning("Timeout waiting for reply to %s; dropping %d pipelined command(s).",
+                               commands[index], len(in_flight))
+                results[index] = response
+                for failed, _, failed_bytes in in_flight:
+                    results[failed] = MotorResponse(commands[failed], MotorResponse.TIMEOUT, b"", response.elapsed)
+                    self._record(results[failed], failed_bytes, 0)
+                in_flight.clear()
+                self._resync()
+                continue
+            results[index] = response
+            self.param_cache.observe(commands[index], response)
+        return results
+
+    def refresh_parameters(self, parameters, force: bool = False, max_age=None, priority=INTERACTIVE) -> dict:
+        """
+        Bring the given parameters up to date, reading from the controller only
+        the entries that are missing, invalidated or stale (all of them if `force`).
+
+        :param parameters: Iterable of (axis, number) pairs, e.g. ("X", 1).
+        :param force: Re-read every parameter regardless of the cache.
+        :param max_age: Override the cache's staleness threshold, in seconds.
+        :param priority: Scheduler priority of the reads (BACKGROUND for polling).
+        :return: {(axis, number): MotorResponse} for the entries whose value changed
+                 (or whose read failed) - unchanged parameters are left out.
+        """
+        to_read = [p for p in parameters if force or not self.param_cache.is_fresh(*p, max_age=max_age)]
+        if not to_read:
+            return {}
+        previous = {p: self.param_cache.value(*p) for p in to_read}
+        results = self.send_many([f"{axis}P{number:02d}R" for axis, number in to_read], priority=priority)
+        changed = {}
+        for p, response in zip(to_read, results):
+            if not response.ok or response != previous[p]:
+                changed[p] = response
+        logger.debug("Parameter refresh: %d read, %d changed.", len(to_read), len(changed))
+        return changed
+
+    def send_raw(self, command_bytes: bytes, expected_response_length: int = None, timeout=5,
+                 priority=INTERACTIVE) -> bytes:
+        """
+        Write a prebuilt frame and return the raw reply. Raw frames are not
+        decoded, so the whole parameter cache is invalidated after each one;
+        XS/YS stop frames are sent with EMERGENCY priority like send_command.
+        """
+        if bytes(command_bytes) in STOP_FRAMES:
+            priority = EMERGENCY
+        return self.scheduler.call(self._send_raw, command_bytes, expected_response_length, timeout,
+                                   priority=priority)
 
-    def send_raw(self, command_bytes: bytes, expected_response_length: int = None, timeout=5) -> bytes:
-        locker = QMutexLocker(motor_mutex)
+    def _send_raw(self, command_bytes, expected_response_length, timeout):
         self.serial_handler.write_bytes(command_bytes)
-        print(command_bytes)
+        self.param_cache.invalidate()
         if expected_response_length is None:
-            return self.serial_handler.read_line().encode()
-        ser = self.serial_handler.ser
-        start = time.time()
-        received = b""
-        while len(received) < expected_response_length and (time.time() - start) < timeout:
-            if ser.in_waiting:
-                received += ser.read(ser.in_waiting)
-            time.sleep(0.1)
-        return received
+            return self._read_frame() or b""
+        return self.serial_handler.read_exact(expected_response_length, timeout)
 
     def close(self):
+        self.scheduler.shutdown()
         self.serial_handler.close()
@@ -0,0 +1,81 @@
+# model/motor_param_cache.py
+
+import re
+import threading
+import time
+import logging
+from config import MOTOR_PARAM_MAX_AGE, MOTOR_VOLATILE_PARAMS
+
+logger = logging.getLogger(__name__)
+
+PARAM_READ = re.compile(r'^([XY])P(\d{2})R$')
+PARAM_WRITE = re.compile(r'^([XY])P(\d{2})[S=]')
+MOTION = re.compile(r'^([XY])(0[+-]|[+-]\d+|S)$')
+STATUS_QUERY = re.compile(r'^([XY])=H$')
+
+
+class MotorParameterCache:
+    """
+    Write-through cache of motor controller parameters, keyed by (axis, number).
+
+    MotorModel reports every command it sends through observe():
+      - parameter reads ("XPnnR") that were acknowledged store the reply,
+      - parameter writes ("XPnnS..." / "XPnn=...") invalidate that entry,
+      - motion and stop commands invalidate the axis' volatile parameters
+        (position counters, see MOTOR_VOLATILE_PARAMS),
+      - status queries ("X=H") leave the cache untouched,
+      - any other command (program upload, reset, ...) invalidates everything.
+    Invalidated entries keep their last value so callers can still tell
+    whether a fresh read actually changed it.
+    """
+    def __init__(self, max_age=MOTOR_PARAM_MAX_AGE, volatile_params=MOTOR_VOLATILE_PARAMS):
+        """
+        :param max_age: Seconds after which an entry is considered stale (None = never).
+        :param volatile_params: Parameter numbers that change when an axis moves.
+        """
+        self.max_age = max_age
+        self.volatile_params = frozenset(volatile_params)
+        self._lock = threading.Lock()
+        self._entries = {}  # (axis, number) -> [value, timestamp, valid]
+
+    def observe(self, command: str, response):
+        """Update the cache after `command` was answered with `response` (a MotorResponse)."""
+        match = PARAM_READ.match(command)
+        if match:
+            if response.ok:
+                key = (match.group(1), int(match.group(2)))
+                with self._lock:
+                    self._entries[key] = [response, time.monotonic(), True]
+            return
+        match = PARAM_WRITE.match(command)
+        if match:
+            self.invalidate(match.group(1), int(match.group(2)))
+            return
+        match = MOTION.match(command)
+        if match:
+            for number in self.volatile_params:
+                self.invalidate(match.group(1), number)
+            return
+        if STATUS_QUERY.match(command):
+            return
+        self.invalidate()
+
+    def invalidate(self, axis: str = None, number: int = None):
+        """Invalidate one entry, one axis (number=None) or everything (axis=None)."""
+        with self._lock:
+            for key, entry in self._entries.items():
+                if (axis is None or key[0] == axis) and (number is None or key[1] == number):
+                    entry[2] = False
+
+    def value(self, axis: str, number: int):
+        """Last known value of a parameter (even if invalidated), or None."""
+        entry = self._entries.get((axis, number))
+        return entry[0] if entry else None
+
+    def is_fresh(self, axis: str, number: int, max_age=None) -> bool:
+        """True if the entry is valid and younger than max_age (default: the cache's max_age)."""
+        max_age = self.max_age if max_age is None else max_age
+        entry = self._entries.get((axis, number))
+        if not entry or not entry[2]:
+            return False
+        return max_age is None or time.monotonic() - entry[1] <= max_age
@@ -0,0 +1,152 @@
+# model/run_store.py
+
+import bisect
+import json
+import os
+import shutil
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RunStore:
+    """
+    Append-only archive of acquisition runs.
+
+    Layout under `root`:
+        index.jsonl            one JSON record per committed run, appended in order
+        <run_id>/<label>.npy   one uint16 dump array per profile (e.g. X.npy, Y.npy)
+
+    Each index record holds the run id, its start timestamp, a status, run-level
+    metadata (per-phase durations, ...) and, per profile, its file name and
+    metadata (SC settings, drive command, per-phase durations, ...).
+    The index is loaded into memory once, giving O(1) lookup by run id and a
+    binary search by time range. Profiles are memory-mapped when read back;
+    CSV files are only produced on request by export_csv().
+    """
+    INDEX_FILE = "index.jsonl"
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._runs = {}       # run_id -> index record
+        self._timestamps = []  # sorted start timestamps, parallel to _run_ids
+        self._run_ids = []
+        self._pending = {}    # run_id -> record being built (not yet in the index)
+        os.makedirs(root, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        path = os.path.join(self.root, self.INDEX_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    self._add_to_index(json.loads(line))
+                except ValueError as e:
+                    logger.error("Skipping corrupt run index entry in %s: %s", path, e)
+
+    def _add_to_index(self, record):
+        run_id = record["run_id"]
+        self._runs[run_id] = record
+        position = bisect.bisect_right(self._timestamps, record["timestamp"])
+        self._timestamps.insert(position, record["timestamp"])
+        self._run_ids.insert(position, run_id)
+
+    def _next_run_id(self):
+        existing = [int(run_id) for run_id in list(self._runs) + list(self._pending) if run_id.isdigit()]
+        number = max(existing, default=0) + 1
+        # Directories of runs that were never committed still reserve their id.
+        while os.path.exists(os.path.join(self.root, f"{number:06d}")):
+            number += 1
+        return f"{number:06d}"
+
+    def begin_run(self, **metadata) -> str:
+        """
+        Start a new run and return its id. Nothing is indexed until commit_run();
+        a run that is not committed must be dropped with abort_run().
+        """
+        with self._lock:
+            run_id = self._next_run_id()
+            os.makedirs(os.path.join(self.root, run_id))
+            self._pending[run_id] = {
+                "run_id": run_id,
+                "timestamp": time.time(),
+                "metadata": metadata,
+                "profiles": {},
+            }
+        return run_id
+
+    def save_profile(self, run_id: str, label: str, data, **metadata):
+        """Write one profile's dump array of a pending run to <run_id>/<label>.npy."""
+        import numpy as np  # imported on first use, not at application startup
+        file_name = f"{label}.npy"
+        np.save(os.path.join(self.root, run_id, file_name), np.asarray(data, dtype=np.uint16))
+        with self._lock:
+            self._pending[run_id]["profiles"][label] = dict(metadata, file=file_name)
+
+    def commit_run(self, run_id: str, status: str = "complete", **metadata):
+        """Append a pending run to the index. Returns the index record."""
+        with self._lock:
+            record = self._pending.pop(run_id)
+            record["status"] = status
+            record["metadata"].update(metadata)
+            with open(os.path.join(self.root, self.INDEX_FILE), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+            self._add_to_index(record)
+        logger.info("Run %s committed (%s, profiles: %s).", run_id, status, ', '.join(record['profiles']) or 'none')
+        return record
+
+    def abort_run(self, run_id: str):
+        """Drop a pending run that will not be committed and delete its directory."""
+        with self._lock:
+            if self._pending.pop(run_id, None) is None:
+                return
+            shutil.rmtree(os.path.join(self.root, run_id), ignore_errors=True)
+        logger.info("Run %s aborted.", run_id)
+
+    def get(self, run_id: str):
+        """Return the index record of a committed run, or None."""
+        return self._runs.get(run_id)
+
+    def latest(self, label: str = None):
+        """Return the most recent committed run (optionally: that contains `label`), or None."""
+        with self._lock:
+            for run_id in reversed(self._run_ids):
+                record = self._runs[run_id]
+                if label is None or label in record["profiles"]:
+                    return record
+        return None
+
+    def runs_between(self, start: float, end: float):
+        """Return the records of runs started within [start, end] (Unix timestamps), oldest first."""
+        with self._lock:
+            lo = bisect.bisect_left(self._timestamps, start)
+            hi = bisect.bisect_right(self._timestamps, end)
+            return [self._runs[run_id] for run_id in self._run_ids[lo:hi]]
+
+    def load_profile(self, run_id: str, label: str, mmap: bool = True) -> "numpy.ndarray":
+        """Return a profile's dump array; memory-mapped read-only by default."""
+        import numpy as np
+        record = self._runs[run_id]
+        path = os.path.join(self.root, run_id, record["profiles"][label]["file"])
+        return np.load(path, mmap_mode='r' if mmap else None)
+
+    def export_csv(self, run_id: str, directory: str = ".", name_template: str = "acquired_data_{label}.csv"):
+        """
+        Export every profile of a run in the legacy CSV layout (one hex word per row).
+        Returns the list of written paths.
+        """
+        import numpy as np
+        written = []
+        for label in self._runs[run_id]["profiles"]:
+            path = os.path.join(directory, name_template.format(label=label, run_id=run_id))
+            np.savetxt(path, self.load_profile(run_id, label).reshape(-1, 1), fmt='%04X')
+            written.append(path)
+        return written
@@ -1,16 +1,38 @@
 # model/serial_handler.py
 
+import os
+import re
 import serial
 import threading
 import time
 import logging
+from config import SERIAL_CAPTURE_DIR
+from model.serial_trace import TraceWriter, ReplaySerial, REPLAY_SCHEME, READ, WRITE
+from utils.io_metrics import io_metrics
 
 logger = logging.getLogger(__name__)
+# Byte-level traces, only recorded while a trace is enabled (see logging_config.py).
+wire_logger = logging.getLogger("wire")
+
+# How long the reader thread blocks in a single read before re-checking
+# whether it should stop. Incoming bytes are delivered immediately regardless.
+READER_POLL_INTERVAL = 0.05  # in seconds
+
 
 class SerialHandler:
     """
     A low-level serial port communication class using pyserial.
     Now implements context manager methods.
+
+    Reception is event-driven: a dedicated reader thread per port blocks on the
+    port and appends everything it receives to a buffer. The read methods wait
+    on that buffer with a per-call deadline and return as soon as the requested
+    data (a line, a terminator, N bytes) has arrived.
+
+    While capturing (start_capture(), or SERIAL_CAPTURE_DIR in config.py) every
+    chunk written and read is appended to a binary trace file. A port named
+    "replay://<trace>[?speed=N]" plays such a trace back instead of opening a
+    device (see model/serial_trace.py).
     """
     def __init__(self, port, baud_rate, timeout):
         self.port = port
@@ -18,42 +40,193 @@ class SerialHandler:
         self.timeout = timeout
         self.lock = threading.Lock()
         self.ser = None
+        self._rx = bytearray()
+        self._rx_cond = threading.Condition()
+        self._reader = None
+        self._reader_running = False
+        # Byte counters of this port; the models add per-command metrics to it.
+        self.metrics = io_metrics.port(port)
+        self._capture = None
 
     def open(self):
         if not self.ser or not self.ser.is_open:
             try:
-                self.ser = serial.Serial(self.port, self.baud_rate, timeout=self.timeout)
-                logger.info(f"Opened serial port {self.port} at {self.baud_rate} baud.")
+                if self.port.startswith(REPLAY_SCHEME):
+                    self.ser = ReplaySerial.from_url(self.port, timeout=READER_POLL_INTERVAL)
+                    logger.info("Replaying serial trace %s.", self.port[len(REPLAY_SCHEME):])
+                else:
+                    self.ser = serial.Serial(self.port, self.baud_rate, timeout=READER_POLL_INTERVAL)
+                    logger.info("Opened serial port %s at %s baud.", self.port, self.baud_rate)
             except Exception as e:
-                logger.error(f"Error opening serial port {self.port}: {e}")
+                logger.error("Error opening serial port %s: %s", self.port, e)
+                return
+            if SERIAL_CAPTURE_DIR and self._capture is None:
+                self.start_capture()
+            self._start_reader()
 
     def close(self):
+        self._stop_reader()
         if self.ser and self.ser.is_open:
             self.ser.close()
-            logger.info(f"Closed serial port {self.port}.")
+            logger.info("Closed serial port %s.", self.port)
+        self.stop_capture()
+
+    def _capture_path(self, directory):
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", self.port).strip("_")
+        return os.path.join(directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.trace")
+
+    def start_capture(self, path=None, directory=None) -> str:
+        """
+        Record every chunk written to and read from the port (with timestamps) to
+        a trace file. Without `path` a new file named after the port and the time
+        is created in `directory` (default: SERIAL_CAPTURE_DIR or the working directory).
+        Returns the path.
+        """
+        if path is None:
+            path = self._capture_path(directory or SERIAL_CAPTURE_DIR or ".")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.stop_capture()
+        self._capture = TraceWriter(path, self.port, self.baud_rate)
+        logger.info("Capturing serial traffic of %s to %s.", self.port, path)
+        return path
+
+    def stop_capture(self):
+        capture, self._capture = self._capture, None
+        if capture is not None:
+            capture.close()
+            logger.info("Serial capture of %s written to %s.", self.port, capture.path)
+
+    def _start_reader(self):
+        self._reader_running = True
+        self._reader = threading.Thread(target=self._read_loop, name=f"SerialReader-{self.port}", daemon=True)
+        self._reader.start()
+
+    def _stop_reader(self):
+        self._reader_running = False
+        if self._reader and self._reader is not threading.current_thread():
+            self._reader.join(timeout=2 * READER_POLL_INTERVAL + 1)
+        self._reader = None
+        with self._rx_cond:
+            self._rx_cond.notify_all()
+
+    def _read_loop(self):
+        """Reader thread: move incoming bytes into the receive buffer and wake waiters."""
+        ser = self.ser
+        while self._reader_running:
+            try:
+                data = ser.read(1)
+                if not data:
+                    continue
+                waiting = ser.in_waiting
+                if waiting:
+                    data += ser.read(waiting)
+            except Exception as e:
+                if self._reader_running:
+                    logger.error("Error reading from serial port %s: %s", self.port, e)
+                break
+            self.metrics.count_in(len(data))
+            capture = self._capture
+            if capture is not None:
+                capture.record(READ, data)
+            if wire_logger.isEnabledFor(logging.DEBUG):
+                wire_logger.debug("%s <- %r", self.port, data)
+            with self._rx_cond:
+                self._rx += data
+                self._rx_cond.notify_all()
+        self._reader_running = False
+        with self._rx_cond:
+            self._rx_cond.notify_all()
+
+    @property
+    def is_open(self) -> bool:
+        return bool(self.ser and self.ser.is_open)
+
+    @property
+    def is_receiving(self) -> bool:
+        """True while the port is open and its reader thread is running."""
+        return self.is_open and self._reader_running
 
     def write_bytes(self, data: bytes):
         with self.lock:
             if self.ser and self.ser.is_open:
                 try:
                     self.ser.write(data)
-                    logger.debug(f"Written bytes to {self.port}: {data}")
+                    self.metrics.count_out(len(data))
+                    capture = self._capture
+                    if capture is not None:
+                        capture.record(WRITE, data)
+                    if wire_logger.isEnabledFor(logging.DEBUG):
+                        wire_logger.debug("%s -> %r", self.port, bytes(data))
                 except Exception as e:
-                    logger.error(f"Error writing to serial port {self.port}: {e}")
+                    logger.error("Error writing to serial port %s: %s", self.port, e)
             else:
                 logger.warning("Serial port is not open when trying to write.")
 
-    def read_line(self) -> str:
-        with self.lock:
-            if not self.ser or not self.ser.is_open:
-                return ""
-            try:
-                line = self.ser.readline().decode(errors='replace').strip()
-                logger.debug(f"Read line from {self.port}: {line}")
-                return line
-            except Exception as e:
-                logger.error(f"Error reading from serial port {self.port}: {e}")
-                return ""
+    def _wait_for(self, predicate, timeout):
+        """
+        Wait until predicate(buffer) returns the number of bytes to consume (> 0) or
+        the deadline passes. On timeout whatever has been buffered is returned, which
+        matches pyserial's readline()/read_until() semantics.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        deadline = time.monotonic() + timeout
+        with self._rx_cond:
+            while True:
+                count = predicate(self._rx)
+                if count:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._reader_running:
+                    count = len(self._rx)
+                    break
+                self._rx_cond.wait(remaining)
+            data = bytes(self._rx[:count])
+            del self._rx[:count]
+            return data
+
+    def read_until(self, terminator: bytes = b'\n', timeout=None) -> bytes:
+        """Return buffered bytes up to and including `terminator` (or what arrived before the deadline)."""
+        def up_to_terminator(buffer):
+            index = buffer.find(terminator)
+            return index + len(terminator) if index >= 0 else 0
+        return self._wait_for(up_to_terminator, timeout)
+
+    def read_exact(self, size: int, timeout=None) -> bytes:
+        """Return exactly `size` bytes, or fewer if the deadline passes first."""
+        return self._wait_for(lambda buffer: size if len(buffer) >= size else 0, timeout)
+
+    def read_available(self, timeout=None) -> bytes:
+        """Wait for at least one byte and return everything currently buffered."""
+        return self._wait_for(len, timeout)
+
+    def take_buffered(self) -> bytes:
+        """Return (and consume) everything currently buffered without waiting."""
+        with self._rx_cond:
+            data = bytes(self._rx)
+            self._rx.clear()
+            return data
+
+    def unread(self, data: bytes):
+        """Push bytes back to the front of the receive buffer."""
+        with self._rx_cond:
+            self._rx[:0] = data
+            self._rx_cond.notify_all()
+
+    def reset_input_buffer(self):
+        with self._rx_cond:
+            self._rx.clear()
+
+    def read_line(self, timeout=None) -> str:
+        if not self.ser or not self.ser.is_open:
+            return ""
+        try:
+            return self.read_until(b'\n', timeout).decode(errors='replace').strip()
+        except Exception as e:
+            logger.error("Error reading from serial port %s: %s", self.port, e)
+            return ""
 
     # Context manager support.
     def __enter__(self):
@@ -0,0 +1,188 @@
+# model/serial_trace.py
+"""
+Record and replay of serial traffic.
+
+Trace file format (little endian):
+  - magic b"LPSCTRC\\x01", a uint16 length and a JSON header
+    ({"port", "baud_rate", "started"}),
+  - then one record per chunk: float64 seconds since the capture started
+    (monotonic clock), one direction byte (b"W" host -> device, b"R" device ->
+    host), a uint32 length and the bytes themselves.
+
+SerialHandler writes a trace while capturing (see SerialHandler.start_capture)
+and opens a ReplaySerial instead of a real port for "replay://<trace path>"
+port names, so MotorModel and AcqModel run unchanged against a recorded session.
+"""
+
+import json
+import struct
+import threading
+import time
+import logging
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"LPSCTRC\x01"
+WRITE = b"W"
+READ = b"R"
+REPLAY_SCHEME = "replay://"
+
+_HEADER_LENGTH = struct.Struct("<H")
+_RECORD = struct.Struct("<dcI")
+
+
+class TraceWriter:
+    """Appends timestamped chunks to a trace file; safe to call from the reader and writer threads."""
+    def __init__(self, path, port="", baud_rate=0):
+        self.path = path
+        self._file = open(path, "wb")
+        header = json.dumps({"port": port, "baud_rate": baud_rate, "started": time.time()}).encode()
+        self._file.write(MAGIC + _HEADER_LENGTH.pack(len(header)) + header)
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, direction: bytes, data):
+        entry = _RECORD.pack(time.monotonic() - self._started, direction, len(data)) + bytes(data)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(entry)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_trace(path):
+    """
+    Load a trace file.
+
+    :return: (header dict, list of (seconds, direction, bytes) records)
+    :raises ValueError: If the file is not a trace.
+    """
+    with open(path, "rb") as f:
+        content = f.read()
+    if not content.startswith(MAGIC):
+        raise ValueError(f"{path} is not a serial trace file")
+    offset = len(MAGIC)
+    (length,) = _HEADER_LENGTH.unpack_from(content, offset)
+    offset += _HEADER_LENGTH.size
+    header = json.loads(content[offset:offset + length])
+    offset += length
+    records = []
+    while offset + _RECORD.size <= len(content):
+        timestamp, direction, size = _RECORD.unpack_from(content, offset)
+        offset += _RECORD.size
+        records.append((timestamp, direction, content[offset:offset + size]))
+        offset += size
+    return header, records
+
+
+class ReplaySerial:
+    """
+    Stand-in for serial.Serial that plays the device side of a trace.
+
+    Bytes the host writes consume the trace's W records; the R records that
+    follow are then delivered to the host, either with their recorded delay
+    relative to the preceding write (speed=1, the default), scaled (speed=N),
+    or immediately (speed=0). R records still pending when the host writes
+    are delivered at once. Writes that do not match the trace are counted
+    in `mismatches` and do not stop the replay.
+    """
+    def __init__(self, path, timeout=None, speed=1.0):
+        self.path = path
+        self.timeout = timeout
+        self.speed = speed
+        self.header, self._records = read_trace(path)
+        self._index = 0
+        self._offset = 0  # bytes of the current W record already written by the host
+        self._available = bytearray()
+        self._anchor = (0.0, time.monotonic())  # (trace time, wall time) of the last write
+        self._cond = threading.Condition()
+        self.mismatches = 0
+        self.is_open = True
+
+    @classmethod
+    def from_url(cls, url: str, timeout=None):
+        """Open "replay://<path>[?speed=N]"."""
+        path, _, query = url[len(REPLAY_SCHEME):].partition("?")
+        speed = float(parse_qs(query).get("speed", ["1"])[0])
+        return cls(path, timeout, speed)
+
+    @property
+    def finished(self) -> bool:
+        """True once every record of the trace has been played."""
+        return self._index >= len(self._records)
+
+    def _release_due(self):
+        """Move the R records that are due into the receive buffer; return the next due time or None."""
+        now = time.monotonic()
+        while self._index < len(self._records):
+            timestamp, direction, data = self._records[self._index]
+            if direction != READ:
+                return None
+            if self.speed > 0:
+                anchor_time, anchor_wall = self._anchor
+                due = anchor_wall + (timestamp - anchor_time) / self.speed
+                if due > now:
+                    return due
+            self._available += data
+            self._index += 1
+        return None
+
+    def read(self, size=1) -> bytes:
+        deadline = time.monotonic() + (self.timeout if self.timeout is not None else 1e9)
+        with self._cond:
+            while self.is_open:
+                next_due = self._release_due()
+                if self._available:
+                    data = bytes(self._available[:size])
+                    del self._available[:size]
+                    return data
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                self._cond.wait(min(deadline, next_due or deadline) - now)
+        return b""
+
+    @property
+    def in_waiting(self) -> int:
+        with self._cond:
+            self._release_due()
+            return len(self._available)
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        position = 0
+        with self._cond:
+            while position < len(data) and self._index < len(self._records):
+                timestamp, direction, expected = self._records[self._index]
+                if direction != WRITE:
+                    # Recorded before this write (e.g. interleaved with pipelined
+                    # commands): the device has sent it by now.
+                    self._available += expected
+                    self._index += 1
+                    continue
+                take = min(len(data) - position, len(expected) - self._offset)
+                if data[position:position + take] != expected[self._offset:self._offset + take]:
+                    self.mismatches += 1
+                position += take
+                self._offset += take
+                if self._offset == len(expected):
+                    self._index += 1
+                    self._offset = 0
+                    self._anchor = (timestamp, time.monotonic())
+            if position < len(data):
+                # The host wrote more than the trace contains.
+                self.mismatches += 1
+            self._cond.notify_all()
+        return len(data)
+
+    def close(self):
+        with self._cond:
+            self.is_open = False
+            self._cond.notify_all()
+        if self.mismatches:
+            logger.warning("Replay of %s: %d write(s) did not match the trace.", self.path, self.mismatches)
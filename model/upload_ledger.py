@@ -0,0 +1,70 @@
+# model/upload_ledger.py
+
+import json
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class UploadLedger:
+    """
+    Append-only record of successful program uploads.
+
+    Each line of the JSONL file holds the program name, the hash of its
+    normalized content (line numbers stripped, "\\n" line endings), the
+    controller it was uploaded to, its size and the upload timestamp. The
+    latest entry per (program, controller) is kept in memory, so the uploader
+    can tell, before it sends the header, whether the controller already has
+    the content it is about to send. The hash is computed by the uploader when
+    it prepares the file (ProgramUploader.prepare).
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._latest = {}  # (program, controller) -> record
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                    self._latest[(record["program"], record["controller"])] = record
+                except (ValueError, KeyError) as e:
+                    logger.error("Skipping corrupt upload ledger entry in %s: %s", self.path, e)
+
+    def lookup(self, program: str, controller: str):
+        """Return the latest upload record of `program` on `controller`, or None."""
+        with self._lock:
+            return self._latest.get((program, controller))
+
+    def is_current(self, program: str, controller: str, digest: str) -> bool:
+        """True if the last successful upload of `program` to `controller` had this content hash."""
+        record = self.lookup(program, controller)
+        return record is not None and record["content_hash"] == digest
+
+    def record(self, program: str, controller: str, digest: str, size: int):
+        """Append a successful upload. Returns the ledger record."""
+        record = {
+            "program": program,
+            "controller": controller,
+            "content_hash": digest,
+            "bytes": size,
+            "timestamp": time.time(),
+        }
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+            self._latest[(program, controller)] = record
+        return record
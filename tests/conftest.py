@@ -0,0 +1,7 @@
+# tests/conftest.py
+# The modules import each other from the repository root (e.g. "from config import ...").
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
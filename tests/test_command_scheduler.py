@@ -0,0 +1,158 @@
+# tests/test_command_scheduler.py
+
+import threading
+import time
+
+import pytest
+
+from model.command_scheduler import (CommandScheduler, CommandTimeoutError, QueueFullError,
+                                     EMERGENCY, INTERACTIVE, SEQUENCE, BACKGROUND)
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = CommandScheduler("test")
+    yield scheduler
+    scheduler.shutdown()
+
+
+def block(scheduler):
+    """Occupy the scheduler thread until the returned event is set."""
+    gate = threading.Event()
+    started = threading.Event()
+
+    def wait():
+        started.set()
+        gate.wait(5)
+
+    scheduler.submit(wait, priority=EMERGENCY)
+    assert started.wait(5)
+    return gate
+
+
+def test_priority_then_submission_order(scheduler):
+    ran = []
+    gate = block(scheduler)
+    futures = [scheduler.submit(ran.append, name, priority=priority)
+               for name, priority in (("poll", BACKGROUND), ("sequence 1", SEQUENCE),
+                                      ("typed", INTERACTIVE), ("sequence 2", SEQUENCE),
+                                      ("stop", EMERGENCY))]
+    gate.set()
+    for future in futures:
+        future.result(5)
+    assert ran == ["stop", "typed", "sequence 1", "sequence 2", "poll"]
+
+
+def test_hold_dispatches_only_holder_and_emergency_jobs(scheduler):
+    holder, other = object(), object()
+    ran = []
+    assert scheduler.hold(holder)
+    gate = block(scheduler)
+    waiting = scheduler.submit(ran.append, "other", priority=INTERACTIVE, owner=other)
+    mine = scheduler.submit(ran.append, "holder", priority=SEQUENCE, owner=holder)
+    stop = scheduler.submit(ran.append, "stop", priority=EMERGENCY, owner=other)
+    gate.set()
+    mine.result(5)
+    stop.result(5)
+    assert ran == ["stop", "holder"]
+    assert not waiting.done()
+
+    scheduler.release(holder)
+    waiting.result(5)
+    assert ran == ["stop", "holder", "other"]
+
+
+def test_hold_times_out_while_another_owner_holds(scheduler):
+    holder, other = object(), object()
+    assert scheduler.hold(holder)
+    assert not scheduler.hold(other, timeout=0.05)
+    scheduler.release(other)  # Not the holder: ignored.
+    assert not scheduler.hold(other, timeout=0.05)
+    scheduler.release(holder)
+    assert scheduler.hold(other, timeout=0.05)
+
+
+def test_generator_jobs_interleave_step_by_step(scheduler):
+    ran = []
+
+    def bulk(name, steps):
+        for step in range(steps):
+            if step:
+                yield
+            ran.append(f"{name}{step}")
+        return name
+
+    gate = block(scheduler)
+    a = scheduler.submit(bulk, "a", 3, priority=BACKGROUND)
+    b = scheduler.submit(bulk, "b", 2, priority=BACKGROUND)
+    gate.set()
+    assert (a.result(5), b.result(5)) == ("a", "b")
+    assert ran == ["a0", "b0", "a1", "b1", "a2"]
+
+
+def test_higher_priority_job_waits_for_one_step_only(scheduler):
+    ran = []
+    first_step = threading.Event()
+    resume = threading.Event()
+
+    def bulk():
+        for step in range(3):
+            if step:
+                yield
+            ran.append(f"poll{step}")
+            if step == 0:
+                first_step.set()
+                resume.wait(5)
+
+    poll = scheduler.submit(bulk, priority=BACKGROUND)
+    assert first_step.wait(5)
+    typed = scheduler.submit(ran.append, "typed", priority=INTERACTIVE)
+    resume.set()
+    typed.result(5)
+    poll.result(5)
+    assert ran == ["poll0", "typed", "poll1", "poll2"]
+
+
+def test_call_times_out_and_cancels_while_port_is_held(scheduler):
+    holder = object()
+    ran = []
+    assert scheduler.hold(holder)
+    start = time.monotonic()
+    with pytest.raises(CommandTimeoutError, match="held by another worker"):
+        scheduler.call(ran.append, "typed", priority=INTERACTIVE, timeout=0.1)
+    assert time.monotonic() - start < 2
+    assert scheduler.pending() == 0
+    scheduler.release(holder)
+    scheduler.call(lambda: None)
+    assert ran == []
+
+
+def test_call_waits_for_a_started_job_past_its_timeout(scheduler):
+    def slow():
+        time.sleep(0.3)
+        return "reply"
+
+    assert scheduler.call(slow, timeout=0.05) == "reply"
+
+
+def test_call_from_a_job_runs_inline(scheduler):
+    def outer():
+        # Would deadlock if it were queued behind the running job.
+        return scheduler.call(lambda: "inner", priority=BACKGROUND)
+
+    assert scheduler.call(outer) == "inner"
+
+
+def test_queue_bound_spares_emergency_jobs():
+    scheduler = CommandScheduler("bounded", max_queue=2)
+    try:
+        gate = block(scheduler)
+        scheduler.submit(lambda: None)
+        scheduler.submit(lambda: None)
+        with pytest.raises(QueueFullError):
+            scheduler.submit(lambda: None)
+        stop = scheduler.submit(lambda: "stopped", priority=EMERGENCY)
+        gate.set()
+        assert stop.result(5) == "stopped"
+    finally:
+        scheduler.shutdown()
@@ -0,0 +1,130 @@
+# tests/test_program_uploader.py
+
+from types import SimpleNamespace
+
+import pytest
+
+from controller import program_uploader
+from controller.program_uploader import ProgramUploader
+from model.command_scheduler import CommandScheduler, INTERACTIVE
+from model.motor_frame import MotorResponse
+from model.upload_ledger import UploadLedger
+
+PROGRAM = "".join(f"{(i + 1) * 10} XP01S{i} ; line {i}\n" for i in range(40))
+
+
+class FakeMotorModel:
+    """Answers like the controller: "O"/"E" to a QP header, an empty ACK to every block."""
+    def __init__(self):
+        self.scheduler = CommandScheduler("fake motor")
+        self.serial_handler = SimpleNamespace(port="COM3")
+        self.programs = set()
+        self.sent = []
+
+    def send_command(self, text_command, priority=INTERACTIVE, owner=None):
+        self.sent.append(text_command)
+        if text_command.startswith("QP"):
+            name = text_command[2:].rsplit(" S", 1)[0]
+            exists = name in self.programs
+            self.programs.add(name)
+            return MotorResponse(text_command, MotorResponse.ACK, b"E" if exists else b"O")
+        return MotorResponse(text_command, MotorResponse.ACK, b"")
+
+    def close(self):
+        self.scheduler.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def empty_prepared_cache():
+    program_uploader._prepared.clear()
+    program_uploader._prepared_content.clear()
+
+
+@pytest.fixture
+def motor():
+    motor = FakeMotorModel()
+    yield motor
+    motor.close()
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return UploadLedger(str(tmp_path / "upload_ledger.jsonl"))
+
+
+@pytest.fixture
+def program(tmp_path):
+    path = tmp_path / "prog.txt"
+    path.write_text(PROGRAM, encoding="ascii")
+    return str(path)
+
+
+def upload(motor, ledger, path, name="PROG", force=False):
+    """Run one uploader to the end on this thread; returns (progress messages, errors)."""
+    uploader = ProgramUploader(motor, path, name, ledger, force)
+    messages, errors = [], []
+    uploader.progressUpdated.connect(messages.append)
+    uploader.errorOccurred.connect(errors.append)
+    motor.sent.clear()
+    uploader.upload()
+    return messages, errors
+
+
+def test_first_upload_sends_header_and_blocks_and_records_it(motor, ledger, program):
+    messages, errors = upload(motor, ledger, program)
+    assert errors == []
+    content = ProgramUploader.remove_line_numbers(PROGRAM)
+    assert motor.sent[0] == f"QPPROG S{len(content)}"
+    assert "".join(motor.sent[1:]).rstrip(chr(0x04)) == "PROG" + chr(0x17) + content
+    record = ledger.lookup("PROG", "COM3#0")
+    assert record["bytes"] == len(content)
+    assert any("completed successfully" in m for m in messages)
+
+
+def test_unchanged_program_is_skipped_before_the_header(motor, ledger, program):
+    upload(motor, ledger, program)
+    messages, errors = upload(motor, ledger, program)
+    assert errors == []
+    assert motor.sent == []
+    assert any("upload skipped" in m for m in messages)
+
+
+def test_force_uploads_an_unchanged_program(motor, ledger, program):
+    upload(motor, ledger, program)
+    messages, errors = upload(motor, ledger, program, force=True)
+    assert errors == []
+    assert motor.sent[0].startswith("QPPROG S")
+    assert len(motor.sent) > 1
+    assert "Controller response: E" in messages
+
+
+def test_changed_program_is_uploaded_again(motor, ledger, program):
+    upload(motor, ledger, program)
+    with open(program, "a", encoding="ascii") as f:
+        f.write("999 XP01S1 ; changed\n")
+    upload(motor, ledger, program)
+    assert motor.sent[0].startswith("QPPROG S")
+
+
+def test_other_program_name_or_controller_is_not_skipped(motor, ledger, program):
+    upload(motor, ledger, program)
+    upload(motor, ledger, program, name="OTHER")
+    assert motor.sent[0].startswith("QPOTHER S")
+    motor.serial_handler.port = "COM5"
+    upload(motor, ledger, program)
+    assert motor.sent[0].startswith("QPPROG S")
+
+
+def test_file_is_stripped_once_and_reused_from_the_cache(motor, ledger, program, monkeypatch):
+    reads = []
+    stream_content = ProgramUploader.stream_content
+
+    def counting_stream_content(self):
+        reads.append(self.file_path)
+        return stream_content(self)
+
+    monkeypatch.setattr(ProgramUploader, "stream_content", counting_stream_content)
+    upload(motor, ledger, program)
+    assert reads == [program]
+    upload(motor, ledger, program, force=True)
+    assert reads == [program]
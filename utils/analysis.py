@@ -0,0 +1,58 @@
+# utils/analysis.py
+"""
+Derived data shown by the views, memoized in the shared AnalysisCache:
+current profiles converted from raw dump words and the beam heat map
+reconstructed from the X and Y profiles.
+"""
+
+import numpy as np
+from utils.analysis_cache import analysis_cache
+from utils.conversions import words_to_current, hex_text_to_words
+
+
+def profile_current(words, nFR: int = 65535, full_scale_current: float = 25.0,
+                    offset=None, gain=None, cache=analysis_cache) -> np.ndarray:
+    """Cached words_to_current() of a flattened profile (read-only result)."""
+    words = np.asarray(words).ravel()
+    return cache.get_or_compute(
+        "current", (words,),
+        lambda: words_to_current(words, nFR, full_scale_current, offset, gain),
+        nFR=nFR, full_scale_current=full_scale_current, offset=offset, gain=gain,
+    )
+
+
+def beam_map(x_words, y_words, step_size: float = 0.5, decimation: int = 16,
+             nFR: int = 65535, full_scale_current: float = 25.0,
+             offset=None, gain=None, cache=analysis_cache):
+    """
+    Reconstruct the beam current distribution from the X and Y profiles: both
+    are converted to currents, decimated (2048 -> 128 points by default) and
+    combined as an outer product.
+
+    :param step_size: Distance between two decimated points, in mm.
+    :return: (Z, x_axis, y_axis), read-only arrays shared through the cache.
+    """
+    x_words = np.asarray(x_words).ravel()
+    y_words = np.asarray(y_words).ravel()
+
+    def compute():
+        calibration = dict(nFR=nFR, full_scale_current=full_scale_current, offset=offset, gain=gain, cache=cache)
+        x_profile = profile_current(x_words, **calibration)[::decimation]
+        y_profile = profile_current(y_words, **calibration)[::decimation]
+        x_axis = np.arange(len(x_profile)) * step_size
+        y_axis = np.arange(len(y_profile)) * step_size
+        return np.outer(x_profile, y_profile), x_axis, y_axis
+
+    return cache.get_or_compute(
+        "beam", (x_words, y_words), compute,
+        step_size=step_size, decimation=decimation, nFR=nFR,
+        full_scale_current=full_scale_current, offset=offset, gain=gain,
+    )
+
+
+def csv_profile_words(path, cache=analysis_cache) -> np.ndarray:
+    """Words of a legacy acquired_data_<label>.csv file, parsed once per file version."""
+    def parse():
+        with open(path, 'rb') as f:
+            return hex_text_to_words(f.read())
+    return cache.get_or_compute("csv", (cache.file_fingerprint(path),), parse)
@@ -0,0 +1,131 @@
+# utils/analysis_cache.py
+
+import hashlib
+import os
+import threading
+import logging
+from collections import OrderedDict
+import numpy as np
+from config import ANALYSIS_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisCache:
+    """
+    Content-addressed LRU cache for derived data (converted current profiles,
+    beam maps, parsed files).
+
+    An entry is keyed by a kind, the fingerprints of its inputs and the
+    parameters it was computed with, so the same data reached by different
+    paths (live dump, run store, CSV) shares one entry and a change of any
+    parameter (step size, decimation, calibration) is a new entry. Arrays are
+    fingerprinted by content (BLAKE2b over dtype, shape and bytes); files by
+    path, size and modification time. Entries are evicted least recently used
+    first once their total size exceeds `max_bytes`.
+
+    Cached arrays are made read-only since every caller shares them.
+    """
+    def __init__(self, max_bytes=ANALYSIS_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size in bytes)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(value) -> str:
+        """Content hash of an array (or of anything that converts to one)."""
+        array = np.ascontiguousarray(value)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{array.dtype.str}{array.shape}".encode('ascii'))
+        digest.update(array.data)
+        return digest.hexdigest()
+
+    @staticmethod
+    def file_fingerprint(path) -> tuple:
+        """Identity of a file's current content: (absolute path, size, mtime in ns)."""
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+    def key(self, kind, inputs=(), **params) -> tuple:
+        """Build the cache key; arrays among inputs and parameter values are fingerprinted."""
+        def identity(value):
+            if isinstance(value, np.ndarray):
+                return self.fingerprint(value)
+            if isinstance(value, (list, tuple)):
+                return tuple(identity(item) for item in value)
+            return value
+        return (kind, tuple(identity(item) for item in inputs),
+                tuple(sorted((name, identity(value)) for name, value in params.items())))
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = _nbytes(value)
+        _freeze(value)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            if size > self.max_bytes:
+                return value
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted
+        return value
+
+    def get_or_compute(self, kind, inputs, compute, **params):
+        """
+        Return the cached result for (kind, inputs, params), calling compute()
+        and storing its result on a miss.
+        """
+        key = self.key(kind, inputs, **params)
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, compute())
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    @property
+    def size(self) -> int:
+        """Total size of the cached values, in bytes."""
+        return self._size
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _nbytes(value) -> int:
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(item) for item in value)
+    return 64
+
+
+def _freeze(value):
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _freeze(item)
+
+
+# Shared instance used by the views.
+analysis_cache = AnalysisCache()
@@ -1,5 +1,15 @@
 # utils/conversions.py
 
+import functools
+import re
+import numpy as np
+
+# Maps an ASCII byte to its hex digit value; 0xFF marks a byte that is not a hex digit.
+_HEX_DIGITS = np.full(256, 0xFF, dtype=np.uint8)
+_HEX_DIGITS[np.frombuffer(b"0123456789", dtype=np.uint8)] = np.arange(10)
+_HEX_DIGITS[np.frombuffer(b"ABCDEF", dtype=np.uint8)] = np.arange(10, 16)
+_HEX_DIGITS[np.frombuffer(b"abcdef", dtype=np.uint8)] = np.arange(10, 16)
+
 def text_to_hex(text: str) -> str:
     """
     Convert a text string to its hexadecimal representation.
@@ -23,6 +33,8 @@ def hex_to_current(hex_str: str, nFR: int = 65535, full_scale_current: float = 2
 
         I_c = (n_ENTREE / nFR) * full_scale_current
 
+    Scalar wrapper around the cached lookup table used by words_to_current.
+
     :param hex_str: The ADC reading as a hexadecimal string.
     :param nFR: The full-scale ADC value (default is 65535 for 16-bit data).
     :param full_scale_current: The current corresponding to full scale (default is 25 A).
@@ -31,8 +43,132 @@ def hex_to_current(hex_str: str, nFR: int = 65535, full_scale_current: float = 2
     try:
         # Convert the hex string to an integer.
         nENTREE = int(hex_str, 16)
-        current = (nENTREE / nFR) * full_scale_current
-        return current
+        if 0 <= nENTREE <= 0xFFFF:
+            return float(current_lut(nFR, full_scale_current)[nENTREE])
+        return (nENTREE / nFR) * full_scale_current
     except Exception as e:
         # You may wish to log the error or handle it as needed.
         return 0.0
+
+
+@functools.lru_cache(maxsize=8)
+def current_lut(nFR: int = 65535, full_scale_current: float = 25.0) -> np.ndarray:
+    """
+    Return the (read-only) 65536-entry table mapping every 16-bit ADC reading to
+    its current in amperes. Tables are built once per (nFR, full_scale_current).
+    """
+    lut = np.arange(0x10000, dtype=np.float64) * (full_scale_current / nFR)
+    lut.setflags(write=False)
+    return lut
+
+
+def hex_lines_to_words(lines, words_per_line: int, out=None) -> np.ndarray:
+    """
+    Decode lines of comma-separated hex words (as bytes, e.g. "03F5,0433,...")
+    into a (len(lines), words_per_line) uint16 array.
+
+    When all lines share the same fixed-width layout (the normal case for the
+    acquisition card) the whole block is decoded in a handful of vectorized
+    NumPy operations on the raw bytes; otherwise each word is parsed on its own.
+
+    :param lines: Sequence of bytes objects, one per line, without line terminators.
+    :param words_per_line: Number of words expected on each line.
+    :param out: Optional preallocated uint16 array of the right shape to decode into.
+    :return: The decoded array (`out` if given).
+    :raises ValueError: If a line has the wrong number of words, or a word is not hex
+                        or does not fit in 16 bits.
+    """
+    count = len(lines)
+    if out is None:
+        out = np.empty((count, words_per_line), dtype=np.uint16)
+    if count == 0:
+        return out
+    length = len(lines[0])
+    width = (length + 1) // words_per_line - 1
+    if ((length + 1) % words_per_line == 0 and 1 <= width <= 4
+            and all(len(line) == length for line in lines)):
+        # Joining with (and appending) a comma gives every word the same "XXXX," cell.
+        raw = np.frombuffer(b",".join(lines) + b",", dtype=np.uint8).reshape(count, words_per_line, width + 1)
+        separators = raw[:, :, width]
+        digits = _HEX_DIGITS[raw[:, :, :width]]
+        if (separators == ord(',')).all() and (digits != 0xFF).all():
+            values = np.zeros((count, words_per_line), dtype=np.uint16)
+            for column in range(width):
+                values <<= 4
+                values |= digits[:, :, column]
+            out[...] = values
+            return out
+    for row, line in enumerate(lines):
+        parts = line.split(b',')
+        if len(parts) != words_per_line:
+            raise ValueError(f"Expected {words_per_line} words, got {len(parts)}: {line!r}")
+        values = [int(part, 16) for part in parts]
+        if not all(0 <= value <= 0xFFFF for value in values):
+            raise ValueError(f"Word out of 16-bit range: {line!r}")
+        out[row] = values
+    return out
+
+
+def words_to_current(words, nFR: int = 65535, full_scale_current: float = 25.0,
+                     offset=None, gain=None) -> np.ndarray:
+    """
+    Convert an array of raw 16-bit ADC readings into currents in amperes in one
+    table lookup (same formula as hex_to_current).
+
+    Optional per-channel calibration is applied as ``current * gain + offset``.
+    The channel of a reading is its position along the last axis of `words`
+    (e.g. the 16 columns of a (128, 16) dump); for a flat array it is the index
+    modulo the table length.
+
+    :param words: Array-like of uint16 readings, any shape.
+    :param offset: Optional per-channel offsets in amperes.
+    :param gain: Optional per-channel gain factors.
+    :return: float64 array of currents with the shape of `words`.
+    :raises ValueError: If a reading is not an integer in 0..65535.
+    """
+    words = np.asarray(words)
+    if words.dtype != np.uint16:
+        if words.dtype.kind not in "iu":
+            raise ValueError(f"ADC readings must be integers, got {words.dtype}.")
+        if words.size and (words.min() < 0 or words.max() > 0xFFFF):
+            raise ValueError("ADC reading out of 16-bit range.")
+        words = words.astype(np.uint16)
+    currents = current_lut(nFR, full_scale_current).take(words)
+    if gain is not None or offset is not None:
+        channels = _channel_view(currents, len(gain if gain is not None else offset))
+        if gain is not None:
+            channels *= np.asarray(gain, dtype=np.float64)
+        if offset is not None:
+            channels += np.asarray(offset, dtype=np.float64)
+    return currents
+
+
+def _channel_view(values: np.ndarray, n_channels: int) -> np.ndarray:
+    """View `values` with the channel index on the last axis so tables broadcast."""
+    if values.ndim > 1 and values.shape[-1] == n_channels:
+        return values
+    if values.size % n_channels:
+        raise ValueError(f"Cannot split {values.size} readings into {n_channels} channels.")
+    return values.reshape(-1, n_channels)
+
+
+_HEX_TOKEN_SEPARATORS = re.compile(rb"[\s,;]+")
+
+
+def hex_text_to_words(text) -> np.ndarray:
+    """
+    Decode a buffer of hex words separated by commas and/or whitespace
+    (e.g. a dump, or a one-word-per-line CSV file) into a flat uint16 array.
+    """
+    if isinstance(text, str):
+        text = text.encode('ascii')
+    tokens = [token for token in _HEX_TOKEN_SEPARATORS.split(text) if token]
+    if not tokens:
+        return np.empty(0, dtype=np.uint16)
+    return hex_lines_to_words(tokens, 1).ravel()
+
+
+def hex_text_to_current(text, nFR: int = 65535, full_scale_current: float = 25.0,
+                        offset=None, gain=None) -> np.ndarray:
+    """Batch counterpart of hex_to_current for a whole buffer of hex text."""
+    return words_to_current(hex_text_to_words(text), nFR, full_scale_current, offset, gain)
@@ -0,0 +1,271 @@
+# utils/io_metrics.py
+"""
+Per-port serial I/O metrics.
+
+For every port: bytes in/out, and per command type ("XPnnR", "A", "D", "SC",
+"upload block", ...) the number of exchanges, timeouts, NAKs, errors,
+retries, request/reply bytes and a round-trip latency histogram.
+
+Recording is a handful of integer updates: no locks (each port has a single
+writer at a time: its reader thread for incoming bytes, the port's
+scheduler thread for exchanges) and no allocation once a command type has been
+seen. With the registry disabled every record call returns after one
+attribute test.
+
+The latency histogram is HDR-style: microsecond values are counted in
+log-linear buckets (16 sub-buckets per power of two, i.e. ~6 % relative
+precision) over a fixed array, so recording is O(1) and percentiles are
+read back without keeping samples.
+"""
+
+import json
+import os
+import re
+import time
+from config import IO_METRICS_ENABLED
+
+OK = "ok"
+TIMEOUT = "timeout"
+NAK = "nak"
+ERROR = "error"
+
+# Commands longer than this are program upload blocks.
+_MAX_COMMAND_LENGTH = 32
+# Bound on distinct command types per port; further ones are counted as "other".
+_MAX_COMMAND_TYPES = 64
+_DIGITS = re.compile(r"\d")
+_command_types = {}
+
+
+def command_type(command: str) -> str:
+    """
+    Metric label of a command: digits become 'n' ("XP01R" -> "XPnnR"), acquisition
+    arguments are dropped ("SC,002,005" -> "SC"), long payloads are "upload block".
+    """
+    label = _command_types.get(command)
+    if label is None:
+        if len(command) > _MAX_COMMAND_LENGTH:
+            return "upload block"
+        label = _DIGITS.sub("n", command.split(",", 1)[0])
+        if len(_command_types) < 4096:
+            _command_types[command] = label
+    return label
+
+
+class LatencyHistogram:
+    """Log-linear histogram of durations, recorded in microseconds."""
+    SUB_BUCKET_BITS = 4
+    SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+    # Covers up to 2**40 us (~12 days); larger values land in the last bucket.
+    BUCKETS = (40 - SUB_BUCKET_BITS + 2) * SUB_BUCKETS
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    def record(self, seconds: float):
+        value = int(seconds * 1e6)
+        if value < 0:
+            value = 0
+        if value < 2 * self.SUB_BUCKETS:
+            index = value
+        else:
+            shift = value.bit_length() - self.SUB_BUCKET_BITS - 1
+            index = (shift + 1) * self.SUB_BUCKETS + (value >> shift) - self.SUB_BUCKETS
+            if index >= self.BUCKETS:
+                index = self.BUCKETS - 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total_us += value
+        if value > self.max_us:
+            self.max_us = value
+        if self.min_us is None or value < self.min_us:
+            self.min_us = value
+
+    @classmethod
+    def _bucket_value(cls, index) -> int:
+        """Midpoint (in us) of the values counted in bucket `index`."""
+        if index < 2 * cls.SUB_BUCKETS:
+            return index
+        shift = index // cls.SUB_BUCKETS - 1
+        low = (index % cls.SUB_BUCKETS + cls.SUB_BUCKETS) << shift
+        return low + ((1 << shift) - 1) // 2
+
+    def percentile(self, p: float) -> float:
+        """Value (in seconds) below which `p` percent of the recorded durations fall."""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(self.count * p / 100.0 + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self._bucket_value(index), self.max_us) / 1e6
+        return self.max_us / 1e6
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "min": (self.min_us or 0) / 1e6,
+            "mean": self.total_us / self.count / 1e6 if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max_us / 1e6,
+            "sum": self.total_us / 1e6,
+        }
+
+
+class CommandMetrics:
+    """Counters and latency histogram of one command type on one port."""
+    __slots__ = ("count", "timeouts", "naks", "errors", "retries", "bytes_out", "bytes_in", "latency")
+
+    def __init__(self):
+        self.count = 0
+        self.timeouts = 0
+        self.naks = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.latency = LatencyHistogram()
+
+    def snapshot(self) -> dict:
+        return {"count": self.count, "timeouts": self.timeouts, "naks": self.naks,
+                "errors": self.errors, "retries": self.retries,
+                "bytes_out": self.bytes_out, "bytes_in": self.bytes_in,
+                "latency": self.latency.summary()}
+
+
+class PortMetrics:
+    """Metrics of one serial port; obtained from IoMetrics.port()."""
+    def __init__(self, registry, port: str):
+        self.registry = registry
+        self.port = port
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.commands = {}  # command type -> CommandMetrics
+
+    def count_in(self, size: int):
+        if self.registry.enabled:
+            self.bytes_in += size
+
+    def count_out(self, size: int):
+        if self.registry.enabled:
+            self.bytes_out += size
+
+    def _command(self, command: str) -> CommandMetrics:
+        label = command_type(command)
+        metrics = self.commands.get(label)
+        if metrics is None:
+            if len(self.commands) >= _MAX_COMMAND_TYPES:
+                label = "other"
+                metrics = self.commands.get(label)
+            if metrics is None:
+                metrics = self.commands[label] = CommandMetrics()
+        return metrics
+
+    def exchange(self, command: str, elapsed: float, status: str = OK, bytes_out: int = 0, bytes_in: int = 0):
+        """
+        Record one command/reply exchange.
+
+        :param command: Text command (classified with command_type()).
+        :param elapsed: Round-trip time in seconds (command written -> reply complete or deadline).
+        :param status: OK, TIMEOUT, NAK or ERROR.
+        """
+        if not self.registry.enabled:
+            return
+        metrics = self._command(command)
+        metrics.count += 1
+        metrics.bytes_out += bytes_out
+        metrics.bytes_in += bytes_in
+        metrics.latency.record(elapsed)
+        if status != OK:
+            if status == TIMEOUT:
+                metrics.timeouts += 1
+            elif status == NAK:
+                metrics.naks += 1
+            else:
+                metrics.errors += 1
+
+    def retry(self, command: str):
+        """Count a repeated command (e.g. one more "A" status poll)."""
+        if self.registry.enabled:
+            self._command(command).retries += 1
+
+    def snapshot(self) -> dict:
+        return {"bytes_in": self.bytes_in, "bytes_out": self.bytes_out,
+                "commands": {label: metrics.snapshot() for label, metrics in list(self.commands.items())}}
+
+
+class IoMetrics:
+    """Registry of the PortMetrics of all ports, with JSON and Prometheus text exports."""
+    def __init__(self, enabled: bool = IO_METRICS_ENABLED):
+        self.enabled = enabled
+        self.started = time.time()
+        self._ports = {}
+
+    def port(self, name: str) -> PortMetrics:
+        metrics = self._ports.get(name)
+        if metrics is None:
+            metrics = self._ports[name] = PortMetrics(self, name)
+        return metrics
+
+    def reset(self):
+        """Clear all counters (the PortMetrics objects held by the ports stay valid)."""
+        for metrics in list(self._ports.values()):
+            metrics.bytes_in = metrics.bytes_out = 0
+            metrics.commands = {}
+        self.started = time.time()
+
+    def snapshot(self) -> dict:
+        return {"enabled": self.enabled, "since": self.started, "time": time.time(),
+                "ports": {name: metrics.snapshot() for name, metrics in list(self._ports.items())}}
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=1)
+
+    def to_prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        lines = ["# TYPE serial_bytes_total counter"]
+        snapshot = self.snapshot()
+        for port, data in snapshot["ports"].items():
+            for direction in ("in", "out"):
+                lines.append(f'serial_bytes_total{{port="{port}",direction="{direction}"}} {data["bytes_" + direction]}')
+        counters = (("serial_command_exchanges_total", "count"), ("serial_command_timeouts_total", "timeouts"),
+                    ("serial_command_naks_total", "naks"), ("serial_command_errors_total", "errors"),
+                    ("serial_command_retries_total", "retries"))
+        for name, key in counters:
+            lines.append(f"# TYPE {name} counter")
+            for port, data in snapshot["ports"].items():
+                for command, stats in data["commands"].items():
+                    lines.append(f'{name}{{port="{port}",command="{command}"}} {stats[key]}')
+        lines.append("# TYPE serial_command_latency_seconds summary")
+        for port, data in snapshot["ports"].items():
+            for command, stats in data["commands"].items():
+                labels = f'port="{port}",command="{command}"'
+                latency = stats["latency"]
+                for quantile, key in (("0.5", "p50"), ("0.9", "p90"), ("0.99", "p99")):
+                    lines.append(f'serial_command_latency_seconds{{{labels},quantile="{quantile}"}} {latency[key]:.6f}')
+                lines.append(f"serial_command_latency_seconds_sum{{{labels}}} {latency['sum']:.6f}")
+                lines.append(f"serial_command_latency_seconds_count{{{labels}}} {latency['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write_files(self, directory: str) -> tuple:
+        """Write io_metrics.json and io_metrics.prom to `directory` (atomically replaced)."""
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for name, text in (("io_metrics.json", self.to_json()), ("io_metrics.prom", self.to_prometheus())):
+            path = os.path.join(directory, name)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(path + ".tmp", path)
+            paths.append(path)
+        return tuple(paths)
+
+
+# Shared registry used by the serial handlers and models.
+io_metrics = IoMetrics()
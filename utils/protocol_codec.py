@@ -0,0 +1,99 @@
+# utils/protocol_codec.py
+"""
+Single encoder for both serial protocols.
+
+  - Motor frames:        STX (0x02) + controller address '0' (0x30) + command + ETX (0x03)
+  - Acquisition frames:  command + CR (0x0D)
+
+Commands are encoded straight to bytes (one latin-1 encode, equivalent to the
+former text -> hex string -> bytes.fromhex round trip). The fixed command set
+we send thousands of times (A, D, SC,..., XP01R..YP49R, XS/YS, homing and
+drive moves, X=H/Y=H standstill queries) is prebuilt once and served from an
+interned frame table; other short commands are added to that table the first
+time they are sent.
+"""
+
+STX = 0x02
+ETX = 0x03
+CR = 0x0D
+MOTOR_ADDRESS = ord('0')
+
+_MOTOR_PREFIX = bytes([STX, MOTOR_ADDRESS])
+_MOTOR_SUFFIX = bytes([ETX])
+_ACQ_SUFFIX = bytes([CR])
+
+# Commands longer than this (e.g. program upload blocks) are never cached.
+_MAX_CACHED_COMMAND = 32
+# Upper bound on dynamically cached frames per protocol.
+_MAX_CACHED_FRAMES = 1024
+
+_motor_frames = {}
+_acq_frames = {}
+
+
+def _build_motor_frame(command: str) -> bytes:
+    return _MOTOR_PREFIX + command.encode('latin-1') + _MOTOR_SUFFIX
+
+
+def _build_acq_frame(command: str) -> bytes:
+    return command.encode('latin-1') + _ACQ_SUFFIX
+
+
+def encode_motor(command: str) -> bytes:
+    """Return the complete motor frame for a text command."""
+    frame = _motor_frames.get(command)
+    if frame is None:
+        frame = _build_motor_frame(command)
+        if len(command) <= _MAX_CACHED_COMMAND and len(_motor_frames) < _MAX_CACHED_FRAMES:
+            _motor_frames[command] = frame
+    return frame
+
+
+def encode_acq(command: str) -> bytes:
+    """Return the complete acquisition frame for a text command."""
+    frame = _acq_frames.get(command)
+    if frame is None:
+        frame = _build_acq_frame(command)
+        if len(command) <= _MAX_CACHED_COMMAND and len(_acq_frames) < _MAX_CACHED_FRAMES:
+            _acq_frames[command] = frame
+    return frame
+
+
+class MotorFrameEncoder:
+    """
+    Encodes long motor payloads (e.g. 256-character program blocks) into one
+    reusable buffer instead of allocating a new frame per block.
+
+    encode() returns a memoryview into the internal buffer; it stays valid
+    until the next call, so the caller must write it out before encoding again
+    (MotorModel does this while holding the motor port).
+    """
+    def __init__(self, capacity: int = 512):
+        self._buffer = bytearray(capacity + 3)
+        self._buffer[0:2] = _MOTOR_PREFIX
+
+    def encode(self, command: str) -> memoryview:
+        if len(command) <= _MAX_CACHED_COMMAND:
+            return memoryview(encode_motor(command))
+        size = len(command)
+        if size + 3 > len(self._buffer):
+            # A fresh buffer, so views handed out earlier are never resized under their owner.
+            self._buffer = bytearray(size + 3)
+            self._buffer[0:2] = _MOTOR_PREFIX
+        end = 2 + size
+        self._buffer[2:end] = command.encode('latin-1')
+        self._buffer[end] = ETX
+        return memoryview(self._buffer)[:end + 1]
+
+
+def _prebuild():
+    for axis in ("X", "Y"):
+        for number in range(1, 50):
+            encode_motor(f"{axis}P{number:02d}R")
+        for command in ("S", "0+", "0-", "-400", "=H"):
+            encode_motor(axis + command)
+    for command in ("A", "D", "SC,002,005", "SC,008,005"):
+        encode_acq(command)
+
+
+_prebuild()
@@ -1,32 +1,27 @@
 # utils/protocol_formatter.py
 
-from utils.conversions import text_to_hex
+from utils.protocol_codec import encode_motor, encode_acq
 
 
 class ProtocolFormatter:
     @staticmethod
     def format_motor_command(text_command: str) -> bytes:
         """
-        Formats a motor command by converting the text to hexadecimal and wrapping it
-        with the protocol markers:
+        Formats a motor command by wrapping it with the protocol markers
+        (see utils.protocol_codec):
             - STX (0x02)
             - Controller address (assumed to be '30')
             - ETX (0x03)
         """
-        hex_command = text_to_hex(text_command)
-        full_command = f"02 30 {hex_command} 03"
-        hex_string = full_command.replace(" ", "")
-        return bytes.fromhex(hex_string)
+        return encode_motor(text_command)
 
     @staticmethod
     def format_acq_command(text_command: str) -> bytes:
         """
-        Formats an acquisition command by converting the text to hexadecimal and appending
-        the carriage return (0x0D).
+        Formats an acquisition command by appending the carriage return (0x0D)
+        (see utils.protocol_codec).
         """
-        hex_command = text_to_hex(text_command)
-        full_command = f"{hex_command}0D"
-        return bytes.fromhex(full_command)
+        return encode_acq(text_command)
 
     @staticmethod
     def parse_motor_response(response: str) -> str:
@@ -0,0 +1,87 @@
+# utils/qt_asyncio.py
+"""
+Runs asyncio on the Qt event loop, so the GUI and the coroutines of
+MainController.sendMotorCommand and sendAcqCommand share the main thread.
+
+There is no asyncio serial transport: the models' *_async methods are
+awaitable wrappers over the per-port CommandScheduler (model/command_scheduler.py).
+The serial I/O runs on the scheduler threads; the coroutines only await the
+job futures (asyncio.wrap_future), so the GUI is not blocked while they wait.
+
+With qasync installed its QEventLoop drives asyncio directly. Without it, a
+plain asyncio loop is advanced in non-blocking slices from a QTimer every
+ASYNCIO_TICK_MS while coroutines are pending; the timer stops when the loop is idle.
+"""
+
+import asyncio
+import logging
+from PyQt5.QtCore import QTimer
+from config import ASYNCIO_TICK_MS
+
+logger = logging.getLogger(__name__)
+
+_loop = None
+_timer = None
+_blocking_loop = None
+
+
+def install(app):
+    """Create the asyncio loop for `app` (once) and return it."""
+    global _loop, _timer
+    if _loop is not None:
+        return _loop
+    try:
+        import qasync
+    except ImportError:
+        qasync = None
+    if qasync is not None:
+        _loop = qasync.QEventLoop(app)
+    else:
+        _loop = asyncio.new_event_loop()
+        _timer = QTimer()
+        _timer.setInterval(ASYNCIO_TICK_MS)
+        _timer.timeout.connect(_run_slice)
+    asyncio.set_event_loop(_loop)
+    logger.info("asyncio integrated with Qt (%s).", 'qasync' if qasync else 'timer slices')
+    return _loop
+
+
+def _run_slice():
+    # Run every callback that is ready now; stop() is queued behind them so
+    # run_forever() returns after one iteration without blocking in select().
+    _loop.call_soon(_loop.stop)
+    _loop.run_forever()
+    if not asyncio.all_tasks(_loop):
+        _timer.stop()
+
+
+def submit(coroutine):
+    """
+    Schedule a coroutine on the Qt-integrated loop and return its Task.
+    Without install() (e.g. scripts and benchmarks without a GUI) the coroutine
+    is run to completion instead and its result is returned.
+    """
+    if _loop is None:
+        global _blocking_loop
+        if _blocking_loop is None:
+            _blocking_loop = asyncio.new_event_loop()
+        return _blocking_loop.run_until_complete(coroutine)
+    task = _loop.create_task(coroutine)
+    task.add_done_callback(_log_failure)
+    if _timer is not None and not _timer.isActive():
+        _timer.start()
+    return task
+
+
+def _log_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Unhandled error in coroutine: %r", task.exception())
+
+
+def run(app) -> int:
+    """Run the application until it quits; replaces app.exec_()."""
+    if _loop is not None and _timer is None:
+        with _loop:
+            _loop.run_forever()
+        return 0
+    return app.exec_()
@@ -0,0 +1,65 @@
+# utils/startup_profile.py
+
+import json
+import time
+import logging
+from PyQt5.QtCore import QObject, QEvent, QTimer
+from PyQt5.QtWidgets import QApplication
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfile(QObject):
+    """
+    Startup timing for `main.py --profile-startup[=report.json]`.
+
+    main() records milestones with mark(); the profile watches the main window
+    and, on its first paint, adds a "first paint" milestone, logs the report
+    (time per milestone and since process start), optionally writes it as
+    JSON, then closes the window and quits.
+    """
+    def __init__(self, started: float, output_path: str = None, parent=None):
+        """
+        :param started: perf_counter() value taken before the first import.
+        :param output_path: Optional JSON file to write the report to.
+        """
+        super().__init__(parent)
+        self.started = started
+        self.output_path = output_path
+        self.marks = []  # (milestone, seconds since start)
+        self._window = None
+        self._painted = False
+
+    def mark(self, name: str, at: float = None):
+        """Record that `name` was reached (now, or at the given perf_counter() value)."""
+        self.marks.append((name, (time.perf_counter() if at is None else at) - self.started))
+
+    def watch(self, window):
+        self._window = window
+        window.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if obj is self._window and event.type() == QEvent.Paint and not self._painted:
+            self._painted = True
+            self.mark("first paint")
+            # Report once the paint event has been handled.
+            QTimer.singleShot(0, self.report)
+        return False
+
+    def report(self) -> dict:
+        phases = []
+        previous = 0.0
+        for name, at in self.marks:
+            phases.append({"phase": name, "duration_ms": (at - previous) * 1000, "at_ms": at * 1000})
+            previous = at
+        result = {"phases": phases, "time_to_first_paint_ms": previous * 1000}
+        lines = [f"{'phase':<22}{'duration':>12}{'since start':>14}"]
+        lines += [f"{p['phase']:<22}{p['duration_ms']:>9.1f} ms{p['at_ms']:>11.1f} ms" for p in phases]
+        logger.info("Startup profile:\n%s", "\n".join(lines))
+        if self.output_path:
+            with open(self.output_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2)
+        if self._window is not None:
+            self._window.close()
+        QApplication.quit()
+        return result
@@ -0,0 +1,85 @@
+# view/diagnostics_panel.py
+
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QCheckBox,
+    QTableWidget, QTableWidgetItem, QHeaderView
+)
+from PyQt5.QtCore import Qt, QTimer
+
+# Refresh period of the table while the panel is visible, in milliseconds.
+REFRESH_INTERVAL_MS = 1000
+
+
+class DiagnosticsPanel(QWidget):
+    """
+    Table of the serial I/O metrics (MainController.ioStats()): one row per
+    port and command type with the exchange count, latency percentiles,
+    bytes and error counters. It refreshes only while it is visible.
+    """
+    COLUMNS = ("Port", "Command", "Count", "p50 (ms)", "p99 (ms)", "Max (ms)",
+               "Bytes out", "Bytes in", "Timeouts", "NAKs", "Errors", "Retries")
+
+    def __init__(self, controller, parent=None):
+        super().__init__(parent)
+        self.controller = controller
+        layout = QVBoxLayout()
+        controls = QHBoxLayout()
+        self.enabled_checkbox = QCheckBox("Record I/O metrics")
+        self.enabled_checkbox.setChecked(controller.ioStats()["enabled"])
+        self.reset_button = QPushButton("Reset")
+        self.totals_label = QLabel()
+        controls.addWidget(self.enabled_checkbox)
+        controls.addWidget(self.reset_button)
+        controls.addStretch(1)
+        controls.addWidget(self.totals_label)
+        layout.addLayout(controls)
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        layout.addWidget(self.table, stretch=1)
+        self.setLayout(layout)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(REFRESH_INTERVAL_MS)
+        self._timer.timeout.connect(self.refresh)
+        self.enabled_checkbox.toggled.connect(self.controller.setIoMetricsEnabled)
+        self.reset_button.clicked.connect(self.on_reset)
+
+    def on_reset(self):
+        self.controller.resetIoStats()
+        self.refresh()
+
+    def refresh(self):
+        stats = self.controller.ioStats()
+        rows = []
+        totals = []
+        for port, data in sorted(stats["ports"].items()):
+            totals.append(f"{port}: {data['bytes_out']} B out / {data['bytes_in']} B in")
+            for command, c in sorted(data["commands"].items()):
+                latency = c["latency"]
+                rows.append((port, command, c["count"],
+                             f"{latency['p50'] * 1000:.2f}", f"{latency['p99'] * 1000:.2f}",
+                             f"{latency['max'] * 1000:.2f}", c["bytes_out"], c["bytes_in"],
+                             c["timeouts"], c["naks"], c["errors"], c["retries"]))
+        self.totals_label.setText("   ".join(totals))
+        self.table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                item = self.table.item(row, column)
+                if item is None:
+                    item = QTableWidgetItem()
+                    if column >= 2:
+                        item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                    self.table.setItem(row, column, item)
+                item.setText(str(value))
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self._timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._timer.stop()
@@ -0,0 +1,49 @@
+# view/log_view.py
+
+from collections import deque
+from PyQt5.QtWidgets import QPlainTextEdit
+from PyQt5.QtCore import QTimer
+from config import LOG_VIEW_MAX_LINES, LOG_VIEW_FLUSH_MS
+
+
+class LogView(QPlainTextEdit):
+    """
+    Read-only console for controller output that stays fast in long sessions:
+      - appended lines are queued and flushed to the document in one batch at
+        most once per `flush_interval_ms` (about once per frame),
+      - both the queue and the document keep only the last `max_lines` lines,
+      - nothing is rendered while the widget is hidden (e.g. its tab is not
+        shown); queued lines are flushed when it becomes visible again.
+    """
+    def __init__(self, max_lines=LOG_VIEW_MAX_LINES, flush_interval_ms=LOG_VIEW_FLUSH_MS, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setMaximumBlockCount(max_lines)
+        self._pending = deque(maxlen=max_lines)
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(flush_interval_ms)
+        self._flush_timer.timeout.connect(self.flush)
+
+    def append(self, text: str):
+        """Queue a line for display (same call as QTextEdit.append)."""
+        self._pending.append(text)
+        if self.isVisible() and not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def flush(self):
+        """Write all queued lines to the document in a single update."""
+        if not self._pending or not self.isVisible():
+            return
+        text = "\n".join(self._pending)
+        self._pending.clear()
+        self.appendPlainText(text)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self._pending:
+            self._flush_timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._flush_timer.stop()
@@ -2,15 +2,14 @@
 
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
-    QPushButton, QTextEdit, QTabWidget, QGridLayout, QFileDialog, QGroupBox
+    QPushButton, QTabWidget, QGridLayout, QFileDialog, QGroupBox, QCheckBox
 )
-from PyQt5.QtCore import pyqtSlot
-from PyQt5.QtWebEngineWidgets import QWebEngineView  # For Plotly graphs
+from PyQt5.QtCore import pyqtSlot, QTimer
+import functools
 import logging
-import pandas as pd
-import numpy as np
-import plotly.graph_objs as go
-import plotly.offline as pyo
+from view.log_view import LogView
+from controller.analysis_executor import AnalysisExecutor
+from controller.profile_loader import load_latest_profiles
 
 logger = logging.getLogger(__name__)
 
@@ -19,8 +18,17 @@ class MainWindow(QWidget):
         super().__init__()
         self.controller = controller
         self.param_labels = {}  # to hold motor parameter display labels
+        self.dumps = {}  # latest (128, 16) uint16 dump array per profile label
+        self.previous_profiles = {}  # profiles of the last session, loaded in the background
+        self._previous_pending = True
+        self.profile_plots = {}  # label -> CurvePlot, once the Graphs tab exists
+        self.beam_view = None
+        # Loading, conversion and reconstruction run here; only widget updates stay on the GUI thread.
+        self.analysis = AnalysisExecutor(parent=self)
         self.init_ui()
         self.connect_signals()
+        # Read the previous session's data once the window is up.
+        QTimer.singleShot(0, self.load_previous_profiles)
 
     def init_ui(self):
         self.setWindowTitle("Modular Acquisition App")
@@ -32,21 +40,34 @@ class MainWindow(QWidget):
         self.command_tab = QWidget()
         self.setup_command_tab()
 
-        # Tab 2: Graph (Acquired Data Graphs)
+        # Tab 2: Graph (Acquired Data Graphs), Tab 3: Beam Shape (reconstruction
+        # from X & Y data) and Tab 4: Diagnostics (serial I/O metrics) are filled
+        # in the first time they are shown (see on_tab_changed).
         self.graph_tab = QWidget()
-        self.setup_graph_tab()
-
-        # Tab 3: Beam Shape (3D reconstruction from X & Y data)
         self.beam_tab = QWidget()
-        self.setup_beam_tab()
+        self.diagnostics_tab = QWidget()
+        self.diagnostics_panel = None
 
         self.tab_widget.addTab(self.command_tab, "Commands")
         self.tab_widget.addTab(self.graph_tab, "Graphs")
         self.tab_widget.addTab(self.beam_tab, "Beam Shape")
+        self.tab_widget.addTab(self.diagnostics_tab, "Diagnostics")
 
         main_layout = QVBoxLayout()
         main_layout.addWidget(self.tab_widget)
         self.setLayout(main_layout)
+        self.tab_widget.currentChanged.connect(self.on_tab_changed)
+
+    @pyqtSlot(int)
+    def on_tab_changed(self, index):
+        """Build the Graphs / Beam Shape / Diagnostics tab (and import its code) on first display."""
+        tab = self.tab_widget.widget(index)
+        if tab is self.graph_tab and not self.profile_plots:
+            self.setup_graph_tab()
+        elif tab is self.beam_tab and self.beam_view is None:
+            self.setup_beam_tab()
+        elif tab is self.diagnostics_tab and self.diagnostics_panel is None:
+            self.setup_diagnostics_tab()
 
     def setup_command_tab(self):
         # Create the overall layout for the Commands tab.
@@ -91,11 +112,9 @@ class MainWindow(QWidget):
         stop_layout.addWidget(self.stop_y_button)
 
         # --- Motor Responses output ---
-        self.motor_output = QTextEdit()
-        self.motor_output.setReadOnly(True)
+        self.motor_output = LogView()
         # --- Acquisition Data output ---
-        self.acq_output = QTextEdit()
-        self.acq_output.setReadOnly(True)
+        self.acq_output = LogView()
 
         # --- Program Upload group ---
         prog_upload_group = QGroupBox("Program Upload")
@@ -103,8 +122,11 @@ class MainWindow(QWidget):
         self.prog_name_input = QLineEdit()
         self.prog_name_input.setPlaceholderText("Program Name (8 chars)")
         self.upload_prog_button = QPushButton("Upload Program")
+        self.force_upload_checkbox = QCheckBox("Force")
+        self.force_upload_checkbox.setToolTip("Upload even if the controller already has this program unchanged")
         prog_upload_layout.addWidget(QLabel("Program Name:"))
         prog_upload_layout.addWidget(self.prog_name_input)
+        prog_upload_layout.addWidget(self.force_upload_checkbox)
         prog_upload_layout.addWidget(self.upload_prog_button)
         prog_upload_group.setLayout(prog_upload_layout)
 
@@ -159,126 +181,125 @@ class MainWindow(QWidget):
 
     def setup_graph_tab(self):
         """
-        Set up the Graph tab to display two Plotly graphs (one for acquired_data_X.csv and one for acquired_data_Y.csv).
+        Set up the Graph tab to display the current profiles of the X and Y motors.
+        The plots are native widgets updated in place (see view/plot_widgets.py).
         """
+        from view.plot_widgets import CurvePlot
         layout = QVBoxLayout()
-        self.graph_view_x = QWebEngineView()
-        self.graph_view_y = QWebEngineView()
-        layout.addWidget(QLabel("Graph for Acquired Data X"))
+        self.export_csv_button = QPushButton("Export Last Run to CSV")
+        layout.addWidget(self.export_csv_button)
+        self.graph_view_x = CurvePlot("Acquired Current Data for X Motor", "Index", "Current (A)")
+        self.graph_view_y = CurvePlot("Acquired Current Data for Y Motor", "Index", "Current (A)")
         layout.addWidget(self.graph_view_x, stretch=1)
-        layout.addWidget(QLabel("Graph for Acquired Data Y"))
         layout.addWidget(self.graph_view_y, stretch=1)
+        self.profile_plots = {"X": self.graph_view_x, "Y": self.graph_view_y}
         self.graph_tab.setLayout(layout)
+        self.export_csv_button.clicked.connect(self.on_export_csv)
         self.plot_graphs()
 
     def setup_beam_tab(self):
         """
-        Set up the Beam Shape tab to display a 3D surface plot of the beam.
+        Set up the Beam Shape tab to display a heat map of the beam.
+        Data already in memory is plotted right away.
         """
+        from view.plot_widgets import HeatMapPlot
         layout = QVBoxLayout()
         self.plot_beam_button = QPushButton("Plot Beam Shape")
         layout.addWidget(self.plot_beam_button)
-        self.beam_view = QWebEngineView()
+        self.beam_view = HeatMapPlot("Beam Current Heat Map", "X Position (mm)", "Y Position (mm)")
         layout.addWidget(self.beam_view, stretch=1)
         self.beam_tab.setLayout(layout)
         self.plot_beam_button.clicked.connect(self.plot_beam_shape)
+        if all(label in self.dumps or label in self.previous_profiles for label in ("X", "Y")):
+            self.plot_beam_shape()
+
+    def setup_diagnostics_tab(self):
+        """Set up the Diagnostics tab: per-port latency and throughput of the serial exchanges."""
+        from view.diagnostics_panel import DiagnosticsPanel
+        layout = QVBoxLayout()
+        self.diagnostics_panel = DiagnosticsPanel(self.controller)
+        layout.addWidget(self.diagnostics_panel)
+        self.diagnostics_tab.setLayout(layout)
+
+    @pyqtSlot()
+    def load_previous_profiles(self):
+        """Load the previous session's profiles as an analysis job."""
+        self.analysis.submit("previous profiles", load_latest_profiles, self.controller.run_store,
+                             callback=self.on_previous_profiles_loaded)
+
+    def on_previous_profiles_loaded(self, profiles):
+        self.previous_profiles = profiles
+        self._previous_pending = False
+        self.plot_graphs()
+
+    def load_profile_words(self, label):
+        """
+        Return the latest dump for a profile ("X" or "Y") as a flat uint16 array:
+        the array handed over by the acquisition workers when available, else the
+        profile loaded in the background at startup, else the latest archived run
+        (memory-mapped), else the words of acquired_data_<label>.csv (parsed once
+        per file version, see utils/analysis.py).
+        """
+        data = self.dumps.get(label)
+        if data is not None:
+            return data.ravel()
+        if label in self.previous_profiles:
+            return self.previous_profiles[label]
+        record = self.controller.run_store.latest(label)
+        if record is not None:
+            return self.controller.run_store.load_profile(record["run_id"], label).ravel()
+        from utils.analysis import csv_profile_words
+        return csv_profile_words(f"acquired_data_{label}.csv")
 
     def plot_graphs(self):
-        try:
-            from utils.conversions import hex_to_current
-            import numpy as np
-            df_x = pd.read_csv("acquired_data_X.csv", header=None)
-            df_y = pd.read_csv("acquired_data_Y.csv", header=None)
-            x_current = df_x[0].apply(lambda hex_val: hex_to_current(str(hex_val))).to_numpy()
-            y_current = df_y[0].apply(lambda hex_val: hex_to_current(str(hex_val))).to_numpy()
-            fig_x = go.Figure(data=go.Scatter(
-                x=np.arange(len(x_current)),
-                y=x_current,
-                mode='lines',
-                name='X Motor Data'
-            ))
-            fig_x.update_layout(
-                title="Acquired Current Data for X Motor",
-                xaxis_title="Index",
-                yaxis_title="Current (A)"
-            )
-            fig_y = go.Figure(data=go.Scatter(
-                x=np.arange(len(y_current)),
-                y=y_current,
-                mode='lines',
-                name='Y Motor Data'
-            ))
-            fig_y.update_layout(
-                title="Acquired Current Data for Y Motor",
-                xaxis_title="Index",
-                yaxis_title="Current (A)"
-            )
-            html_x = pyo.plot(fig_x, include_plotlyjs='cdn', output_type='div')
-            html_y = pyo.plot(fig_y, include_plotlyjs='cdn', output_type='div')
-            self.graph_view_x.setHtml(html_x)
-            self.graph_view_y.setHtml(html_y)
-        except Exception as e:
-            logger.error(f"Error plotting graphs: {e}")
+        """Convert both profiles on the analysis pool and plot them when ready."""
+        # Nothing to draw before the tab exists; wait for the background load rather than reading files here.
+        if not self.profile_plots or self._previous_pending:
+            return
+        for label in self.profile_plots:
+            self.analysis.submit(f"profile {label}", self._profile_current, label,
+                                 callback=functools.partial(self._show_profile, label))
+
+    def _profile_current(self, label):
+        # Analysis thread.
+        from utils.analysis import profile_current
+        return profile_current(self.load_profile_words(label))
+
+    def _show_profile(self, label, currents, complete=True):
+        plot = self.profile_plots.get(label)
+        if plot is None:
+            return
+        if complete:
+            plot.set_x_range()
+        else:
+            from model.dump_reader import DUMP_LINES, WORDS_PER_LINE
+            plot.set_x_range(0, DUMP_LINES * WORDS_PER_LINE - 1)
+        plot.set_data(currents)
 
     @pyqtSlot()
     def plot_beam_shape(self):
         """
         Reconstruct the beam current distribution as a heat map from the acquired
-        data files. With each file now containing 2048 lines (one word per line),
-        we convert the hex values to current and then downsample the profiles to 128 points.
-        The outer product of these downsampled profiles is used to generate the 3D heat map.
+        profiles. Each profile holds 2048 words; we convert them to current and
+        then downsample the profiles to 128 points.
+        The outer product of these downsampled profiles is used to generate the heat map.
+        The reconstruction runs on the analysis pool and is cached by content and
+        parameters, so replotting unchanged data is free.
         """
-        try:
-            from utils.conversions import hex_to_current
-            import numpy as np
-            import pandas as pd
-            import plotly.graph_objs as go
-            import plotly.offline as pyo
-
-            # Read the CSV files; each is now expected to have 2048 rows.
-            df_x = pd.read_csv("acquired_data_X.csv", header=None)
-            df_y = pd.read_csv("acquired_data_Y.csv", header=None)
-
-            # Convert each hex string to a current value.
-            # This produces arrays of length 2048.
-            x_all = df_x[0].apply(lambda hex_val: hex_to_current(str(hex_val))).to_numpy()
-            y_all = df_y[0].apply(lambda hex_val: hex_to_current(str(hex_val))).to_numpy()
-
-            # Downsample the data to 128 points (2048/16 = 128).
-            x_profile = x_all[::16]
-            y_profile = y_all[::16]
-
-            # Define spatial axes using a given step size (adjust if needed).
-            step_size = 0.5  # e.g., 0.5 mm per measurement
-            x_axis = np.arange(len(x_profile)) * step_size
-            y_axis = np.arange(len(y_profile)) * step_size
-
-            # Compute the outer product to create a 2D beam intensity map.
-            Z = np.outer(x_profile, y_profile)
-
-            # Create the heatmap with Plotly.
-            heatmap = go.Heatmap(
-                z=Z,
-                x=x_axis,
-                y=y_axis,
-                colorscale='Viridis'
-            )
-            fig = go.Figure(data=[heatmap])
-            fig.update_layout(
-                title="Beam Current Heat Map",
-                xaxis_title="X Position (mm)",
-                yaxis_title="Y Position (mm)",
-                autosize=True,
-                width=800,
-                height=800,
-                margin=dict(l=65, r=50, b=65, t=90)
-            )
-
-            # Generate the HTML for the plot and set it in the QWebEngineView.
-            html_heatmap = pyo.plot(fig, include_plotlyjs='cdn', output_type='div')
-            self.beam_view.setHtml(html_heatmap)
-        except Exception as e:
-            logger.error(f"Error plotting beam shape: {e}")
+        if self.beam_view is None:
+            return
+        self.analysis.submit("beam", self._beam_map, callback=self._show_beam)
+
+    def _beam_map(self):
+        # Analysis thread.
+        from utils.analysis import beam_map
+        # 0.5 mm per measurement, 2048 words downsampled to 128 points.
+        return beam_map(self.load_profile_words("X"), self.load_profile_words("Y"),
+                        step_size=0.5, decimation=16)
+
+    def _show_beam(self, result):
+        Z, x_axis, y_axis = result
+        self.beam_view.set_data(Z, x_axis, y_axis)
 
     def connect_signals(self):
         self.motor_send_button.clicked.connect(self.on_motor_send)
@@ -293,7 +314,10 @@ class MainWindow(QWidget):
         self.controller.motorResponseReceived.connect(self.update_motor_output)
         self.controller.acqDataReceived.connect(self.update_acq_output)
         self.controller.acqSequenceFinished.connect(self.on_sequence_finished)
+        self.controller.acqDumpReady.connect(self.on_dump_ready)
+        self.controller.acqDumpProgress.connect(self.on_dump_progress)
         self.controller.motorParametersUpdated.connect(self.update_motor_parameters)
+        self.controller.programUploadProgress.connect(self.acq_output.append)
 
     def on_motor_send(self):
         command = self.motor_command_input.text().strip()
@@ -316,11 +340,11 @@ class MainWindow(QWidget):
 
     @pyqtSlot()
     def on_stop_x(self):
-        self.controller.sendMotorCommand("XS")
+        self.controller.stopMotor("X")
 
     @pyqtSlot()
     def on_stop_y(self):
-        self.controller.sendMotorCommand("YS")
+        self.controller.stopMotor("Y")
 
     @pyqtSlot(str)
     def update_motor_output(self, response: str):
@@ -332,9 +356,27 @@ class MainWindow(QWidget):
 
     @pyqtSlot(dict)
     def update_motor_parameters(self, parameters: dict):
-        for key, value in parameters.items():
+        # Values are MotorResponse objects; render them with protocol markers.
+        for key, response in parameters.items():
             if key in self.param_labels:
-                self.param_labels[key].setText(value)
+                self.param_labels[key].setText(str(response))
+
+    @pyqtSlot(str, object)
+    def on_dump_progress(self, label: str, partial):
+        """Extend the profile's curve with the dump lines received so far."""
+        if label in self.profile_plots:
+            from utils.conversions import words_to_current
+            # Newer updates (and the complete dump) supersede this one on the same channel.
+            self.analysis.submit(f"profile {label}", words_to_current, partial.ravel(),
+                                 callback=functools.partial(self._show_profile, label, complete=False))
+
+    @pyqtSlot(str, object)
+    def on_dump_ready(self, label: str, data):
+        self.dumps[label] = data
+        if label in self.profile_plots:
+            from utils.analysis import profile_current
+            self.analysis.submit(f"profile {label}", profile_current, data,
+                                 callback=functools.partial(self._show_profile, label))
 
     @pyqtSlot()
     def on_sequence_finished(self):
@@ -343,6 +385,13 @@ class MainWindow(QWidget):
         self.plot_graphs()
         self.plot_beam_shape()
 
+    @pyqtSlot()
+    def on_export_csv(self):
+        directory = QFileDialog.getExistingDirectory(self, "Export Run to CSV", ".")
+        if directory:
+            for path in self.controller.exportRunCsv(directory=directory):
+                self.acq_output.append(f"Exported {path}")
+
     @pyqtSlot()
     def on_program_upload(self):
         file_path, _ = QFileDialog.getOpenFileName(
@@ -355,9 +404,11 @@ class MainWindow(QWidget):
                 return
             if len(prog_name) > 8:
                 prog_name = prog_name[:8]
-            self.acq_output.append(f"Uploading program '{prog_name}' from {file_path}...")
-            self.controller.startProgramUpload(file_path, prog_name)
+            self.acq_output.append(f"Queued program '{prog_name}' from {file_path} for upload...")
+            self.controller.startProgramUpload(file_path, prog_name, self.force_upload_checkbox.isChecked())
 
     def closeEvent(self, event):
+        # Drop pending analysis jobs and let running ones finish before their receivers go away.
+        self.analysis.shutdown()
         self.controller.cleanup()
         event.accept()
@@ -0,0 +1,234 @@
+# view/plot_widgets.py
+
+import math
+import numpy as np
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+from PyQt5.QtCore import Qt, QRectF, QPointF
+from PyQt5.QtGui import QPainter, QPen, QColor, QPolygonF, QImage, QTransform, QFontMetrics
+
+# Viridis anchor colours; the 256-entry lookup table is interpolated from them.
+_VIRIDIS = np.array([
+    (68, 1, 84), (72, 40, 120), (62, 74, 137), (49, 104, 142), (38, 130, 142),
+    (31, 158, 137), (53, 183, 121), (110, 206, 88), (181, 222, 43), (253, 231, 37),
+], dtype=np.float64)
+
+
+def _viridis_lut():
+    """256 colours as 0xAARRGGBB words, ready to index with uint8 levels."""
+    positions = np.linspace(0, 1, len(_VIRIDIS))
+    levels = np.linspace(0, 1, 256)
+    rgb = np.stack([np.interp(levels, positions, _VIRIDIS[:, c]) for c in range(3)], axis=1).astype(np.uint32)
+    return (0xFF << 24) | (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+
+
+_LUT = _viridis_lut()
+
+
+def nice_ticks(low, high, count=5):
+    """Round tick positions (1/2/5 x 10^n steps) covering [low, high]."""
+    if not (math.isfinite(low) and math.isfinite(high)) or high <= low:
+        return [low] if math.isfinite(low) else []
+    raw_step = (high - low) / max(1, count)
+    magnitude = 10 ** math.floor(math.log10(raw_step))
+    step = next(m * magnitude for m in (1, 2, 5, 10) if m * magnitude >= raw_step)
+    first = math.ceil(low / step) * step
+    return [first + i * step for i in range(int((high - first) / step + 1e-9) + 1)]
+
+
+class _PlotBase(QWidget):
+    """Shared frame of the plot widgets: title, axes with ticks and labels around a plot area."""
+    MARGIN_LEFT = 85
+    MARGIN_RIGHT = 20
+    MARGIN_TOP = 30
+    MARGIN_BOTTOM = 45
+
+    def __init__(self, title="", x_label="", y_label="", parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.x_label = x_label
+        self.y_label = y_label
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.setMinimumSize(200, 150)
+        self.setAutoFillBackground(True)
+        self._axis_pen = QPen(self.palette().color(self.foregroundRole()))
+
+    def plot_rect(self) -> QRectF:
+        return QRectF(self.MARGIN_LEFT, self.MARGIN_TOP,
+                      max(1, self.width() - self.MARGIN_LEFT - self.MARGIN_RIGHT),
+                      max(1, self.height() - self.MARGIN_TOP - self.MARGIN_BOTTOM))
+
+    def _draw_frame(self, painter, rect, x_range, y_range):
+        painter.setPen(self._axis_pen)
+        metrics = QFontMetrics(painter.font())
+        painter.drawRect(rect)
+        if self.title:
+            painter.drawText(QRectF(0, 0, self.width(), self.MARGIN_TOP), Qt.AlignCenter, self.title)
+        (x_min, x_max), (y_min, y_max) = x_range, y_range
+        for tick in nice_ticks(x_min, x_max):
+            px = rect.left() + (tick - x_min) / (x_max - x_min) * rect.width() if x_max > x_min else rect.left()
+            painter.drawLine(QPointF(px, rect.bottom()), QPointF(px, rect.bottom() + 4))
+            text = f"{tick:g}"
+            painter.drawText(QPointF(px - metrics.width(text) / 2, rect.bottom() + 6 + metrics.ascent()), text)
+        for tick in nice_ticks(y_min, y_max):
+            py = rect.bottom() - (tick - y_min) / (y_max - y_min) * rect.height() if y_max > y_min else rect.bottom()
+            painter.drawLine(QPointF(rect.left() - 4, py), QPointF(rect.left(), py))
+            text = f"{tick:.3g}"
+            painter.drawText(QPointF(rect.left() - 6 - metrics.width(text), py + metrics.ascent() / 2 - 1), text)
+        if self.x_label:
+            painter.drawText(QRectF(rect.left(), self.height() - metrics.height() - 2, rect.width(), metrics.height()),
+                             Qt.AlignCenter, self.x_label)
+        if self.y_label:
+            painter.save()
+            painter.translate(metrics.height() / 2 + 2, rect.center().y())
+            painter.rotate(-90)
+            painter.drawText(QRectF(-rect.height() / 2, -metrics.height() / 2, rect.height(), metrics.height()),
+                             Qt.AlignCenter, self.y_label)
+            painter.restore()
+
+
+class CurvePlot(_PlotBase):
+    """
+    Line plot of one NumPy series, drawn with QPainter.
+
+    The points live in a persistent QPolygonF whose memory is written directly
+    from NumPy (no per-point Python objects); set_data() updates it in place and
+    schedules a repaint. Data coordinates are mapped to pixels by a transform
+    at paint time, so a redraw is one drawPolyline call.
+    """
+    def __init__(self, title="", x_label="", y_label="", color=QColor(31, 119, 180), parent=None):
+        super().__init__(title, x_label, y_label, parent)
+        self._pen = QPen(color)
+        self._pen.setWidthF(1.5)
+        self._pen.setCosmetic(True)
+        self._polygon = QPolygonF()
+        self._points = np.empty((0, 2))
+        self._count = 0
+        self._x_range = None
+        self._y_range = (0.0, 1.0)
+        self._fixed_x_range = None
+
+    def set_x_range(self, x_min=None, x_max=None):
+        """Fix the x axis range (e.g. the full dump length while it streams in); None = auto."""
+        self._fixed_x_range = None if x_min is None else (float(x_min), float(x_max))
+        self.update()
+
+    def set_data(self, y, x=None):
+        """
+        Replace the curve with `y` (plotted against `x`, default 0..len(y)-1).
+        The polygon buffer is reused as long as the number of points is unchanged.
+        """
+        y = np.asarray(y, dtype=np.float64).ravel()
+        count = len(y)
+        if count != len(self._points):
+            # (Re)allocate the QPolygonF and view its memory as an (n, 2) float64 array.
+            self._polygon = QPolygonF(count)
+            pointer = self._polygon.data()
+            pointer.setsize(count * 2 * 8)
+            self._points = np.frombuffer(pointer, dtype=np.float64).reshape(count, 2)
+        points = self._points
+        points[:, 0] = np.arange(count) if x is None else np.asarray(x, dtype=np.float64).ravel()
+        points[:, 1] = y
+        self._count = count
+        if count:
+            finite = y[np.isfinite(y)]
+            if len(finite):
+                low, high = float(finite.min()), float(finite.max())
+                if high == low:
+                    low, high = low - 0.5 * (abs(low) or 1), high + 0.5 * (abs(high) or 1)
+                self._y_range = (low, high)
+            self._x_range = (float(points[0, 0]), float(points[count - 1, 0]))
+        self.update()
+
+    def clear(self):
+        self.set_data(np.empty(0))
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        rect = self.plot_rect()
+        x_range = self._fixed_x_range or self._x_range or (0.0, 1.0)
+        if x_range[1] <= x_range[0]:
+            x_range = (x_range[0], x_range[0] + 1.0)
+        self._draw_frame(painter, rect, x_range, self._y_range)
+        if self._count < 2:
+            return
+        (x_min, x_max), (y_min, y_max) = x_range, self._y_range
+        painter.setClipRect(rect)
+        painter.setRenderHint(QPainter.Antialiasing, self._count <= 4096)
+        transform = QTransform()
+        transform.translate(rect.left(), rect.bottom())
+        transform.scale(rect.width() / (x_max - x_min), -rect.height() / (y_max - y_min))
+        transform.translate(-x_min, -y_min)
+        painter.setTransform(transform)
+        painter.setPen(self._pen)
+        painter.drawPolyline(self._polygon)
+
+
+class HeatMapPlot(_PlotBase):
+    """
+    Heat map of a 2-D NumPy array with a viridis colour bar, drawn with QPainter.
+
+    set_data() maps the values to colours with one vectorised lookup into a
+    persistent ARGB image buffer; painting scales that image into the plot
+    area. Row 0 is drawn at the bottom (y axis pointing up).
+    """
+    COLORBAR_WIDTH = 14
+
+    def __init__(self, title="", x_label="", y_label="", parent=None):
+        super().__init__(title, x_label, y_label, parent)
+        self.MARGIN_RIGHT = 90
+        self._argb = None
+        self._image = None
+        self._x_range = (0.0, 1.0)
+        self._y_range = (0.0, 1.0)
+        self._z_range = (0.0, 1.0)
+        self._colorbar = QImage(1, 256, QImage.Format_ARGB32)
+        for level in range(256):
+            self._colorbar.setPixel(0, 255 - level, int(_LUT[level]))
+
+    def set_data(self, z, x_axis=None, y_axis=None):
+        """
+        :param z: 2-D array, z[row, column]; rows run along the y axis.
+        :param x_axis: Coordinates of the columns (default: column index).
+        :param y_axis: Coordinates of the rows (default: row index).
+        """
+        z = np.asarray(z, dtype=np.float64)
+        rows, columns = z.shape
+        finite = np.isfinite(z)
+        if finite.any():
+            low, high = float(z[finite].min()), float(z[finite].max())
+        else:
+            # Nothing to scale (e.g. no readings yet): draw the lowest colour.
+            low, high = 0.0, 1.0
+        scale = 255.0 / (high - low) if high > low else 0.0
+        levels = np.clip((z - low) * scale, 0, 255)
+        levels = np.nan_to_num(levels).astype(np.uint8)
+        if self._argb is None or self._argb.shape != (rows, columns):
+            self._argb = np.empty((rows, columns), dtype=np.uint32)
+            self._image = QImage(self._argb.data, columns, rows, columns * 4, QImage.Format_ARGB32)
+        # Flip vertically so that row 0 ends up at the bottom of the image.
+        np.take(_LUT, levels[::-1], out=self._argb)
+        self._x_range = self._extent(x_axis, columns)
+        self._y_range = self._extent(y_axis, rows)
+        self._z_range = (low, high)
+        self.update()
+
+    @staticmethod
+    def _extent(axis, size):
+        if axis is None or len(axis) < 2:
+            return (0.0, float(max(size - 1, 1)))
+        return (float(axis[0]), float(axis[-1]))
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        rect = self.plot_rect()
+        if self._image is not None:
+            painter.drawImage(rect, self._image)
+        self._draw_frame(painter, rect, self._x_range, self._y_range)
+        # Colour bar with its min / max labels.
+        bar = QRectF(rect.right() + 12, rect.top(), self.COLORBAR_WIDTH, rect.height())
+        painter.drawImage(bar, self._colorbar)
+        painter.drawRect(bar)
+        metrics = QFontMetrics(painter.font())
+        low, high = self._z_range
+        painter.drawText(QPointF(bar.right() + 4, bar.top() + metrics.ascent()), f"{high:.3g}")
+        painter.drawText(QPointF(bar.right() + 4, bar.bottom()), f"{low:.3g}")